@@ -81,8 +81,65 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.SessionAuthentication',
         'EcoReMartApp.authentication.FirebaseAuthentication',
     ),
+    # Client gửi Accept / Content-Type: application/msgpack để dùng MessagePack thay JSON
+    'DEFAULT_RENDERER_CLASSES': (
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'EcoReMartApp.renderers.MessagePackRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+        'EcoReMartApp.renderers.MessagePackParser',
+    ),
 }
 AUTH_USER_MODEL = 'EcoReMartApp.User'
+CACHES = {
+    'default': {
+        'BACKEND': env('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': env('CACHE_LOCATION', default='ecoremart'),
+    }
+}
+CATEGORY_SUMMARY_PREVIEW_SIZE = 4
+CATEGORY_SUMMARY_CACHE_TIMEOUT = 60 * 60
+TRENDING_HALF_LIFE_HOURS = 72
+TRENDING_LOOKBACK_DAYS = 30
+RELATED_PRODUCTS_TOP_K = 10
+# Số URL Cloudinary nhớ đệm tối đa trong mỗi process (xem EcoReMartApp/cloudinary_urls.py)
+CLOUDINARY_URL_CACHE_SIZE = 4096
+# Biến thể ảnh (transformation Cloudinary) trả trong trường srcset và chọn bằng ?image_variant=,
+# endpoint danh sách mặc định dùng thumb, endpoint chi tiết mặc định ảnh gốc (original)
+CLOUDINARY_IMAGE_VARIANTS = {
+    'thumb': {'width': 150, 'height': 150, 'crop': 'fill', 'quality': 'auto', 'fetch_format': 'auto'},
+    'card': {'width': 400, 'height': 400, 'crop': 'fill', 'quality': 'auto', 'fetch_format': 'auto'},
+    'full': {'width': 1200, 'crop': 'limit', 'quality': 'auto', 'fetch_format': 'auto'},
+}
+# Upload ảnh: lớp lưu trữ (upload/delete) và số luồng upload song song tối đa mỗi process
+IMAGE_UPLOAD_BACKEND = env('IMAGE_UPLOAD_BACKEND', default='EcoReMartApp.media_backends.CloudinaryBackend')
+IMAGE_UPLOAD_WORKERS = 4
+# Chuẩn hoá ảnh trước khi upload (EcoReMartApp/image_processing.py): cạnh dài tối đa (px), chất lượng JPEG,
+# ngưỡng byte giữ ảnh đã nén trong RAM trước khi tràn ra file tạm
+IMAGE_MAX_DIMENSION = 2048
+IMAGE_JPEG_QUALITY = 82
+IMAGE_SPOOL_MAX_SIZE = 2 * 1024 * 1024
+# Upload trực tiếp từ client (EcoReMartApp/direct_uploads.py): thư mục, hạn attach (giây), số ảnh mỗi lần
+DIRECT_UPLOAD_FOLDER = 'ecoremart/direct'
+DIRECT_UPLOAD_TTL = 15 * 60
+DIRECT_UPLOAD_MAX_FILES = 10
+# Lưu ảnh trên đĩa thay Cloudinary (IMAGE_UPLOAD_BACKEND=EcoReMartApp.media_backends.LocalBackend) cho dev/CI/benchmark
+# không có mạng: thư mục lưu, tiền tố URL (route local-media/ trong EcoReMartApp/urls.py), độ trễ giả lập (giây)
+LOCAL_MEDIA_ROOT = env('LOCAL_MEDIA_ROOT', default=f'{BASE_DIR}/local_media')
+LOCAL_MEDIA_URL = '/local-media/'
+LOCAL_MEDIA_LATENCY = env.float('LOCAL_MEDIA_LATENCY', default=0)
+# Lưu giỏ hàng (EcoReMartApp/cart_store.py): DatabaseCartStore ghi thẳng CartItem, CachedCartStore giữ giỏ
+# trên cache và ghi xuống DB sau mỗi CART_STORE_FLUSH_INTERVAL giây (cần cache chung khi chạy nhiều worker);
+# CART_STORE_WRITE_THROUGH=True ghi DB ngay mỗi thao tác, không mất giỏ khi process chết
+CART_STORE = env('CART_STORE', default='EcoReMartApp.cart_store.DatabaseCartStore')
+CART_STORE_FLUSH_INTERVAL = env.float('CART_STORE_FLUSH_INTERVAL', default=2)
+CART_STORE_WRITE_THROUGH = env.bool('CART_STORE_WRITE_THROUGH', default=False)
+# Số thao tác tối đa mỗi lần gọi batch-productCart/
+CART_BATCH_MAX_OPERATIONS = 100
 MEDIA_ROOT=f'{BASE_DIR}/EcoReMartApp/static/'
 
 MIDDLEWARE = [
@@ -329,19 +329,25 @@
 
 from django.contrib import admin, messages
 from django import forms
-from django.db.models import Sum, Avg, Count
+from django.db.models import Sum, Count
+from django.http import JsonResponse
 from django.urls import path, reverse
 from django.template.response import TemplateResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
+from rest_framework.exceptions import NotFound
 
 from .models import (
     User, Store, Product, ProductCondition, Category,
     ProductImage,  # cần cho inline + gallery
     Order, OrderStatus, Voucher
 )
+from .category_summary import refresh_product_categories
+from .cloudinary_urls import resource_url, url_cache_stats, variant_options
+from .paginators import KeysetPaginator
 
 # ================== CẤU HÌNH ==================
 COMPLETED_ORDER_STATUS_ID = 6
@@ -353,7 +359,7 @@ def render_cloudinary_thumb(field, size=THUMB_SIZE):
     try:
         if not field:
             return ""
-        url = getattr(field, "url", None)
+        url = resource_url(field)
         if not url:
             return ""
         return format_html(
@@ -392,7 +398,11 @@ class ProductImageInline(admin.TabularInline):
 # ================== ACTIONS ==================
 @admin.action(description="Duyệt (active=True) các sản phẩm đã chọn")
 def approve_products(modeladmin, request, queryset):
-    updated = queryset.filter(active=False).update(active=True)
+    pending = queryset.filter(active=False)
+    product_ids = list(pending.values_list("id", flat=True))
+    updated = pending.update(active=True)
+    # update() không bắn post_save nên tự làm mới cache danh mục
+    refresh_product_categories(product_ids)
     messages.success(request, f"Đã duyệt {updated} sản phẩm.")
 
 @admin.action(description="Xóa các sản phẩm đã chọn")
@@ -508,10 +518,6 @@ class ProductAdmin(admin.ModelAdmin):
     inlines = [ProductImageInline]
     readonly_fields = ("first_image_preview",)
 
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        return qs.annotate(_avg_rating=Avg("comments__rating"), _rating_count=Count("comments"))
-
     def first_image(self, obj):
         img = obj.images.first()
         return getattr(img, "image", None) if img else None
@@ -525,8 +531,8 @@ class ProductAdmin(admin.ModelAdmin):
     first_image_preview.short_description = "Ảnh đại diện"
 
     def avg_rating_display(self, obj):
-        if getattr(obj, "_avg_rating", None):
-            return f"{obj._avg_rating:.2f} ({obj._rating_count})"
+        if obj.rating_count:
+            return f"{obj.avg_rating:.2f} ({obj.rating_count})"
         return "-"
     avg_rating_display.short_description = "Rating TB (SL)"
 
@@ -585,15 +591,56 @@ def build_top_stores_queryset(month, year, order_status_id=COMPLETED_ORDER_STATU
     data.sort(key=lambda x: x["revenue"] or 0, reverse=True)
     return data[:limit]
 
+# Media gallery: mỗi loại ảnh là (model, trường ảnh, trường ngày, trường chủ sở hữu, các cột phụ cần đọc)
+GALLERY_PAGE_SIZE = 48
+GALLERY_SOURCES = {
+    "product": (ProductImage, "image", "uploaded_at", "product__store_id",
+                ("product_id", "product__name", "product__store__name")),
+    "store": (Store, "avatar", "created_date", "id", ("name",)),
+    "user": (User, "avatar", "date_joined", "id", ("email",)),
+}
+
+class GalleryPaginator(KeysetPaginator):
+    page_size = GALLERY_PAGE_SIZE
+
+def build_gallery_queryset(kind, owner_id=None, date_from=None, date_to=None):
+    model, image_field, date_field, owner_field, extra = GALLERY_SOURCES[kind]
+    qs = model.objects.exclude(**{image_field: ""}).exclude(**{f"{image_field}__isnull": True})
+    if owner_id:
+        qs = qs.filter(**{owner_field: owner_id})
+    if date_from:
+        qs = qs.filter(**{f"{date_field}__date__gte": date_from})
+    if date_to:
+        qs = qs.filter(**{f"{date_field}__date__lte": date_to})
+    return qs.values("id", image_field, date_field, *extra)
+
+def gallery_item(kind, row, thumb_options):
+    _, image_field, date_field, _, _ = GALLERY_SOURCES[kind]
+    image = row[image_field]
+    item = {
+        "id": row["id"],
+        # Lưới chỉ tải ảnh thumb; ảnh gốc chỉ mở khi click
+        "thumb": resource_url(image, **thumb_options),
+        "original": resource_url(image),
+        "date": row[date_field].isoformat() if row[date_field] else None,
+    }
+    if kind == "product":
+        item.update(label=row["product__name"], owner=row["product__store__name"],
+                    change_url=reverse("admin:EcoReMartApp_product_change", args=[row["product_id"]]))
+    elif kind == "store":
+        item.update(label=row["name"], owner=row["name"],
+                    change_url=reverse("admin:EcoReMartApp_store_change", args=[row["id"]]))
+    else:
+        item.update(label=row["email"], owner=row["email"],
+                    change_url=reverse("admin:EcoReMartApp_user_change", args=[row["id"]]))
+    return item
+
 def build_top_products_queryset(limit=TOP_LIMIT):
+    # Đọc thẳng các cột rating_avg/rating_count trên Product, không cần aggregate bảng comment
     return (
-        Product.objects.filter(active=True)
-        .annotate(
-            avg_rating=Avg("comments__rating"),
-            rating_count=Count("comments__id"),
-        )
-        .filter(rating_count__gt=0)
-        .order_by("-avg_rating", "-rating_count")[:limit]
+        Product.objects.filter(active=True, rating_count__gt=0)
+        .select_related("store")
+        .order_by("-rating_avg", "-rating_count")[:limit]
     )
 
 # ================== VIEWS ==================
@@ -658,18 +705,47 @@ def delete_product_view(request, pk):
     return redirect("admin:pending_products")
 
 def media_gallery_view(request):
+    # Chỉ trả khung trang + bộ lọc, ảnh được nạp dần từ media_gallery_feed_view khi cuộn
     context = admin.site.each_context(request)
     context["title"] = "Media Gallery"
-    users = User.objects.exclude(avatar="").exclude(avatar__isnull=True)[:200]
-    stores = Store.objects.exclude(avatar="").exclude(avatar__isnull=True)[:200]
-    product_images = ProductImage.objects.select_related("product", "product__store")[:400]
     context.update({
-        "users_with_avatar": users,
-        "stores_with_avatar": stores,
-        "product_images": product_images,
+        "kinds": [("product", "Ảnh sản phẩm"), ("store", "Avatar cửa hàng"), ("user", "Avatar người dùng")],
+        "feed_url": reverse("admin:media_gallery_feed"),
     })
     return TemplateResponse(request, "admin/media/gallery.html", context)
 
+def media_gallery_feed_view(request):
+    # JSON cho cuộn vô hạn: ?kind=product|store|user&owner=<id>&from=YYYY-MM-DD&to=YYYY-MM-DD&cursor=...
+    # owner là id cửa hàng với product/store, id người dùng với user
+    kind = request.GET.get("kind", "product")
+    if kind not in GALLERY_SOURCES:
+        return JsonResponse({"error": "kind phải là product, store hoặc user"}, status=400)
+    owner = request.GET.get("owner") or None
+    raw_from, raw_to = request.GET.get("from") or None, request.GET.get("to") or None
+    try:
+        # parse_date trả None khi sai định dạng, raise ValueError khi ngày không tồn tại
+        date_from = parse_date(raw_from) if raw_from else None
+        date_to = parse_date(raw_to) if raw_to else None
+    except ValueError:
+        date_from = date_to = None
+    if (owner and not owner.isdigit()) or (raw_from and not date_from) or (raw_to and not date_to):
+        return JsonResponse({"error": "Bộ lọc không hợp lệ"}, status=400)
+
+    paginator = GalleryPaginator(("-id",), name=f"gallery-{kind}")
+    try:
+        rows = paginator.paginate_queryset(build_gallery_queryset(kind, owner, date_from, date_to), request)
+    except NotFound as e:
+        return JsonResponse({"error": str(e.detail)}, status=404)
+    thumb_options = variant_options("thumb")
+    return JsonResponse({
+        "next": paginator.get_next_link(),
+        "results": [gallery_item(kind, row, thumb_options) for row in rows],
+    })
+
+def url_cache_stats_view(request):
+    # Tỉ lệ trúng bộ đệm URL Cloudinary của process đang phục vụ request này
+    return JsonResponse(url_cache_stats())
+
 # ================== URL PATCH ==================
 def get_custom_admin_urls(original_get_urls):
     def custom_urls():
@@ -680,6 +756,9 @@ def get_custom_admin_urls(original_get_urls):
             path("moderation/pending-products/", admin.site.admin_view(pending_products_view), name="pending_products"),
             path("moderation/approve-product/<int:pk>/", admin.site.admin_view(approve_product_view), name="approve_product"),
             path("moderation/delete-product/<int:pk>/", admin.site.admin_view(delete_product_view), name="delete_product"),
+            path("reports/url-cache/", admin.site.admin_view(url_cache_stats_view), name="url_cache_stats"),
+            path("media/gallery/", admin.site.admin_view(media_gallery_view), name="media_gallery"),
+            path("media/gallery/feed/", admin.site.admin_view(media_gallery_feed_view), name="media_gallery_feed"),
         ]
         return custom + urls
     return custom_urls
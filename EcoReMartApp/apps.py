@@ -6,4 +6,5 @@ class EcoremartappConfig(AppConfig):
     name = 'EcoReMartApp'
 
     def ready(self):
+        import EcoReMartApp.checks
         import EcoReMartApp.signals
\ No newline at end of file
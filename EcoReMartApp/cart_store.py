@@ -0,0 +1,403 @@
+# Lưu giỏ hàng. CART_STORE trong settings chọn lớp (giống IMAGE_UPLOAD_BACKEND), các view giỏ hàng chỉ gọi
+# items/add/remove/flush nên đổi lớp không phải sửa view:
+# - DatabaseCartStore: mỗi thao tác đọc/ghi thẳng bảng CartItem như trước.
+# - CachedCartStore: giỏ của mỗi user là một entry trong Django cache, đọc và sửa ngay trên cache.
+#   Entry bị sửa được đánh dấu dirty, một luồng nền của process ghi xuống CartItem mỗi CART_STORE_FLUSH_INTERVAL
+#   giây (write-behind); checkout luôn gọi flush() trước khi đọc DB. Process chết thì mất tối đa một khoảng
+#   flush chưa ghi (entry trên cache vẫn dirty, lần sửa sau hoặc checkout sẽ ghi bù) - CART_STORE_WRITE_THROUGH
+#   bật chế độ an toàn: ghi DB ngay trong request rồi mới cập nhật cache, cache chỉ còn phục vụ đọc.
+#   Nhiều worker phải dùng cache chung (Redis/Memcached): LocMemCache chỉ sống trong một process.
+import atexit
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Case, DateTimeField, F, IntegerField, Subquery, Value, When
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from EcoReMartApp.models import Cart, CartItem, Product
+
+CACHE_ALIAS = getattr(settings, 'CART_STORE_CACHE', 'default')
+FLUSH_INTERVAL = getattr(settings, 'CART_STORE_FLUSH_INTERVAL', 2)
+WRITE_THROUGH = getattr(settings, 'CART_STORE_WRITE_THROUGH', False)
+# Entry đã ghi xuống DB hết hạn sau 1 ngày; entry dirty không hết hạn cho tới khi flush xong
+ENTRY_TIMEOUT = 24 * 60 * 60
+ENTRY_KEY = 'cart_store:{}'
+LOCK_KEY = 'cart_store:{}:lock'
+LOCK_TIMEOUT = 10  # giây, phòng process giữ khoá rồi chết
+LOCK_WAIT = 2
+BATCH_MAX_OPERATIONS = getattr(settings, 'CART_BATCH_MAX_OPERATIONS', 100)
+BATCH_OPS = ('add', 'set', 'remove')
+
+_store = None
+_store_lock = threading.Lock()
+
+
+class CartStoreError(Exception):
+    pass
+
+
+class CartItemMissing(CartStoreError):
+    pass
+
+
+class CartLimitExceeded(CartStoreError):
+    pass
+
+
+def next_quantity(current, quantity, available):
+    new_quantity = current + quantity
+    if new_quantity < 0:
+        raise CartStoreError("Số lượng không hợp lệ.")
+    if new_quantity > available:
+        raise CartLimitExceeded(new_quantity)
+    return new_quantity
+
+
+def parse_operations(data):
+    """
+    Body của endpoint batch: {"operations": [{"op": "add"|"set"|"remove", "product_id", "quantity"}]}.
+    add cộng quantity (khác 0, âm để giảm; giảm về 0 thì xoá khỏi giỏ), set đặt số lượng (>= 1), remove xoá.
+    Trả về list (op, product_id, quantity) theo thứ tự gửi lên.
+    """
+    operations = data.get('operations') if hasattr(data, 'get') else None
+    if not isinstance(operations, list) or not operations:
+        raise CartStoreError("operations phải là danh sách thao tác")
+    if len(operations) > BATCH_MAX_OPERATIONS:
+        raise CartStoreError(f"Tối đa {BATCH_MAX_OPERATIONS} thao tác mỗi lần")
+    parsed = []
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get('op') not in BATCH_OPS:
+            raise CartStoreError(f"Thao tác {index}: op phải là một trong {', '.join(BATCH_OPS)}")
+        op = operation['op']
+        try:
+            product_id = int(operation.get('product_id'))
+            quantity = None if op == 'remove' else int(operation.get('quantity'))
+        except (TypeError, ValueError):
+            raise CartStoreError(f"Thao tác {index}: product_id/quantity không hợp lệ")
+        if (op == 'add' and quantity == 0) or (op == 'set' and quantity < 1):
+            raise CartStoreError(f"Thao tác {index}: quantity không hợp lệ")
+        parsed.append((op, product_id, quantity))
+    return parsed
+
+
+def plan_operations(current, operations, available):
+    """
+    Áp lần lượt operations lên current {product_id: quantity} (chỉ cần các sản phẩm bị đụng tới), kiểm tra
+    với available {product_id: available_quantity}. Trả về {product_id: quantity mới, None nếu bị xoá} của các
+    sản phẩm có thay đổi; một thao tác sai thì báo lỗi cho cả lô.
+    """
+    state = dict(current)
+    for op, product_id, quantity in operations:
+        if op == 'remove':
+            state[product_id] = None
+            continue
+        if op == 'add' and state.get(product_id) is not None:
+            quantity = state[product_id] + quantity
+        elif quantity < 1:
+            raise CartItemMissing(f"Sản phẩm {product_id} chưa có trong giỏ hàng.")
+        if quantity < 0:
+            raise CartStoreError(f"Sản phẩm {product_id}: số lượng không hợp lệ.")
+        if quantity > available[product_id]:
+            raise CartLimitExceeded(f"Sản phẩm {product_id}: số lượng {quantity} vượt quá số lượng sẵn có "
+                                    f"({available[product_id]}).")
+        state[product_id] = quantity or None
+    return {pid: quantity for pid, quantity in state.items() if quantity != current.get(pid)}
+
+
+class DatabaseCartStore:
+    def items(self, user):
+        """[(product_id, quantity, updated_at)], dòng cập nhật gần nhất trước (thứ tự CartGroupedView)."""
+        return list(CartItem.objects.filter(cart__user=user).order_by('-updated_at', '-id')
+                    .values_list('product_id', 'quantity', 'updated_at'))
+
+    def add(self, user, product_id, quantity, available, create=True):
+        """
+        Cộng quantity vào dòng giỏ của product_id, trả về số lượng mới. Chưa có dòng thì tạo mới với quantity
+        (create=False thì báo CartItemMissing); tổng vượt tồn kho thì báo CartLimitExceeded, giảm về 0 thì xoá dòng.
+        Cộng bằng một câu UPDATE có điều kiện trên DB (quantity = quantity + n WHERE quantity + n <= tồn kho)
+        nên nhiều request cùng lúc không làm mất lượt cộng nào. Tồn kho so sánh là cột available_quantity
+        hiện tại, không phải available caller đọc trước đó (available chỉ dùng cho dòng mới ở view).
+        """
+        rows = CartItem.objects.filter(cart_id=Subquery(Cart.objects.filter(user=user).values('id')[:1]),
+                                       product_id=product_id)
+        if quantity >= 0:
+            stock = Subquery(Product.objects.filter(pk=product_id).values('available_quantity')[:1])
+            target = rows.alias(new_quantity=F('quantity') + quantity).filter(new_quantity__lte=stock)
+        else:
+            # Cột unsigned trên MySQL: không để biểu thức nào trong WHERE ra số âm. Giảm về đúng 0 thì xoá
+            # dòng như apply, nên UPDATE chỉ nhận dòng còn lại ít nhất 1
+            target = rows.filter(quantity__gt=-quantity)
+        for _ in range(3):
+            if quantity < 0 and rows.filter(quantity=-quantity).delete()[0]:
+                return 0
+            with transaction.atomic():
+                if target.update(quantity=F('quantity') + quantity, updated_at=timezone.now()):
+                    # Dòng đang bị khoá bởi UPDATE vừa rồi nên đọc lại đúng số lượng của request này
+                    return rows.values_list('quantity', flat=True).first()
+            current = rows.values_list('quantity', 'product__available_quantity').first()
+            if current is not None:
+                next_quantity(current[0], quantity, current[1])
+                continue  # số lượng vừa đổi giữa hai câu lệnh, thử lại
+            if not create:
+                raise CartItemMissing(product_id)
+            if quantity < 1:
+                raise CartStoreError("Số lượng không hợp lệ.")  # không thử lại: dòng mới không thể âm
+            cart, _ = Cart.objects.get_or_create(user=user)
+            try:
+                with transaction.atomic():
+                    CartItem.objects.create(cart=cart, product_id=product_id, quantity=quantity)
+                return quantity
+            except IntegrityError:
+                continue  # request khác vừa thêm cùng sản phẩm: cộng vào dòng đó
+        raise CartStoreError("Giỏ hàng đang bận, vui lòng thử lại.")
+
+    def remove(self, user, product_ids):
+        """Xoá các sản phẩm khỏi giỏ, trả về số dòng đã xoá (id không có trong giỏ thì bỏ qua)."""
+        deleted, _ = CartItem.objects.filter(cart__user=user, product_id__in=product_ids).delete()
+        return deleted
+
+    def apply(self, user, operations, available):
+        """
+        Áp một lô thao tác (parse_operations) trong một transaction, trả về thay đổi như plan_operations.
+        Ghi bằng một bulk_create, một bulk_update và một delete có filter.
+        """
+        product_ids = {product_id for _, product_id, _ in operations}
+        with transaction.atomic():
+            cart, _ = Cart.objects.get_or_create(user=user)
+            rows = {item.product_id: item for item in
+                    CartItem.objects.select_for_update().filter(cart=cart, product_id__in=product_ids)}
+            changes = plan_operations({pid: item.quantity for pid, item in rows.items()}, operations, available)
+            removed = [pid for pid, quantity in changes.items() if quantity is None]
+            if removed:
+                CartItem.objects.filter(cart=cart, product_id__in=removed).delete()
+            CartItem.objects.bulk_create([CartItem(cart=cart, product_id=pid, quantity=quantity)
+                                          for pid, quantity in changes.items()
+                                          if quantity is not None and pid not in rows])
+            # bulk_update không tự đặt auto_now
+            now = timezone.now()
+            updated = []
+            for pid, quantity in changes.items():
+                if quantity is not None and pid in rows:
+                    rows[pid].quantity, rows[pid].updated_at = quantity, now
+                    updated.append(rows[pid])
+            CartItem.objects.bulk_update(updated, ['quantity', 'updated_at'])
+        return changes
+
+    def flush(self, user):
+        pass
+
+
+class CachedCartStore(DatabaseCartStore):
+    """
+    Entry cache: {'cart_id', 'items': {product_id: (quantity, updated_at)}, 'dirty'}; items giữ thứ tự
+    cập nhật (dòng vừa sửa chuyển xuống cuối). Mỗi thao tác sửa giữ khoá theo user (cache.add) nên hai
+    request cùng lúc của một user không ghi đè nhau, và flush ghi đúng trạng thái đã thấy.
+    """
+    def __init__(self, cache=None, flush_interval=FLUSH_INTERVAL, write_through=WRITE_THROUGH):
+        self.cache = cache or caches[CACHE_ALIAS]
+        self.flush_interval = flush_interval
+        self.write_through = write_through
+        # Entry dirty do process này sửa, chờ luồng nền flush; cũng là bản dự phòng nếu cache bị đẩy entry ra
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+        self.flusher = None
+
+    @contextmanager
+    def lock(self, user_id):
+        key, token = LOCK_KEY.format(user_id), uuid.uuid4().hex
+        deadline = time.monotonic() + LOCK_WAIT
+        while not self.cache.add(key, token, LOCK_TIMEOUT):
+            if time.monotonic() > deadline:
+                raise CartStoreError("Giỏ hàng đang bận, vui lòng thử lại.")
+            time.sleep(0.002)
+        try:
+            yield
+        finally:
+            if self.cache.get(key) == token:
+                self.cache.delete(key)
+
+    def load(self, user_id):
+        entry = self.cache.get(ENTRY_KEY.format(user_id))
+        if entry is None:
+            with self.pending_lock:
+                entry = self.pending.get(user_id)
+        if entry is None:
+            cart, _ = Cart.objects.get_or_create(user_id=user_id)
+            rows = (CartItem.objects.filter(cart=cart).order_by('updated_at', 'id')
+                    .values_list('product_id', 'quantity', 'updated_at'))
+            entry = {'cart_id': cart.id, 'items': {pid: (q, ts) for pid, q, ts in rows}, 'dirty': False}
+        return entry
+
+    def save(self, user_id, entry, product_ids):
+        if self.write_through:
+            self.write_rows(entry, product_ids)
+        else:
+            entry['dirty'] = True
+            with self.pending_lock:
+                self.pending[user_id] = entry
+            self.start_flusher()
+        self.cache.set(ENTRY_KEY.format(user_id), entry, None if entry['dirty'] else ENTRY_TIMEOUT)
+
+    def items(self, user):
+        entry = self.cache.get(ENTRY_KEY.format(user.pk))
+        if entry is None:
+            with self.lock(user.pk):
+                entry = self.load(user.pk)
+                self.cache.set(ENTRY_KEY.format(user.pk), entry, None if entry['dirty'] else ENTRY_TIMEOUT)
+        return [(pid, q, ts) for pid, (q, ts) in reversed(entry['items'].items())]
+
+    def add(self, user, product_id, quantity, available, create=True):
+        with self.lock(user.pk):
+            entry = self.load(user.pk)
+            items = entry['items']
+            if product_id in items:
+                quantity = next_quantity(items[product_id][0], quantity, available)
+                del items[product_id]  # chuyển xuống cuối: dòng cập nhật gần nhất
+            elif not create:
+                raise CartItemMissing(product_id)
+            elif quantity < 1:
+                raise CartStoreError("Số lượng không hợp lệ.")
+            if quantity:
+                items[product_id] = (quantity, timezone.now())
+            self.save(user.pk, entry, [product_id])
+            return quantity
+
+    def apply(self, user, operations, available):
+        with self.lock(user.pk):
+            entry = self.load(user.pk)
+            items = entry['items']
+            product_ids = {product_id for _, product_id, _ in operations}
+            changes = plan_operations({pid: items[pid][0] for pid in product_ids if pid in items},
+                                      operations, available)
+            now = timezone.now()
+            for pid, quantity in changes.items():
+                items.pop(pid, None)
+                if quantity is not None:
+                    items[pid] = (quantity, now)
+            if changes:
+                self.save(user.pk, entry, list(changes))
+            return changes
+
+    def remove(self, user, product_ids):
+        with self.lock(user.pk):
+            entry = self.load(user.pk)
+            removed = [pid for pid in set(product_ids) if entry['items'].pop(pid, None) is not None]
+            if removed:
+                self.save(user.pk, entry, removed)
+            return len(removed)
+
+    def flush(self, user):
+        self.flush_user(user.pk)
+
+    def flush_user(self, user_id):
+        with self.lock(user_id):
+            key = ENTRY_KEY.format(user_id)
+            entry = self.cache.get(key)
+            if entry is None:
+                with self.pending_lock:
+                    entry = self.pending.get(user_id)
+            if entry is not None and entry['dirty']:
+                self.write(entry['cart_id'], entry['items'])
+                entry['dirty'] = False
+                self.cache.set(key, entry, ENTRY_TIMEOUT)
+            with self.pending_lock:
+                self.pending.pop(user_id, None)
+
+    def flush_pending(self):
+        with self.pending_lock:
+            user_ids = list(self.pending)
+        for user_id in user_ids:
+            try:
+                self.flush_user(user_id)
+            except Exception as e:
+                # Giữ lại trong pending để lần sau ghi tiếp
+                print(f"Lỗi ghi giỏ hàng của user {user_id} xuống DB: {e}")
+
+    def start_flusher(self):
+        if self.flusher is not None or not self.flush_interval:
+            return
+        with self.pending_lock:
+            if self.flusher is None:
+                self.flusher = threading.Thread(target=self.run_flusher, name='cart-store-flush', daemon=True)
+                self.flusher.start()
+                atexit.register(self.flush_pending)
+
+    def run_flusher(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush_pending()
+            close_old_connections()
+
+    def write_rows(self, entry, product_ids):
+        # write-through: entry không dirty thì khớp DB, chỉ cần ghi các dòng vừa sửa
+        cart_id, items = entry['cart_id'], entry['items']
+        if entry['dirty']:
+            # Còn thay đổi write-behind chưa ghi (vd. vừa đổi chế độ): ghi cả giỏ
+            self.write(cart_id, items)
+            entry['dirty'] = False
+            return
+        if len(product_ids) > 1:
+            self.write(cart_id, items, product_ids)
+            return
+        removed = [pid for pid in product_ids if pid not in items]
+        if removed:
+            CartItem.objects.filter(cart_id=cart_id, product_id__in=removed).delete()
+        for pid in product_ids:
+            if pid in items:
+                quantity, updated_at = items[pid]
+                rows = CartItem.objects.filter(cart_id=cart_id, product_id=pid)
+                if not rows.update(quantity=quantity, updated_at=updated_at):
+                    cart_item = CartItem.objects.create(cart_id=cart_id, product_id=pid, quantity=quantity)
+                    items[pid] = (quantity, cart_item.updated_at)
+
+    @staticmethod
+    def write(cart_id, items, product_ids=None):
+        """
+        Đồng bộ bảng CartItem của cart_id với items: xoá dòng không còn, bulk_create dòng mới, rồi một UPDATE
+        cho quantity/updated_at của các dòng đổi. product_ids giới hạn việc đồng bộ vào vài sản phẩm.
+        """
+        rows = CartItem.objects.filter(cart_id=cart_id)
+        wanted = items
+        if product_ids is not None:
+            rows = rows.filter(product_id__in=product_ids)
+            wanted = {pid: items[pid] for pid in product_ids if pid in items}
+        with transaction.atomic():
+            existing = {pid: (q, ts) for pid, q, ts in rows.values_list('product_id', 'quantity', 'updated_at')}
+            stale = [pid for pid in existing if pid not in wanted]
+            if stale:
+                CartItem.objects.filter(cart_id=cart_id, product_id__in=stale).delete()
+            new = [pid for pid in wanted if pid not in existing]
+            if new:
+                # Sản phẩm có thể đã bị xoá sau khi được thêm vào giỏ: bỏ luôn khỏi entry (flush lưu lại entry)
+                existing_products = set(Product.objects.filter(id__in=new).values_list('id', flat=True))
+                for pid in new:
+                    if pid not in existing_products:
+                        items.pop(pid, None)
+                new = [pid for pid in new if pid in existing_products]
+                CartItem.objects.bulk_create([CartItem(cart_id=cart_id, product_id=pid, quantity=wanted[pid][0])
+                                              for pid in new])
+            # bulk_create luôn lấy updated_at lúc ghi (auto_now) nên dòng mới cũng đặt lại updated_at ở đây
+            changed = {pid: wanted[pid] for pid in new}
+            changed.update((pid, wanted[pid]) for pid in existing if pid in wanted and existing[pid] != wanted[pid])
+            if changed:
+                CartItem.objects.filter(cart_id=cart_id, product_id__in=changed).update(
+                    quantity=Case(*[When(product_id=pid, then=Value(q)) for pid, (q, _) in changed.items()],
+                                  output_field=IntegerField()),
+                    updated_at=Case(*[When(product_id=pid, then=Value(ts)) for pid, (_, ts) in changed.items()],
+                                    output_field=DateTimeField()),
+                )
+
+
+def get_cart_store():
+    # Một instance cho cả process: CachedCartStore giữ luồng flush và danh sách entry chờ ghi
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = import_string(getattr(settings, 'CART_STORE', 'EcoReMartApp.cart_store.DatabaseCartStore'))()
+        return _store
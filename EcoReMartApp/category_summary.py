@@ -0,0 +1,109 @@
+# Tổng hợp danh mục cho trang chủ: số sản phẩm đang bán + vài sản phẩm nổi bật của mỗi danh mục.
+# Mỗi danh mục lưu một key cache riêng để cập nhật từng phần khi ProductCategory/Product thay đổi,
+# khi cache còn thì endpoint không chạy truy vấn DB nào.
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+
+from EcoReMartApp.models import Category, Product, ProductCategory
+
+CATEGORY_IDS_KEY = 'category_summary:ids'
+CATEGORY_KEY = 'category_summary:{}'
+PREVIEW_SIZE = getattr(settings, 'CATEGORY_SUMMARY_PREVIEW_SIZE', 4)
+# Dựng lại toàn bộ định kỳ để bắt kịp thay đổi thứ hạng purchases không qua signal
+CACHE_TIMEOUT = getattr(settings, 'CATEGORY_SUMMARY_CACHE_TIMEOUT', 60 * 60)
+
+
+def listed_products():
+    # Cùng điều kiện với ProductViewSet.queryset
+    return Product.objects.filter(active=True, available_quantity__gt=0)
+
+
+def get_category_summary():
+    category_ids = cache.get(CATEGORY_IDS_KEY)
+    if category_ids is None:
+        return rebuild_category_summary()
+    cached = cache.get_many([CATEGORY_KEY.format(cid) for cid in category_ids])
+    missing = [cid for cid in category_ids if CATEGORY_KEY.format(cid) not in cached]
+    if missing:
+        cached.update({CATEGORY_KEY.format(e['id']): e for e in refresh_categories(missing)})
+    return [cached[CATEGORY_KEY.format(cid)] for cid in category_ids
+            if CATEGORY_KEY.format(cid) in cached]
+
+
+def rebuild_category_summary():
+    categories = list(Category.objects.all())
+    entries = build_entries(categories)
+    cache.set_many({CATEGORY_KEY.format(e['id']): e for e in entries}, CACHE_TIMEOUT)
+    cache.set(CATEGORY_IDS_KEY, [c.id for c in categories], CACHE_TIMEOUT)
+    return entries
+
+
+def refresh_categories(category_ids):
+    # Chỉ tính lại các danh mục bị ảnh hưởng; danh mục đã bị xoá thì bỏ khỏi cache
+    category_ids = set(category_ids)
+    if not category_ids:
+        return []
+    categories = list(Category.objects.filter(id__in=category_ids))
+    entries = build_entries(categories)
+    cache.set_many({CATEGORY_KEY.format(e['id']): e for e in entries}, CACHE_TIMEOUT)
+    removed = category_ids - {c.id for c in categories}
+    if removed:
+        cache.delete_many([CATEGORY_KEY.format(cid) for cid in removed])
+    return entries
+
+
+def refresh_product_categories(product_ids):
+    category_ids = ProductCategory.objects.filter(product_id__in=product_ids).values_list('category_id', flat=True)
+    return refresh_categories(category_ids)
+
+
+def is_previewed(product_id, category_ids):
+    cached = cache.get_many([CATEGORY_KEY.format(cid) for cid in category_ids])
+    return any(card['id'] == product_id for entry in cached.values() for card in entry['products'])
+
+
+def invalidate_category_list():
+    # Thêm/xoá danh mục: lần đọc sau dựng lại danh sách id
+    cache.delete(CATEGORY_IDS_KEY)
+
+
+def build_entries(categories):
+    from EcoReMartApp.serializers import ProductSerializer
+
+    if not categories:
+        return []
+    category_ids = [c.id for c in categories]
+    links = ProductCategory.objects.filter(category_id__in=category_ids,
+                                           product__in=listed_products())
+
+    counts = dict(
+        links.values('category_id').annotate(n=Count('product_id', distinct=True))
+        .values_list('category_id', 'n').order_by()
+    )
+    ranked = (
+        links.annotate(rank=Window(
+            RowNumber(),
+            partition_by=F('category_id'),
+            order_by=[F('product__purchases').desc(), F('product_id').desc()],
+        ))
+        .filter(rank__lte=PREVIEW_SIZE)
+        .values_list('category_id', 'product_id')
+    )
+    preview_ids = {}
+    for category_id, product_id in ranked:
+        preview_ids.setdefault(category_id, []).append(product_id)
+
+    products = Product.objects.select_related('store').in_bulk(
+        {pid for ids in preview_ids.values() for pid in ids}
+    )
+    cards = {pid: data for pid, data in zip(
+        products, ProductSerializer(list(products.values()), many=True).data
+    )}
+    return [{
+        'id': c.id,
+        'name': c.name,
+        'product_count': counts.get(c.id, 0),
+        'products': [cards[pid] for pid in preview_ids.get(c.id, [])],
+    } for c in categories]
@@ -0,0 +1,24 @@
+# Kiểm tra cấu hình lúc khởi động (manage.py check/runserver/migrate).
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# Backend cache chỉ sống trong một process: mỗi worker một bản riêng
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches)
+def shared_cache_check(app_configs, **kwargs):
+    # category_summary chỉ refresh cache của worker nhận request sửa sản phẩm; cache riêng từng process thì
+    # các worker khác trả số liệu danh mục cũ tới hết CATEGORY_SUMMARY_CACHE_TIMEOUT
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        f"CACHES['default'] dùng {backend}, cache riêng từng process",
+        hint="Chạy nhiều worker thì đặt CACHE_BACKEND/CACHE_LOCATION sang Redis hoặc Memcached, nếu không "
+             "tổng hợp danh mục ở các worker khác bị cũ tới CATEGORY_SUMMARY_CACHE_TIMEOUT.",
+        id='EcoReMartApp.W001',
+    )]
@@ -0,0 +1,101 @@
+# Dựng URL Cloudinary có nhớ đệm LRU theo (public_id, tuỳ chọn/transformation).
+# cloudinary_url() dựng chuỗi (và ký nếu sign_url) mỗi lần gọi, trong khi một trang danh sách lặp lại
+# cùng avatar cửa hàng, cùng ảnh sản phẩm qua nhiều request. Bộ đệm nằm trong từng process, giới hạn
+# CLOUDINARY_URL_CACHE_SIZE phần tử; URL chỉ phụ thuộc public_id + tuỳ chọn + cấu hình nên không cần hết hạn.
+# URL do backend đang dùng (IMAGE_UPLOAD_BACKEND) dựng, đổi backend trong process thì gọi url_cache.clear().
+import threading
+from collections import OrderedDict
+
+from cloudinary import CloudinaryResource
+from django.conf import settings
+
+from EcoReMartApp.media_backends import get_backend
+
+URL_CACHE_SIZE = getattr(settings, 'CLOUDINARY_URL_CACHE_SIZE', 4096)
+IMAGE_VARIANTS = getattr(settings, 'CLOUDINARY_IMAGE_VARIANTS', {})
+ORIGINAL_VARIANT = 'original'
+
+
+class UrlCache:
+    def __init__(self, maxsize=URL_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, public_id, options):
+        key = (public_id, freeze(options))
+        with self.lock:
+            url = self.entries.get(key)
+            if url is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return url
+            self.misses += 1
+        url = get_backend().url(public_id, **options)
+        with self.lock:
+            self.entries[key] = url
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return url
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+            }
+
+
+def freeze(value):
+    # dict/list tuỳ chọn (vd. transformation) -> tuple để làm khoá
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+url_cache = UrlCache()
+
+
+def cloudinary_image_url(public_id, **options):
+    """Giống cloudinary_url(public_id, **options)[0] (hoặc URL của backend đang dùng) nhưng có nhớ đệm."""
+    if not public_id:
+        return None
+    return url_cache.get(str(public_id), options)
+
+
+def resource_url(resource, **options):
+    """URL của một CloudinaryResource (giá trị CloudinaryField), giống resource.build_url(**options)."""
+    if not resource:
+        return None
+    if not isinstance(resource, CloudinaryResource):
+        return cloudinary_image_url(resource, **options)
+    combined = dict(format=resource.format, version=resource.version, type=resource.type,
+                    resource_type=resource.resource_type or 'image')
+    combined.update(options)
+    return url_cache.get(resource.public_id, combined)
+
+
+def variant_options(variant):
+    return {} if variant == ORIGINAL_VARIANT else IMAGE_VARIANTS[variant]
+
+
+def image_srcset(resource):
+    # {"thumb": url, "card": url, "full": url} để client tự chọn theo kích thước hiển thị
+    if not resource:
+        return None
+    return {name: resource_url(resource, **options) for name, options in IMAGE_VARIANTS.items()}
+
+
+def url_cache_stats():
+    return url_cache.stats()
@@ -0,0 +1,86 @@
+# Upload ảnh trực tiếp từ client lên storage, file không đi qua worker Django.
+# 1. Client xin tham số đã ký (issue_upload_params): mỗi ảnh một public_id do server sinh, nằm trong
+#    thư mục riêng của user, kèm timestamp và chữ ký nên client không đổi được public_id/định dạng.
+# 2. Client POST file thẳng lên upload_url, storage trả về public_id, version, format, signature.
+# 3. Client gửi kết quả đó cho bước attach: verify_uploads kiểm tra thư mục của user, chữ ký storage,
+#    thời hạn và ảnh chưa được gắn ở đâu, rồi mới gắn vào Product/Comment/User/Store.
+# Upload multipart qua request.FILES vẫn giữ nguyên để dùng khi client không upload trực tiếp được.
+import time
+import uuid
+
+from cloudinary import CloudinaryResource
+from django.conf import settings
+
+from EcoReMartApp.media_backends import get_backend
+from EcoReMartApp.models import CommentImage, ProductImage, Store, User
+
+UPLOAD_FOLDER = getattr(settings, 'DIRECT_UPLOAD_FOLDER', 'ecoremart/direct')
+# Thời gian từ lúc ký đến lúc attach; Cloudinary tự từ chối chữ ký cũ hơn 1 giờ
+UPLOAD_TTL = getattr(settings, 'DIRECT_UPLOAD_TTL', 15 * 60)
+MAX_FILES = getattr(settings, 'DIRECT_UPLOAD_MAX_FILES', 10)
+ALLOWED_FORMATS = ('jpg', 'jpeg', 'png', 'webp', 'heic')
+
+
+class DirectUploadError(Exception):
+    pass
+
+
+def owner_prefix(user):
+    return f"{UPLOAD_FOLDER}/u{user.pk}/"
+
+
+def issue_upload_params(user, count, backend=None):
+    backend = backend or get_backend()
+    timestamp = int(time.time())
+    uploads = [
+        backend.sign_upload({
+            'public_id': owner_prefix(user) + uuid.uuid4().hex,
+            'timestamp': timestamp,
+            'allowed_formats': ','.join(ALLOWED_FORMATS),
+        })
+        for _ in range(count)
+    ]
+    return {'upload_url': backend.upload_url(), 'expires_at': timestamp + UPLOAD_TTL, 'uploads': uploads}
+
+
+def verify_uploads(user, items, backend=None):
+    """Kiểm tra kết quả upload client gửi lên, trả về list CloudinaryResource theo thứ tự."""
+    if not isinstance(items, list) or not items:
+        raise DirectUploadError("images phải là danh sách kết quả upload")
+    if len(items) > MAX_FILES:
+        raise DirectUploadError(f"Tối đa {MAX_FILES} ảnh mỗi lần")
+    backend = backend or get_backend()
+    now = time.time()
+    resources = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise DirectUploadError("Mỗi ảnh phải có public_id, version, format, signature")
+        public_id = str(item.get('public_id') or '')
+        image_format = str(item.get('format') or '').lower()
+        signature = str(item.get('signature') or '')
+        try:
+            version = int(item.get('version'))
+        except (TypeError, ValueError):
+            raise DirectUploadError(f"version không hợp lệ: {public_id}")
+        if not public_id.startswith(owner_prefix(user)):
+            raise DirectUploadError(f"Ảnh không thuộc về bạn: {public_id}")
+        if image_format not in ALLOWED_FORMATS:
+            raise DirectUploadError(f"Định dạng không được hỗ trợ: {public_id}")
+        if now - version > UPLOAD_TTL:
+            raise DirectUploadError(f"Ảnh đã hết hạn gắn, hãy upload lại: {public_id}")
+        if not backend.verify_upload(public_id, version, signature):
+            raise DirectUploadError(f"Chữ ký không hợp lệ: {public_id}")
+        resources.append(CloudinaryResource(public_id, version=str(version), format=image_format,
+                                            type='upload', resource_type='image'))
+
+    values = [resource.get_prep_value() for resource in resources]
+    if len(set(values)) != len(values) or already_attached(values):
+        raise DirectUploadError("Ảnh đã được gắn trước đó")
+    return resources
+
+
+def already_attached(values):
+    return (ProductImage.objects.filter(image__in=values).exists()
+            or CommentImage.objects.filter(image__in=values).exists()
+            or User.objects.filter(avatar__in=values).exists()
+            or Store.objects.filter(avatar__in=values).exists())
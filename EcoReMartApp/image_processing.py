@@ -0,0 +1,85 @@
+# Chuẩn hoá ảnh trước khi upload: xoay theo EXIF rồi bỏ EXIF (có cả toạ độ GPS), thu nhỏ cạnh dài
+# về IMAGE_MAX_DIMENSION, nén lại JPEG theo IMAGE_JPEG_QUALITY (ảnh có nền trong suốt giữ PNG).
+# Kết quả ghi vào SpooledTemporaryFile: nhỏ thì nằm trong RAM, lớn hơn IMAGE_SPOOL_MAX_SIZE thì tràn ra đĩa.
+import os
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+MAX_DIMENSION = getattr(settings, 'IMAGE_MAX_DIMENSION', 2048)
+JPEG_QUALITY = getattr(settings, 'IMAGE_JPEG_QUALITY', 82)
+SPOOL_MAX_SIZE = getattr(settings, 'IMAGE_SPOOL_MAX_SIZE', 2 * 1024 * 1024)
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+
+
+def normalize_image(file, max_dimension=MAX_DIMENSION, quality=JPEG_QUALITY):
+    """
+    Trả về UploadedFile mới đã chuẩn hoá. File Pillow không đọc được (vd. HEIC khi thiếu plugin)
+    được trả lại nguyên vẹn để storage tự xử lý.
+    """
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    try:
+        image = Image.open(file)
+        # JPEG: giải mã thẳng ở tỉ lệ 1/2, 1/4, 1/8 gần kích thước đích, đỡ tốn RAM và CPU
+        image.draft('RGB', (max_dimension, max_dimension))
+        image = ImageOps.exif_transpose(image)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        if hasattr(file, 'seek'):
+            file.seek(0)
+        return file
+
+    image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    icc_profile = image.info.get('icc_profile')
+    output = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    # Không truyền exif= khi save nên EXIF bị bỏ
+    if has_alpha(image):
+        image.convert('RGBA').save(output, 'PNG', optimize=True, icc_profile=icc_profile)
+        extension, content_type = 'png', 'image/png'
+    else:
+        image.convert('RGB').save(output, 'JPEG', quality=quality, optimize=True, progressive=True,
+                                  icc_profile=icc_profile)
+        extension, content_type = 'jpg', 'image/jpeg'
+    size = output.tell()
+    output.seek(0)
+
+    base = os.path.splitext(os.path.basename(getattr(file, 'name', None) or 'image'))[0]
+    return UploadedFile(output, name=f"{base}.{extension}", content_type=content_type, size=size)
+
+
+def image_hash(file, size=8):
+    """
+    Hash nhận dạng ảnh dạng hex 35 ký tự: dHash ngang + dHash dọc (mỗi cái 64 bit, so từng điểm ảnh xám
+    thu nhỏ với điểm bên cạnh) + màu trung bình 4 bit mỗi kênh. Ảnh nén lại/đổi cỡ vẫn cho cùng hash;
+    phần màu để ảnh phẳng (vd. nền trơn khác màu) không bị coi là trùng nhau. None nếu Pillow không đọc được.
+    """
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    try:
+        with Image.open(file) as image:
+            image.draft('RGB', ((size + 1) * 4, (size + 1) * 4))
+            image = ImageOps.exif_transpose(image).convert('RGB')
+            gray = image.convert('L')
+            horizontal = gray.resize((size + 1, size), Image.LANCZOS).tobytes()
+            vertical = gray.resize((size, size + 1), Image.LANCZOS).tobytes()
+            mean = image.resize((1, 1), Image.BOX).getpixel((0, 0))
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        return None
+    finally:
+        if hasattr(file, 'seek'):
+            file.seek(0)
+    bits = 0
+    for row in range(size):
+        line = horizontal[row * (size + 1):(row + 1) * (size + 1)]
+        for left, right in zip(line, line[1:]):
+            bits = (bits << 1) | (left > right)
+    for row in range(size):
+        for col in range(size):
+            bits = (bits << 1) | (vertical[row * size + col] > vertical[(row + 1) * size + col])
+    color = ''.join(f"{channel >> 4:x}" for channel in mean)
+    return f"{bits:0{size * size // 2}x}{color}"
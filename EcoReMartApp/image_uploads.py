@@ -0,0 +1,158 @@
+# Upload ảnh của một request song song trên thread pool có giới hạn (IMAGE_UPLOAD_WORKERS, dùng chung
+# cho cả process), sau đó mới tạo các dòng ProductImage/CommentImage bằng bulk_create.
+# Một ảnh lỗi thì huỷ các ảnh chưa chạy, xoá các ảnh đã lên storage và báo ImageUploadError,
+# nên không còn ảnh mồ côi trên storage hay sản phẩm/bình luận thiếu ảnh.
+# Ảnh trùng (cùng image_hash: dHash + màu trung bình) với ảnh đã có trong phạm vi reuse_from thì dùng lại
+# asset cũ thay vì upload lại, nên một asset có thể được nhiều dòng trỏ tới: chỉ xoá trên storage
+# qua discard_unreferenced.
+import threading
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+from django.conf import settings
+
+from EcoReMartApp.image_processing import image_hash, normalize_image
+from EcoReMartApp.media_backends import get_backend
+
+UPLOAD_WORKERS = getattr(settings, 'IMAGE_UPLOAD_WORKERS', 4)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class ImageUploadError(Exception):
+    pass
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix='image-upload')
+        return _executor
+
+
+def field_upload_options(model, field_name='image'):
+    # Cùng tuỳ chọn CloudinaryField dùng khi tự upload trong pre_save
+    field = model._meta.get_field(field_name)
+    options = {'type': field.type, 'resource_type': field.resource_type}
+    options.update(field.options)
+    return options
+
+
+def prepare_one(file, normalize):
+    # Chuẩn hoá và tính hash ngay trong thread pool để các ảnh được xử lý song song
+    if normalize:
+        file = normalize_image(file)
+    return file, image_hash(file)
+
+
+def upload_one(backend, file, options):
+    if hasattr(file, 'seekable') and file.seekable():
+        file.seek(0)
+    return backend.upload(file, **options)
+
+
+def reusable_assets(reuse_from, hashes, field_name='image'):
+    # {hash: CloudinaryResource} của các dòng ảnh đã có trong phạm vi reuse_from (vd. ảnh cùng store)
+    hashes = {h for h in hashes if h}
+    if reuse_from is None or not hashes:
+        return {}
+    assets = {}
+    rows = (reuse_from.filter(image_hash__in=hashes).exclude(**{f'{field_name}__isnull': True})
+            .order_by('id').values_list('image_hash', field_name))
+    for h, resource in rows:
+        assets.setdefault(h, resource)
+    return assets
+
+
+def upload_images(files, model, field_name='image', backend=None, executor=None, normalize=True, reuse_from=None):
+    """
+    Upload song song, trả về list CloudinaryResource theo đúng thứ tự files, mỗi resource có thêm
+    image_hash. reuse_from: queryset các dòng ảnh (cùng model) được phép dùng lại asset, ảnh có hash
+    trùng thì không upload mà lấy asset đó (resource.reused = True); ảnh trùng nhau trong cùng request
+    chỉ upload một lần.
+    """
+    files = list(files)
+    if not files:
+        return []
+    backend = backend or get_backend()
+    executor = executor or get_executor()
+    options = field_upload_options(model, field_name)
+    try:
+        prepared = list(executor.map(prepare_one, files, [normalize] * len(files)))
+    except Exception as e:
+        raise ImageUploadError(f"Không xử lý được ảnh: {e}")
+
+    reusable = reusable_assets(reuse_from, [h for _, h in prepared], field_name)
+    keys, pending_files = [], {}
+    for index, (file, h) in enumerate(prepared):
+        key = h or index  # ảnh không tính được hash thì luôn upload riêng
+        keys.append(key)
+        if key not in reusable and key not in pending_files:
+            pending_files[key] = file
+    futures = {key: executor.submit(upload_one, backend, file, options) for key, file in pending_files.items()}
+    done, pending = wait(futures.values(), return_when=FIRST_EXCEPTION)
+    failed = [f for f in done if f.exception() is not None]
+    if failed:
+        for future in pending:
+            future.cancel()
+        wait(pending)
+        uploaded = [f.result() for f in futures.values() if not f.cancelled() and f.exception() is None]
+        discard_uploads(uploaded, backend)
+        raise ImageUploadError(f"Upload {len(failed)}/{len(futures)} ảnh thất bại: {failed[0].exception()}")
+
+    resources = []
+    for key, (_, h) in zip(keys, prepared):
+        if key in reusable:
+            resource = reusable[key]
+            resource.reused = True
+        else:
+            resource = futures[key].result()
+        resource.image_hash = h
+        resources.append(resource)
+    return resources
+
+
+def discard_uploads(resources, backend=None):
+    # Xoá ảnh đã upload mà không được dùng (một lần gọi cho mỗi nhóm resource_type/type).
+    # Asset dùng lại của dòng khác (resource.reused) không bị xoá.
+    groups = {}
+    for resource in resources:
+        if resource and not getattr(resource, 'reused', False):
+            ids = groups.setdefault((resource.resource_type or 'image', resource.type), {})
+            ids[resource.public_id] = None
+    if not groups:
+        return
+    backend = backend or get_backend()
+    for (resource_type, type_), public_ids in groups.items():
+        public_ids = list(public_ids)
+        try:
+            backend.delete(public_ids, resource_type=resource_type, type=type_)
+        except Exception as e:
+            print(f"Không xoá được {len(public_ids)} ảnh đã upload {public_ids}: {e}")
+
+
+def discard_unreferenced(resources, backend=None):
+    # Xoá trên storage các ảnh không còn dòng nào trong DB trỏ tới (một asset có thể được dùng ở nhiều nơi)
+    from EcoReMartApp.models import CommentImage, ProductImage, Store, User
+
+    values = {resource.get_prep_value(): resource for resource in resources if resource}
+    if not values:
+        return
+    for model, field in ((ProductImage, 'image'), (CommentImage, 'image'), (User, 'avatar'), (Store, 'avatar')):
+        for value in model.objects.filter(**{f'{field}__in': list(values)}).values_list(field, flat=True):
+            values.pop(value.get_prep_value() if value else value, None)
+    discard_uploads(values.values(), backend)
+
+
+def create_image_rows(model, resources, start_position=None, **parent):
+    """
+    bulk_create các dòng ảnh đã upload, vd. create_image_rows(ProductImage, resources, 0, product=p).
+    start_position: gán position tăng dần từ giá trị này (chỉ ProductImage có position).
+    """
+    rows = [model(image=resource, image_hash=getattr(resource, 'image_hash', None), **parent)
+            for resource in resources]
+    if start_position is not None:
+        for position, row in enumerate(rows, start=start_position):
+            row.position = position
+    return model.objects.bulk_create(rows)
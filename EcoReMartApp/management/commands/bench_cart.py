@@ -0,0 +1,99 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+
+from EcoReMartApp.cloudinary_urls import cloudinary_image_url
+from EcoReMartApp.models import Cart, CartItem, Product, User
+from EcoReMartApp.projections import CartProjection
+from EcoReMartApp.serializers import CartItemsSerializer
+
+EXTRA_KEYS = ('item_count', 'quantity', 'subtotal')
+
+
+def legacy_groups(user):
+    # CartGroupedView cũ: select_related store rồi CartItemsSerializer cho từng nhóm
+    cart_items = user.cart.items.select_related('product__store').order_by('-updated_at', '-id')
+    grouped, latest = {}, {}
+    for item in cart_items:
+        grouped.setdefault(item.product.store_id, []).append(item)
+        latest[item.product.store_id] = max(latest.get(item.product.store_id, item.updated_at), item.updated_at)
+    return [
+        {
+            "store": {
+                "id": grouped[store_id][0].product.store.id,
+                "name": grouped[store_id][0].product.store.name,
+                "avatar": cloudinary_image_url(grouped[store_id][0].product.store.avatar),
+            },
+            "products": CartItemsSerializer(grouped[store_id], many=True).data,
+        }
+        for store_id in sorted(latest, key=lambda store_id: latest[store_id], reverse=True)
+    ]
+
+
+class Command(BaseCommand):
+    help = ("Kiểm tra CartProjection cho ra cùng output với CartGroupedView cũ (so từng byte JSON) và tổng tiền "
+            "đúng, rồi đo thời gian và số truy vấn của hai cách. --fill N thêm tạm N sản phẩm vào giỏ (rollback)")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Email người dùng, mặc định người có giỏ nhiều sản phẩm nhất")
+        parser.add_argument("--fill", type=int, default=0)
+        parser.add_argument("--repeat", type=int, default=50)
+
+    def handle(self, *args, **options):
+        user = self.pick_user(options["user"])
+        with transaction.atomic():
+            if options["fill"]:
+                self.fill(user, options["fill"])
+            self.run(user, options["repeat"])
+            transaction.set_rollback(True)
+
+    def pick_user(self, email):
+        if email:
+            user = User.objects.filter(email=email).first()
+        else:
+            top = (CartItem.objects.values("cart__user_id").annotate(rows=Count("id"))
+                   .order_by("-rows").first())
+            user = User.objects.filter(pk=top["cart__user_id"]).first() if top else User.objects.first()
+        if user is None:
+            raise CommandError("Không tìm thấy người dùng")
+        return user
+
+    def fill(self, user, count):
+        cart, _ = Cart.objects.get_or_create(user=user)
+        taken = set(cart.items.values_list("product_id", flat=True))
+        products = Product.objects.filter(active=True).exclude(id__in=taken).order_by("?")[:count]
+        CartItem.objects.bulk_create([CartItem(cart=cart, product=p, quantity=1 + p.id % 3) for p in products])
+
+    def run(self, user, repeat):
+        renderer = JSONRenderer()
+        projection = CartProjection()
+        groups = projection.groups(user)
+        expected = renderer.render(legacy_groups(user))
+        actual = renderer.render([{k: v for k, v in g.items() if k not in EXTRA_KEYS} for g in groups])
+        if expected != actual:
+            raise CommandError(f"Output khác CartGroupedView cũ:\n{expected[:500]}\n{actual[:500]}")
+
+        items = list(CartItem.objects.filter(cart__user=user).select_related("product"))
+        total = sum((item.product.price * item.quantity for item in items), Decimal(0))
+        summary = projection.summary(groups)
+        if Decimal(summary["total"]) != total or summary["quantity"] != sum(i.quantity for i in items):
+            raise CommandError(f"Tổng giỏ sai: {summary['total']} != {total}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{user.email}: {len(items)} sản phẩm, {len(groups)} cửa hàng, tổng {summary['total']}, "
+            f"output giống cách cũ"))
+
+        for name, fn in (("cách cũ", lambda: renderer.render(legacy_groups(user))),
+                         ("projection", lambda: renderer.render(projection.summary(projection.groups(user))))):
+            reset_queries()
+            with CaptureQueriesContext(connection) as queries:
+                fn()
+            start = time.perf_counter()
+            for _ in range(repeat):
+                fn()
+            elapsed = (time.perf_counter() - start) / repeat * 1000
+            self.stdout.write(f"  {name:>10}: {elapsed:7.2f} ms/lần, {len(queries)} truy vấn")
@@ -0,0 +1,129 @@
+import random
+import time
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from EcoReMartApp.cart_store import CachedCartStore, CartStoreError, DatabaseCartStore
+from EcoReMartApp.models import Cart, CartItem, Product, User
+
+
+def available_for(product_id):
+    # Tồn kho giả cố định theo id để chuỗi thao tác có cả trường hợp vượt số lượng
+    return 5 + product_id % 11
+
+
+def make_operations(product_ids, count, seed):
+    rng = random.Random(seed)
+    operations = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.55:
+            operations.append(("add", rng.choice(product_ids), rng.randint(1, 3)))
+        elif roll < 0.85:
+            operations.append(("update", rng.choice(product_ids), rng.choice((-1, 1, 2))))
+        else:
+            operations.append(("remove", rng.sample(product_ids, rng.randint(1, 2)), None))
+    return operations
+
+
+def apply(store, user, operations):
+    for kind, target, quantity in operations:
+        try:
+            if kind == "remove":
+                store.remove(user, target)
+            else:
+                store.add(user, target, quantity, available_for(target), create=kind == "add")
+        except CartStoreError:
+            pass
+
+
+def expected_cart(operations):
+    # Mô phỏng cùng quy tắc add/remove bằng dict thuần để đối chiếu kết quả của từng store
+    cart = {}
+    for kind, target, quantity in operations:
+        if kind == "remove":
+            for product_id in target:
+                cart.pop(product_id, None)
+        elif target in cart:
+            if 0 <= cart[target] + quantity <= available_for(target):
+                cart[target] += quantity
+                if not cart[target]:
+                    del cart[target]  # giảm về 0 thì xoá dòng
+        elif kind == "add":
+            cart[target] = quantity
+    return cart
+
+
+class Command(BaseCommand):
+    help = ("Đo số thao tác giỏ hàng (add/update/remove) mỗi giây của DatabaseCartStore và CachedCartStore "
+            "(write-behind và write-through), kiểm tra CartItem sau flush khớp mô phỏng. Chạy trong "
+            "transaction rồi rollback")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Email người dùng, mặc định người đầu tiên")
+        parser.add_argument("--operations", type=int, default=2000)
+        parser.add_argument("--products", type=int, default=20, help="Số sản phẩm khác nhau được thao tác")
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        user = (User.objects.filter(email=options["user"]) if options["user"] else User.objects.order_by("id")).first()
+        if user is None:
+            raise CommandError("Không tìm thấy người dùng")
+        product_ids = list(Product.objects.order_by("id").values_list("id", flat=True)[:options["products"]])
+        if not product_ids:
+            raise CommandError("Chưa có sản phẩm")
+        operations = make_operations(product_ids, options["operations"], options["seed"])
+        expected = expected_cart(operations)
+        self.stdout.write(f"{user.email}: {len(operations)} thao tác trên {len(product_ids)} sản phẩm, "
+                          f"giỏ cuối có {len(expected)} sản phẩm")
+
+        stores = (
+            ("database", lambda cache: DatabaseCartStore()),
+            ("write-behind", lambda cache: CachedCartStore(cache=cache, flush_interval=None)),
+            ("write-through", lambda cache: CachedCartStore(cache=cache, write_through=True)),
+        )
+        baseline = None
+        for name, factory in stores:
+            cache = LocMemCache(f"bench-cart-store-{name}", {})
+            cache.clear()
+            store = factory(cache)
+            with transaction.atomic():
+                Cart.objects.get_or_create(user=user)
+                CartItem.objects.filter(cart__user=user).delete()
+                # DatabaseCartStore so với cột available_quantity nên đặt tồn kho giả vào DB (rollback sau)
+                for product_id in product_ids:
+                    Product.objects.filter(pk=product_id).update(available_quantity=available_for(product_id))
+                rate, queries, flush_ms = self.run(store, user, operations)
+                self.verify(name, store, user, expected)
+                transaction.set_rollback(True)
+            baseline = baseline or rate
+            self.stdout.write(f"  {name:>13}: {rate:9.0f} thao tác/s ({rate / baseline:5.1f}x), "
+                              f"{queries / len(operations):.2f} truy vấn/thao tác, flush {flush_ms:.1f} ms")
+
+    def run(self, store, user, operations):
+        # Đếm bằng execute_wrapper: CaptureQueriesContext chỉ giữ 9000 truy vấn cuối
+        queries = []
+
+        def counter(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(counter):
+            start = time.perf_counter()
+            apply(store, user, operations)
+            elapsed = time.perf_counter() - start
+            start = time.perf_counter()
+            store.flush(user)
+            flush_ms = (time.perf_counter() - start) * 1000
+        return len(operations) / elapsed, len(queries), flush_ms
+
+    def verify(self, name, store, user, expected):
+        stored = {pid: q for pid, q, _ in store.items(user)}
+        rows = list(CartItem.objects.filter(cart__user=user).order_by("-updated_at", "-id")
+                    .values_list("product_id", "quantity"))
+        if stored != expected or dict(rows) != expected:
+            raise CommandError(f"{name}: giỏ sai\n  mong đợi {expected}\n  store {stored}\n  DB {dict(rows)}")
+        if [pid for pid, _, _ in store.items(user)] != [pid for pid, _ in rows]:
+            raise CommandError(f"{name}: thứ tự updated_at trên DB khác với store")
@@ -0,0 +1,67 @@
+import time
+
+from cloudinary import CloudinaryResource
+from cloudinary.utils import cloudinary_url
+from django.core.management.base import BaseCommand, CommandError
+
+from EcoReMartApp.cloudinary_urls import cloudinary_image_url, resource_url, url_cache
+from EcoReMartApp.models import Product
+from EcoReMartApp.paginators import ProductPaginator
+from EcoReMartApp.serializers import ProductSerializer
+
+
+class Command(BaseCommand):
+    help = ("So thời gian dựng URL Cloudinary cho một trang 15 sản phẩm: cloudinary_url() trực tiếp "
+            "như trước và qua bộ đệm LRU (cloudinary_urls), kèm tỉ lệ trúng bộ đệm")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        size = ProductPaginator.page_size
+        products = list(Product.objects.select_related("store").prefetch_related("images")[:size])
+        if len(products) == size:
+            images = [p.images.all()[0].image if p.images.all() else None for p in products]
+            avatars = [p.store.avatar for p in products]
+        else:
+            # Không đủ dữ liệu: trang giả lập ảnh có version/format, 3 cửa hàng
+            images = [CloudinaryResource(public_id=f"product_{i}", version="1754149807", format="jpg",
+                                         type="upload", resource_type="image") for i in range(size)]
+            avatars = [CloudinaryResource(public_id=f"store_{i % 3}", format="webp", type="upload",
+                                          resource_type="image") for i in range(size)]
+
+        for image, avatar in zip(images, avatars):
+            if image and resource_url(image) != cloudinary_url(image.url)[0]:
+                raise CommandError(f"URL ảnh khác nhau cho {image.public_id}")
+            if avatar and cloudinary_image_url(avatar) != cloudinary_url(str(avatar))[0]:
+                raise CommandError(f"URL avatar khác nhau cho {avatar}")
+
+        def direct():
+            for image, avatar in zip(images, avatars):
+                if image:
+                    cloudinary_url(image.url)
+                if avatar:
+                    cloudinary_url(str(avatar))
+
+        def cached():
+            for image, avatar in zip(images, avatars):
+                resource_url(image)
+                cloudinary_image_url(avatar)
+
+        url_cache.clear()
+        for name, fn in (("cloudinary_url", direct), ("LRU cache", cached)):
+            start = time.perf_counter()
+            for _ in range(options["repeat"]):
+                fn()
+            elapsed = (time.perf_counter() - start) / options["repeat"] * 1e6
+            self.stdout.write(f"  {name:>15}: {elapsed:8.1f} µs/trang")
+        self.stdout.write(f"  Bộ đệm: {url_cache.stats()}")
+
+        if len(products) == size:
+            url_cache.clear()
+            start = time.perf_counter()
+            for _ in range(max(options["repeat"] // 20, 1)):
+                ProductSerializer(products, many=True).data
+            elapsed = (time.perf_counter() - start) / max(options["repeat"] // 20, 1) * 1000
+            self.stdout.write(f"  ProductSerializer (ảnh đã prefetch): {elapsed:.2f} ms/trang, "
+                              f"bộ đệm {url_cache.stats()}")
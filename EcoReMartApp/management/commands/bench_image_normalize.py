@@ -0,0 +1,71 @@
+import io
+import os
+import time
+
+import numpy as np
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+from EcoReMartApp.image_processing import JPEG_QUALITY, MAX_DIMENSION, normalize_image
+
+
+class Command(BaseCommand):
+    help = ("Đo normalize_image (thu nhỏ, bỏ EXIF, nén lại) trên ảnh trong --dir hoặc ảnh giả lập cỡ ảnh "
+            "điện thoại: số byte trước/sau và thời gian mỗi ảnh")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", help="Thư mục ảnh thật (jpg/png/webp)")
+        parser.add_argument("--count", type=int, default=5, help="Số ảnh giả lập khi không có --dir")
+        parser.add_argument("--max-dimension", type=int, default=MAX_DIMENSION)
+        parser.add_argument("--quality", type=int, default=JPEG_QUALITY)
+
+    def handle(self, *args, **options):
+        samples = list(self.load_dir(options["dir"]) if options["dir"] else self.synthetic(options["count"]))
+        if not samples:
+            raise CommandError("Không có ảnh nào để đo")
+
+        total_before = total_after = total_time = 0
+        for name, data in samples:
+            start = time.perf_counter()
+            result = normalize_image(SimpleUploadedFile(name, data), options["max_dimension"], options["quality"])
+            output = result.read()
+            elapsed = time.perf_counter() - start
+            with Image.open(io.BytesIO(output)) as image:
+                size, exif = image.size, image.getexif()
+            if exif:
+                raise CommandError(f"{name}: EXIF vẫn còn sau khi chuẩn hoá")
+            total_before += len(data)
+            total_after += len(output)
+            total_time += elapsed
+            self.stdout.write(f"  {name:>16}: {len(data) / 1024:8.0f} KB -> {len(output) / 1024:6.0f} KB "
+                              f"{size[0]}x{size[1]}, {elapsed * 1000:6.1f} ms")
+        self.stdout.write(self.style.SUCCESS(
+            f"Tổng {total_before / 2 ** 20:.1f} MB -> {total_after / 2 ** 20:.1f} MB, "
+            f"tiết kiệm {100 * (1 - total_after / total_before):.1f}%, "
+            f"trung bình {total_time / len(samples) * 1000:.1f} ms/ảnh"
+        ))
+
+    @staticmethod
+    def load_dir(path):
+        for name in sorted(os.listdir(path)):
+            if os.path.splitext(name)[1].lower() in (".jpg", ".jpeg", ".png", ".webp"):
+                with open(os.path.join(path, name), "rb") as f:
+                    yield name, f.read()
+
+    @staticmethod
+    def synthetic(count):
+        # Ảnh 4032x3024 (12MP) có chi tiết nhiễu, JPEG chất lượng 95, EXIF xoay ảnh như ảnh chụp điện thoại
+        rng = np.random.default_rng(0)
+        height, width = 3024, 4032
+        gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+        for i in range(count):
+            noise = rng.normal(0, 40, (height, width, 3)).astype(np.float32)
+            pixels = np.clip(gradient * (0.5 + 0.1 * i) + noise, 0, 255).astype(np.uint8)
+            image = Image.fromarray(pixels, "RGB")
+            exif = Image.Exif()
+            exif[0x0112] = 6  # Orientation: xoay 90 độ
+            exif[0x010F] = "PhoneMaker"
+            buffer = io.BytesIO()
+            image.save(buffer, "JPEG", quality=95, exif=exif)
+            yield f"IMG_{i:04d}.jpg", buffer.getvalue()
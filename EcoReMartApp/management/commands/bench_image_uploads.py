@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+
+from EcoReMartApp.image_uploads import ImageUploadError, upload_images
+from EcoReMartApp.media_backends import LocalBackend
+from EcoReMartApp.models import ProductImage
+
+
+class FakeStorageBackend(LocalBackend):
+    """LocalBackend trong thư mục tạm có độ trễ, đếm số lần gọi và có thể cho lỗi ở lần upload thứ fail_on."""
+
+    def __init__(self, latency, fail_on=None, root=None):
+        super().__init__(root=root or tempfile.mkdtemp(prefix="bench-uploads-"), latency=latency)
+        self.fail_on = fail_on
+        self.calls = 0
+        self.delete_calls = 0
+        self.lock = threading.Lock()
+
+    @property
+    def stored(self):
+        directory = self.path("image", "upload")
+        return os.listdir(directory) if os.path.isdir(directory) else []
+
+    def upload(self, file, **options):
+        with self.lock:
+            self.calls += 1
+            call = self.calls
+        if call == self.fail_on:
+            self.delay()
+            raise IOError("storage giả lập trả lỗi 500")
+        return super().upload(file, **options)
+
+    def delete(self, public_ids, resource_type="image", type="upload"):
+        with self.lock:
+            self.delete_calls += 1
+        super().delete(public_ids, resource_type=resource_type, type=type)
+
+    def cleanup(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+class Command(BaseCommand):
+    help = ("Đo upload ảnh tuần tự (1 luồng) và song song (image_uploads.upload_images) trên LocalBackend "
+            "có độ trễ giả lập (không cần mạng), và kiểm tra dọn ảnh đã upload khi một ảnh lỗi")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--images", type=int, default=5)
+        parser.add_argument("--latency-ms", type=float, default=300)
+        parser.add_argument("--workers", type=int, default=4)
+
+    def handle(self, *args, **options):
+        latency = options["latency_ms"] / 1000
+        # Nội dung khác nhau vì LocalBackend đặt public_id theo nội dung file
+        files = [SimpleUploadedFile(f"p{i}.jpg", bytes([i % 256]) * 2048, content_type="image/jpeg")
+                 for i in range(options["images"])]
+
+        for name, workers in (("tuần tự", 1), ("song song", options["workers"])):
+            backend = FakeStorageBackend(latency)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                start = time.perf_counter()
+                resources = upload_images(files, ProductImage, backend=backend, executor=executor)
+                elapsed = time.perf_counter() - start
+            stored = len(backend.stored)
+            backend.cleanup()
+            if len(resources) != len(files) or stored != len(files):
+                raise CommandError(f"{name}: chỉ lưu được {stored}/{len(files)} ảnh")
+            self.stdout.write(f"  {name:>10} ({workers} luồng): {elapsed * 1000:7.1f} ms cho {len(files)} ảnh")
+
+        # Ảnh thứ 2 lỗi: các ảnh đã lên storage phải bị xoá, ảnh chưa chạy bị huỷ
+        backend = FakeStorageBackend(latency, fail_on=2)
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            try:
+                upload_images(files, ProductImage, backend=backend, executor=executor)
+            except ImageUploadError as e:
+                self.stdout.write(f"  Lỗi một phần: {e}")
+            else:
+                raise CommandError("Upload lỗi nhưng không báo ImageUploadError")
+        orphans = len(backend.stored)
+        backend.cleanup()
+        if orphans:
+            raise CommandError(f"Còn {orphans} ảnh mồ côi trên storage sau khi lỗi")
+        self.stdout.write(self.style.SUCCESS(
+            f"  Đã dọn sạch ảnh sau lỗi ({backend.calls} lần upload, {backend.delete_calls} lần gọi xoá)"
+        ))
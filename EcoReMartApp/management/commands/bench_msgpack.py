@@ -0,0 +1,94 @@
+import json
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+import msgpack
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnList
+
+from EcoReMartApp.models import Order, Product
+from EcoReMartApp.paginators import OrderPaginator, ProductPaginator
+from EcoReMartApp.renderers import MessagePackRenderer
+from EcoReMartApp.serializers import OrderSerializer, ProductSerializer
+
+
+class Command(BaseCommand):
+    help = ("So sánh kích thước payload và thời gian encode/decode giữa JSONRenderer và MessagePackRenderer "
+            "trên một trang 15 sản phẩm và một trang 4 đơn hàng kèm items")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=2000)
+        parser.add_argument("--synthetic", action="store_true",
+                            help="Dùng dữ liệu giả lập thay vì đọc từ DB (tự bật khi DB không đủ dữ liệu)")
+
+    def handle(self, *args, **options):
+        pages = {
+            f"{ProductPaginator.page_size} sản phẩm": self.product_page(options["synthetic"]),
+            f"{OrderPaginator.page_size} đơn hàng": self.order_page(options["synthetic"]),
+        }
+        renderers = {"json": JSONRenderer(), "msgpack": MessagePackRenderer()}
+        decoders = {"json": json.loads, "msgpack": lambda b: msgpack.unpackb(b, raw=False)}
+
+        for page_name, payload in pages.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(page_name))
+            sizes = {}
+            for name, renderer in renderers.items():
+                body = renderer.render(payload)
+                sizes[name] = len(body)
+                encode_us = self.timeit(lambda: renderer.render(payload), options["repeat"])
+                decode_us = self.timeit(lambda: decoders[name](body), options["repeat"])
+                self.stdout.write(f"  {name:>8}: {len(body):>7} bytes, encode {encode_us:8.1f} µs, "
+                                  f"decode {decode_us:8.1f} µs")
+            self.stdout.write(f"  msgpack nhỏ hơn {100 * (1 - sizes['msgpack'] / sizes['json']):.1f}%")
+
+    @staticmethod
+    def timeit(fn, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        return (time.perf_counter() - start) / repeat * 1e6
+
+    def product_page(self, synthetic):
+        size = ProductPaginator.page_size
+        products = list(Product.objects.select_related("store")[:size])
+        if not synthetic and len(products) == size:
+            return self.paginated(ProductSerializer(products, many=True).data)
+        return self.paginated(ReturnList([{
+            "id": i,
+            "name": f"Tay cầm chơi game {i}",
+            "available_quantity": 3,
+            "price": str(Decimal("125000.00") + i * 1000),
+            "image": f"http://res.cloudinary.com/demo/image/upload/v1754149807/product_{i}.jpg",
+            "store": {"id": 7, "name": "Cửa hàng đồ cũ",
+                      "avatar": "http://res.cloudinary.com/demo/image/upload/v1754149807/store_7.webp"},
+            "purchases": 12 + i,
+            "active": True,
+        } for i in range(size)], serializer=None))
+
+    def order_page(self, synthetic):
+        size = OrderPaginator.page_size
+        orders = list(Order.objects.select_related("store", "order_status", "delivery_info", "voucher")[:size])
+        if not synthetic and len(orders) == size:
+            return self.paginated(OrderSerializer(orders, many=True).data)
+        now = timezone.now()
+        product = self.product_page(True)["results"][0]
+        return self.paginated(ReturnList([{
+            "id": i, "user": 3,
+            "delivery_info": {"id": 2, "name": "Nguyễn Văn A", "phone_number": "0901234567",
+                              "address": "142 Khiếu Năng Tĩnh, Bình Tân, Hồ Chí Minh"},
+            "order_code": f"ERM20250828{i:06d}", "store": 7, "store_name": "Cửa hàng đồ cũ",
+            "voucher": None, "voucher_code": None, "voucher_discount_percent": None,
+            "order_status": "Chờ xác nhận", "note": "Giao giờ hành chính",
+            "ship_fee": "20000.00", "total_cost": "395000.00",
+            "created_at": (now - timedelta(hours=i)).isoformat(),
+            "items": [{"product": product, "quantity": q} for q in (1, 2, 1)],
+            "payment_method": "cash payment",
+        } for i in range(size)], serializer=None))
+
+    @staticmethod
+    def paginated(results):
+        return {"count": 120, "next": "http://127.0.0.1:8000/product/?page=2", "previous": None,
+                "results": results}
@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from EcoReMartApp.models import Product
+from EcoReMartApp.product_detail import DETAIL_QUERY_BUDGET, load_product_detail
+from EcoReMartApp.serializers import ProductDetailSerializer
+
+
+class Command(BaseCommand):
+    help = ("Kiểm tra ProductDetailSerializer trên sản phẩm nạp bằng load_product_detail cho output giống cách "
+            "nạp cũ (với sản phẩm ít và nhiều ảnh/danh mục), in số truy vấn và so thời gian hai cách")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=200)
+        parser.add_argument("--check-only", action="store_true", help="Chỉ kiểm tra output, không đo")
+
+    def handle(self, *args, **options):
+        products = Product.objects.annotate(n_images=Count("images", distinct=True),
+                                            n_categories=Count("categories", distinct=True))
+        samples = {p.pk for p in (products.order_by("n_images", "n_categories").first(),
+                                  products.order_by("-n_images", "-n_categories").first()) if p}
+        if not samples:
+            raise CommandError("Không có sản phẩm nào")
+
+        request = Request(APIRequestFactory().get("/"))
+        renderer = JSONRenderer()
+
+        def old_way(pk):
+            product = Product.objects.get(pk=pk)
+            return renderer.render(ProductDetailSerializer(product, context={"request": request}).data)
+
+        def new_way(pk):
+            product = load_product_detail(pk)
+            return renderer.render(ProductDetailSerializer(product, context={"request": request}).data)
+
+        for pk in sorted(samples):
+            reset_queries()  # log truy vấn có giới hạn, đầy thì CaptureQueriesContext đếm sai
+            with CaptureQueriesContext(connection) as old_queries:
+                expected = old_way(pk)
+            with CaptureQueriesContext(connection) as new_queries:
+                actual = new_way(pk)
+            if expected != actual:
+                raise CommandError(f"Output sản phẩm {pk} khác cách nạp cũ:\n{expected}\n{actual}")
+            # Ngân sách truy vấn được kiểm tra trong ProductDetailQueryTests (manage.py test), ở đây chỉ in ra
+            self.stdout.write(self.style.SUCCESS(
+                f"Sản phẩm {pk}: {len(new_queries)}/{DETAIL_QUERY_BUDGET} truy vấn (cách cũ {len(old_queries)})"
+            ))
+
+            if options["check_only"]:
+                continue
+            for name, fn in (("cũ", old_way), ("load_product_detail", new_way)):
+                start = time.perf_counter()
+                for _ in range(options["repeat"]):
+                    fn(pk)
+                elapsed = (time.perf_counter() - start) / options["repeat"] * 1000
+                self.stdout.write(f"  {name:>20}: {elapsed:6.2f} ms")
@@ -0,0 +1,52 @@
+import io
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from EcoReMartApp.models import Category, ProductCondition, Store
+from EcoReMartApp.product_import import import_products, iter_rows
+
+
+class Command(BaseCommand):
+    help = "Đo thời gian và số truy vấn khi nhập N sản phẩm từ CSV sinh ngẫu nhiên (mặc định rollback)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000)
+        parser.add_argument("--store", type=int, help="id cửa hàng, mặc định cửa hàng đầu tiên")
+        parser.add_argument("--invalid-ratio", type=float, default=0.02, help="Tỉ lệ dòng lỗi cố ý")
+        parser.add_argument("--keep", action="store_true", help="Giữ lại dữ liệu đã nhập")
+
+    def handle(self, *args, **options):
+        store = Store.objects.filter(pk=options["store"]).first() if options["store"] else Store.objects.first()
+        conditions = list(ProductCondition.objects.values_list("name", flat=True))
+        categories = list(Category.objects.values_list("name", flat=True))
+        if not store or not conditions or not categories:
+            raise CommandError("Cần ít nhất một cửa hàng, một ProductCondition và một Category")
+
+        data = self.make_csv(options["rows"], conditions, categories, options["invalid_ratio"])
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                report = import_products(store, iter_rows(io.BytesIO(data), "bench.csv"))
+                elapsed = time.perf_counter() - start
+            if not options["keep"]:
+                transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"{options['rows']} dòng: tạo {report['created']}, lỗi {len(report['errors'])}, "
+            f"{elapsed:.2f} s ({options['rows'] / elapsed:,.0f} dòng/s), {len(queries)} truy vấn"
+        )
+
+    @staticmethod
+    def make_csv(rows, conditions, categories, invalid_ratio):
+        rnd = random.Random(42)
+        out = io.StringIO()
+        out.write("name,price,available_quantity,product_condition,categories,note\n")
+        for i in range(rows):
+            price = "abc" if rnd.random() < invalid_ratio else f"{rnd.randint(1, 5000) * 1000}"
+            cats = ";".join(rnd.sample(categories, min(len(categories), rnd.randint(1, 3))))
+            out.write(f"SP {i},{price},{rnd.randint(1, 20)},{rnd.choice(conditions)},{cats},Nhập thử\n")
+        return out.getvalue().encode()
@@ -0,0 +1,94 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from EcoReMartApp.models import Product
+from EcoReMartApp.paginators import ProductKeysetPaginator
+from EcoReMartApp.views import PRODUCT_ORDERINGS
+
+# Dấu hiệu query plan phải sắp xếp lại cả tập kết quả thay vì đi theo index (DB không có Handler_read_*)
+PLAN_SORT_MARKERS = {
+    'sqlite': ('USE TEMP B-TREE FOR ORDER BY',),
+    'postgresql': ('Sort Key',),
+}
+# Các bộ đếm InnoDB tăng lên mỗi khi storage engine đọc một dòng
+MYSQL_READ_COUNTERS = ('Handler_read_first', 'Handler_read_key', 'Handler_read_last',
+                       'Handler_read_next', 'Handler_read_prev', 'Handler_read_rnd', 'Handler_read_rnd_next')
+
+
+class Command(BaseCommand):
+    help = ("Đo số dòng DB phải đọc cho từng kiểu ?ordering= của danh sách sản phẩm (trang đầu và các trang sau). "
+            "Chỉ đo được số dòng trên MySQL (bộ đếm Handler_read_*); DB khác chỉ xem query plan, và trên SQLite "
+            "(DB dev) lệnh báo FAIL là bình thường vì filter active=True thành cột trần nên không dùng được index")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pages", type=int, default=3, help="Số trang đi theo cursor cho mỗi ordering")
+        parser.add_argument("--slack", type=int, default=5,
+                            help="Số dòng đọc thêm cho phép ngoài page_size + 1 (bỏ qua dòng available_quantity=0...)")
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        is_mysql = connection.vendor == 'mysql'
+        limit = ProductKeysetPaginator.page_size + 1 + options["slack"]
+        queryset = Product.objects.filter(active=True, available_quantity__gt=0)
+        failures = unverified = 0
+
+        if not is_mysql:
+            self.stdout.write(self.style.WARNING(
+                f"DB {connection.vendor} không có bộ đếm Handler_read_*: không đo được số dòng đọc, "
+                f"chỉ kiểm tra query plan có dùng index thay vì sắp xếp lại không."))
+
+        for name, ordering in PRODUCT_ORDERINGS.items():
+            cursor = None
+            for page_no in range(1, options["pages"] + 1):
+                params = {'ordering': name}
+                if cursor:
+                    params['cursor'] = cursor
+                request = Request(factory.get('/product/', params))
+                paginator = ProductKeysetPaginator(ordering, name=name)
+
+                before = self.read_counters() if is_mysql else None
+                start = time.perf_counter()
+                page = paginator.paginate_queryset(queryset, request)
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                if is_mysql:
+                    rows_read = self.read_counters() - before
+                    ok = rows_read <= limit
+                    failures += not ok
+                    result = f"{rows_read:>6} dòng đọc, {elapsed_ms:7.2f} ms {'OK' if ok else 'FAIL'}"
+                else:
+                    result = f"{'?':>6} dòng đọc, {elapsed_ms:7.2f} ms chưa kiểm chứng"
+                self.stdout.write(f"{name:>14} page {page_no}: {len(page):>3} sản phẩm, {result}")
+                if paginator.next_position is None:
+                    break
+                cursor = paginator.encode_cursor(paginator.next_position)
+
+            if not is_mysql:
+                plan = queryset.order_by(*ordering)[:ProductKeysetPaginator.page_size + 1].explain()
+                markers = PLAN_SORT_MARKERS.get(connection.vendor)
+                if markers is None:
+                    unverified += 1
+                    verdict = "chưa kiểm chứng"
+                elif any(marker in plan for marker in markers):
+                    failures += 1
+                    verdict = "FAIL: sắp xếp lại, không dùng index"
+                else:
+                    verdict = "OK"
+                self.stdout.write(f"    plan ({verdict}): {plan}")
+
+        if failures:
+            raise CommandError(
+                f"{failures} trang/query plan không đạt (đọc nhiều hơn {limit} dòng hoặc không dùng index).")
+        if unverified:
+            self.stdout.write(self.style.WARNING(
+                f"Chưa kiểm chứng {unverified} ordering trên DB {connection.vendor}, hãy chạy lại trên MySQL."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Mọi ordering đều đọc tối đa {limit} dòng mỗi trang."))
+
+    def read_counters(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SHOW SESSION STATUS LIKE 'Handler_read%%'")
+            return sum(int(value) for name, value in cursor.fetchall() if name in MYSQL_READ_COUNTERS)
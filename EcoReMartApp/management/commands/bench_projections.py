@@ -0,0 +1,78 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from EcoReMartApp.models import Order, Product
+from EcoReMartApp.paginators import OrderPaginator, ProductPaginator
+from EcoReMartApp.projections import OrderProjection, ProductProjection
+from EcoReMartApp.serializers import OrderSerializer, ProductSerializer
+
+# Các tổ hợp tham số ?fields/?omit/?compact/?image_variant cần cho ra cùng output
+QUERY_VARIANTS = ('', 'compact=1', 'fields=id,name,store', 'omit=image,store', 'fields=id,items&omit=items',
+                  'image_variant=card', 'image_variant=original&omit=srcset')
+
+
+class Command(BaseCommand):
+    help = ("Kiểm tra ProductProjection/OrderProjection cho ra output giống hệt ProductSerializer/OrderSerializer "
+            "(so từng byte JSON), rồi đo thời gian và số truy vấn của hai cách trên một trang dữ liệu thật")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=50)
+        parser.add_argument("--check-only", action="store_true", help="Chỉ kiểm tra output, không đo")
+
+    def handle(self, *args, **options):
+        cases = [
+            ("sản phẩm", Product.objects.select_related("store").order_by("-id"), ProductPaginator.page_size,
+             ProductSerializer, ProductProjection),
+            ("đơn hàng", Order.objects.select_related("store", "order_status", "delivery_info", "voucher")
+             .order_by("-created_at"), OrderPaginator.page_size, OrderSerializer, OrderProjection),
+        ]
+        factory = APIRequestFactory()
+        renderer = JSONRenderer()
+
+        for label, queryset, page_size, serializer_class, projection_class in cases:
+            if not queryset.exists():
+                self.stdout.write(self.style.WARNING(f"Không có {label} nào, bỏ qua"))
+                continue
+            # Đơn hàng: kiểm tra toàn bộ để gặp đủ trường hợp voucher/trạng thái/địa chỉ null
+            check_queryset = queryset.all() if label == "đơn hàng" else queryset[:200]
+            for query in QUERY_VARIANTS:
+                request = Request(factory.get(f"/?{query}"))
+                expected = renderer.render(serializer_class(list(check_queryset), many=True,
+                                                            context={"request": request}).data)
+                projection = projection_class(request)
+                actual = renderer.render(projection.project(projection.queryset(check_queryset)))
+                if expected != actual:
+                    raise CommandError(f"Output {label} khác serializer với ?{query}:\n{expected[:500]}\n{actual[:500]}")
+            self.stdout.write(self.style.SUCCESS(f"{label}: output giống serializer với {len(QUERY_VARIANTS)} biến thể"))
+
+            if options["check_only"]:
+                continue
+            request = Request(factory.get("/"))
+
+            # Cắt lại queryset trong mỗi lần gọi: dùng chung một page đã đánh giá thì serializer nhận lại các
+            # instance đã có _first_image từ lần trước và không chạy truy vấn ảnh nào, so sánh bị lệch
+            def with_serializer():
+                page = queryset.all()[:page_size]
+                return renderer.render(serializer_class(list(page), many=True, context={"request": request}).data)
+
+            def with_projection():
+                page = queryset.all()[:page_size]
+                projection = projection_class(request)
+                return renderer.render(projection.project(projection.queryset(page)))
+
+            for name, fn in (("serializer", with_serializer), ("projection", with_projection)):
+                reset_queries()  # log truy vấn có giới hạn, đầy thì CaptureQueriesContext đếm sai
+                with CaptureQueriesContext(connection) as queries:
+                    fn()
+                start = time.perf_counter()
+                for _ in range(options["repeat"]):
+                    fn()
+                elapsed = (time.perf_counter() - start) / options["repeat"] * 1000
+                self.stdout.write(f"  {label} x{page_size} {name:>10}: {elapsed:7.2f} ms/trang, "
+                                  f"{len(queries)} truy vấn")
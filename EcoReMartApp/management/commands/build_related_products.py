@@ -0,0 +1,107 @@
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from EcoReMartApp.models import Order, OrderItem, ProductRelation
+
+PAIR_SHIFT = np.int64(32)  # khoá cặp (a, b) = a << 32 | b, id sản phẩm < 2^31
+
+
+class Command(BaseCommand):
+    help = ("Dựng ma trận đồng xuất hiện sản phẩm x sản phẩm từ OrderItem (đọc theo từng lô đơn hàng), "
+            "giữ top-K sản phẩm hay được mua cùng cho mỗi sản phẩm và ghi vào ProductRelation.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders-per-chunk", type=int, default=5000)
+        parser.add_argument("--top-k", type=int, default=getattr(settings, "RELATED_PRODUCTS_TOP_K", 10))
+        parser.add_argument("--max-basket", type=int, default=50,
+                            help="Bỏ qua đơn có nhiều sản phẩm hơn (số cặp tăng theo bình phương)")
+        parser.add_argument("--compact-every", type=int, default=2_000_000,
+                            help="Gộp các cặp trùng khi bộ đệm vượt số phần tử này")
+
+    def handle(self, *args, **options):
+        chunk_size = options["orders_per_chunk"]
+        pending_keys, pending_counts, pending_size = [], [], 0
+        keys, counts = np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+        last_order_id, orders_seen = 0, 0
+
+        while True:
+            # Cận trên id của lô để mỗi lô chứa trọn vẹn các đơn hàng
+            upper = list(Order.objects.filter(id__gt=last_order_id).order_by("id")
+                         .values_list("id", flat=True)[chunk_size - 1:chunk_size])
+            items = OrderItem.objects.filter(order_id__gt=last_order_id)
+            if upper:
+                items = items.filter(order_id__lte=upper[0])
+            rows = np.array(list(items.values_list("order_id", "product_id")), dtype=np.int64).reshape(-1, 2)
+
+            if len(rows):
+                chunk_keys = self.basket_pairs(rows, options["max_basket"])
+                if len(chunk_keys):
+                    uniq, chunk_counts = np.unique(chunk_keys, return_counts=True)
+                    pending_keys.append(uniq)
+                    pending_counts.append(chunk_counts)
+                    pending_size += len(uniq)
+                orders_seen += len(np.unique(rows[:, 0]))
+            if pending_size >= options["compact_every"]:
+                keys, counts = self.merge([keys, *pending_keys], [counts, *pending_counts])
+                pending_keys, pending_counts, pending_size = [], [], 0
+
+            if not upper:
+                break
+            last_order_id = upper[0]
+
+        keys, counts = self.merge([keys, *pending_keys], [counts, *pending_counts])
+        relations = self.top_k(keys, counts, options["top_k"])
+
+        with transaction.atomic():
+            ProductRelation.objects.all().delete()
+            ProductRelation.objects.bulk_create(
+                (ProductRelation(product_id=a, related_id=b, score=score, rank=rank)
+                 for a, b, score, rank in relations),
+                batch_size=1000,
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã xử lý {orders_seen} đơn, {len(keys)} cặp đồng xuất hiện, ghi {len(relations)} liên kết."
+        ))
+
+    @staticmethod
+    def basket_pairs(rows, max_basket):
+        # rows (order_id, product_id) -> dạng CSR: products sắp theo đơn, starts/sizes là indptr
+        rows = np.unique(rows, axis=0)
+        orders, products = rows[:, 0], rows[:, 1]
+        _, starts, sizes = np.unique(orders, return_index=True, return_counts=True)
+        pair_keys = []
+        # Gom các đơn cùng số sản phẩm k thành ma trận (n, k) để sinh cặp bằng broadcast
+        for k in np.unique(sizes):
+            if k < 2 or k > max_basket:
+                continue
+            baskets = products[starts[sizes == k][:, None] + np.arange(k)]
+            a = np.repeat(baskets, k, axis=1).ravel()
+            b = np.tile(baskets, (1, k)).ravel()
+            mask = a != b
+            pair_keys.append((a[mask] << PAIR_SHIFT) | b[mask])
+        return np.concatenate(pair_keys) if pair_keys else np.array([], dtype=np.int64)
+
+    @staticmethod
+    def merge(key_parts, count_parts):
+        keys = np.concatenate(key_parts)
+        if not len(keys):
+            return keys, np.array([], dtype=np.int64)
+        uniq, inverse = np.unique(keys, return_inverse=True)
+        return uniq, np.bincount(inverse, weights=np.concatenate(count_parts)).astype(np.int64)
+
+    @staticmethod
+    def top_k(keys, counts, k):
+        if not len(keys):
+            return []
+        a = keys >> PAIR_SHIFT
+        b = keys & ((np.int64(1) << PAIR_SHIFT) - 1)
+        # Sắp theo a, rồi count giảm dần, rồi b tăng dần; hạng = vị trí trong nhóm a
+        order = np.lexsort((b, -counts, a))
+        a, b, counts = a[order], b[order], counts[order]
+        group_start = np.r_[0, np.flatnonzero(np.diff(a)) + 1]
+        ranks = np.arange(len(a)) - np.repeat(group_start, np.diff(np.r_[group_start, len(a)]))
+        keep = ranks < k
+        return list(zip(a[keep].tolist(), b[keep].tolist(), counts[keep].tolist(), (ranks[keep] + 1).tolist()))
@@ -0,0 +1,96 @@
+import math
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from EcoReMartApp.models import OrderItem, ProductTrending, TrendingWatermark
+
+
+class Command(BaseCommand):
+    help = ("Tính điểm trending (lượt mua giảm dần theo hàm mũ thời gian) từ các OrderItem mới "
+            "kể từ watermark và ghi vào ProductTrending. Chạy định kỳ bằng cron.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=5000)
+        parser.add_argument("--half-life-hours", type=float,
+                            default=getattr(settings, "TRENDING_HALF_LIFE_HOURS", 72))
+        parser.add_argument("--lookback-days", type=int,
+                            default=getattr(settings, "TRENDING_LOOKBACK_DAYS", 30),
+                            help="Lần chạy đầu (chưa có watermark) chỉ quét đơn trong khoảng này")
+        parser.add_argument("--min-score", type=float, default=0.01,
+                            help="Xoá sản phẩm có điểm nhỏ hơn ngưỡng này")
+        parser.add_argument("--reset", action="store_true", help="Xoá điểm cũ và quét lại từ đầu khoảng lookback")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        decay = math.log(2) / (options["half_life_hours"] * 3600)  # theo giây
+
+        watermark, _ = TrendingWatermark.objects.get_or_create(pk=1)
+        if options["reset"]:
+            watermark.last_order_item_id = 0
+            watermark.scored_at = None
+
+        # Điểm cũ được quy về thời điểm scored_at, nhân thêm hệ số giảm để quy về now
+        if watermark.scored_at and not options["reset"]:
+            rows = np.array(list(ProductTrending.objects.values_list("product_id", "score")), dtype=float).reshape(-1, 2)
+            old_factor = math.exp(-decay * (now - watermark.scored_at).total_seconds())
+            product_ids = [rows[:, 0].astype(np.int64)]
+            scores = [rows[:, 1] * old_factor]
+        else:
+            product_ids, scores = [], []
+
+        items = OrderItem.objects.filter(id__gt=watermark.last_order_item_id)
+        if not watermark.last_order_item_id:
+            items = items.filter(order__created_at__gte=now - timedelta(days=options["lookback_days"]))
+        items = items.filter(order__created_at__lte=now).order_by("id")
+
+        last_id = watermark.last_order_item_id
+        scanned = 0
+        now_ts = now.timestamp()
+        while True:
+            chunk = list(items.filter(id__gt=last_id)
+                         .values_list("id", "product_id", "quantity", "order__created_at")[:options["chunk_size"]])
+            if not chunk:
+                break
+            ids, pids, quantities, created = zip(*chunk)
+            ages = now_ts - np.fromiter((dt.timestamp() for dt in created), dtype=float, count=len(chunk))
+            product_ids.append(np.asarray(pids, dtype=np.int64))
+            scores.append(np.asarray(quantities, dtype=float) * np.exp(-decay * np.maximum(ages, 0)))
+            last_id = ids[-1]
+            scanned += len(chunk)
+
+        if product_ids:
+            uniq, inverse = np.unique(np.concatenate(product_ids), return_inverse=True)
+            totals = np.bincount(inverse, weights=np.concatenate(scores))
+        else:
+            uniq, totals = np.array([], dtype=np.int64), np.array([])
+
+        keep = totals >= options["min_score"]
+        new_scores = dict(zip(uniq[keep].tolist(), totals[keep].tolist()))
+
+        with transaction.atomic():
+            existing = set(ProductTrending.objects.values_list("product_id", flat=True))
+            stale = sorted(existing - new_scores.keys())
+            for start in range(0, len(stale), options["chunk_size"]):
+                ProductTrending.objects.filter(product_id__in=stale[start:start + options["chunk_size"]]).delete()
+            ProductTrending.objects.bulk_update(
+                [ProductTrending(product_id=pid, score=score, updated_at=now)
+                 for pid, score in new_scores.items() if pid in existing],
+                ["score", "updated_at"], batch_size=options["chunk_size"],
+            )
+            ProductTrending.objects.bulk_create(
+                [ProductTrending(product_id=pid, score=score)
+                 for pid, score in new_scores.items() if pid not in existing],
+                batch_size=options["chunk_size"],
+            )
+            watermark.last_order_item_id = last_id
+            watermark.scored_at = now
+            watermark.save()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã quét {scanned} OrderItem mới, {len(new_scores)} sản phẩm có điểm trending (watermark={last_id})."
+        ))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from EcoReMartApp.models import Store
+from EcoReMartApp.product_import import ImportFileError, import_products, iter_rows
+
+
+class Command(BaseCommand):
+    help = "Nhập sản phẩm hàng loạt cho một cửa hàng từ file CSV/XLSX"
+
+    def add_arguments(self, parser):
+        parser.add_argument("store_id", type=int)
+        parser.add_argument("path")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        try:
+            store = Store.objects.get(pk=options["store_id"])
+        except Store.DoesNotExist:
+            raise CommandError("Cửa hàng không tồn tại")
+
+        try:
+            with open(options["path"], "rb") as f:
+                report = import_products(store, iter_rows(f, options["path"]), batch_size=options["batch_size"])
+        except (OSError, ImportFileError) as e:
+            raise CommandError(str(e))
+
+        for error in report["errors"]:
+            self.stdout.write(self.style.WARNING(f"Dòng {error['row']}: {error['errors']}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã tạo {report['created']} sản phẩm, {len(report['errors'])} dòng lỗi."
+        ))
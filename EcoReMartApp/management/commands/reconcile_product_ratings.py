@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from EcoReMartApp.models import Product, Comment
+
+STAT_FIELDS = Product.RATING_STAT_FIELDS
+
+
+class Command(BaseCommand):
+    help = "Tính lại rating_count, rating_sum, rating_avg và histogram sao của Product từ bảng Comment"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true", help="Chỉ báo cáo sản phẩm bị lệch, không ghi")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        # Một truy vấn GROUP BY cho toàn bộ comment
+        expected = Product.expected_rating_stats(Comment.objects.all())
+
+        zero = dict.fromkeys(STAT_FIELDS, 0)
+        drifted = []
+        for product in Product.objects.only("id", *STAT_FIELDS).order_by("id").iterator(chunk_size=batch_size):
+            stats = expected.get(product.id, zero)
+            if any(getattr(product, f) != stats[f] for f in STAT_FIELDS):
+                for f in STAT_FIELDS:
+                    setattr(product, f, stats[f])
+                drifted.append(product)
+
+        if not options["dry_run"] and drifted:
+            with transaction.atomic():
+                Product.objects.bulk_update(drifted, STAT_FIELDS, batch_size=batch_size)
+
+        verb = "Phát hiện" if options["dry_run"] else "Đã cập nhật"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(drifted)} sản phẩm lệch thống kê rating."))
@@ -0,0 +1,104 @@
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand
+
+from EcoReMartApp.cloudinary_urls import resource_url
+from EcoReMartApp.image_processing import image_hash
+from EcoReMartApp.models import CommentImage, ProductImage
+
+# (nhãn, model, trường phạm vi): ảnh chỉ được coi là trùng khi cùng store / cùng người bình luận,
+# giống phạm vi reuse_from lúc upload
+SOURCES = (
+    ("ảnh sản phẩm", ProductImage, "product__store_id"),
+    ("ảnh bình luận", CommentImage, "comment__user_id"),
+)
+
+
+class Command(BaseCommand):
+    help = ("Tải song song các ảnh chưa có image_hash để tính hash nhận dạng và lưu lại, rồi báo các nhóm "
+            "ảnh trùng (cùng hash, cùng store/người bình luận nhưng là asset khác nhau) và dung lượng có thể thu hồi")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--timeout", type=float, default=15, help="Giây chờ mỗi lần tải ảnh")
+        parser.add_argument("--rehash", action="store_true", help="Tính lại cả ảnh đã có hash")
+        parser.add_argument("--dry-run", action="store_true", help="Không lưu hash vào DB")
+        parser.add_argument("--top", type=int, default=10, help="Số nhóm trùng lớn nhất được in ra")
+
+    def handle(self, *args, **options):
+        self.timeout = options["timeout"]
+        total_reclaimable = 0
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            for label, model, scope in SOURCES:
+                rows = list(model.objects.exclude(image__isnull=True).exclude(image="")
+                            .order_by("id").values_list("id", "image", "image_hash", scope))
+                sizes = {}
+                missing = [row for row in rows if options["rehash"] or not row[2]]
+                start = time.perf_counter()
+                hashed, failed = {}, 0
+                for (image_id, resource, _, _), result in zip(missing, executor.map(self.download, missing)):
+                    if result is None:
+                        failed += 1
+                        continue
+                    size, h = result
+                    sizes[resource.get_prep_value()] = size
+                    if h:
+                        hashed[image_id] = h
+                self.stdout.write(f"{label}: {len(rows)} ảnh, tính hash {len(hashed)}/{len(missing)} ảnh "
+                                  f"trong {time.perf_counter() - start:.1f}s, {failed} ảnh tải lỗi")
+                if hashed and not options["dry_run"]:
+                    model.objects.bulk_update([model(id=i, image_hash=h) for i, h in hashed.items()],
+                                              ["image_hash"], batch_size=500)
+
+                groups = self.duplicate_groups(rows, hashed)
+                # Ảnh đã có hash sẵn chưa biết dung lượng: chỉ hỏi kích thước (HEAD) của ảnh nằm trong nhóm trùng
+                unknown = [assets[value] for assets in groups.values() for value in assets if value not in sizes]
+                for resource, size in zip(unknown, executor.map(self.content_length, unknown)):
+                    sizes[resource.get_prep_value()] = size
+                total_reclaimable += self.report(label, groups, sizes, options["top"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Tổng dung lượng có thể thu hồi: {total_reclaimable / 2 ** 20:.2f} MB"))
+
+    @staticmethod
+    def duplicate_groups(rows, hashed):
+        # {(phạm vi, hash): {prep value: resource}} chỉ giữ nhóm có từ 2 asset khác nhau
+        groups = {}
+        for image_id, resource, h, scope_id in rows:
+            h = hashed.get(image_id, h)
+            if h:
+                groups.setdefault((scope_id, h), {}).setdefault(resource.get_prep_value(), resource)
+        return {key: assets for key, assets in groups.items() if len(assets) > 1}
+
+    def report(self, label, groups, sizes, top):
+        reclaimable = []
+        for (scope_id, h), assets in groups.items():
+            # Giữ asset đầu tiên (id nhỏ nhất), các asset còn lại có thể thay bằng nó
+            extra = sum(sizes.get(value) or 0 for value in list(assets)[1:])
+            reclaimable.append((extra, scope_id, h, len(assets)))
+        reclaimable.sort(reverse=True)
+        total = sum(extra for extra, _, _, _ in reclaimable)
+        self.stdout.write(f"  {len(groups)} nhóm trùng, thừa {sum(n - 1 for *_, n in reclaimable)} asset, "
+                          f"có thể thu hồi {total / 2 ** 20:.2f} MB")
+        for extra, scope_id, h, count in reclaimable[:top]:
+            self.stdout.write(f"    phạm vi {scope_id} hash {h}: {count} asset, thừa {extra / 1024:.0f} KB")
+        return total
+
+    def download(self, row):
+        _, resource, _, _ = row
+        try:
+            response = requests.get(resource_url(resource), timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            self.stderr.write(f"  Không tải được {resource.public_id}: {e}")
+            return None
+        return len(response.content), image_hash(io.BytesIO(response.content))
+
+    def content_length(self, resource):
+        try:
+            response = requests.head(resource_url(resource), timeout=self.timeout, allow_redirects=True)
+            return int(response.headers.get("Content-Length") or 0)
+        except (requests.RequestException, ValueError):
+            return 0
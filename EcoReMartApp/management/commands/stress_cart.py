@@ -0,0 +1,121 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from EcoReMartApp.cart_store import CartStoreError
+from EcoReMartApp.models import Cart, CartItem, Product, User
+
+
+class LegacyCartStore:
+    # AddToCartView cũ: đọc quantity, cộng trong Python rồi save() cả dòng
+    def add(self, user, product_id, quantity, available, create=True):
+        cart, _ = Cart.objects.get_or_create(user=user)
+        cart_item, created = CartItem.objects.get_or_create(cart=cart, product_id=product_id)
+        if not created:
+            if cart_item.quantity + quantity > available:
+                raise CartStoreError("Tổng số lượng vượt quá số lượng sẵn có.")
+            cart_item.quantity += quantity
+        else:
+            cart_item.quantity = quantity
+        cart_item.save()
+        return cart_item.quantity
+
+    def remove(self, user, product_ids):
+        return CartItem.objects.filter(cart__user=user, product_id__in=product_ids).delete()[0]
+
+    def flush(self, user):
+        pass
+
+
+class Command(BaseCommand):
+    help = ("Nhiều luồng cùng cộng số lượng một sản phẩm trong giỏ của một user (như bấm + liên tục), rồi kiểm tra "
+            "số lượng cuối bằng đúng tổng các lần cộng thành công (không mất lượt cộng) và không vượt tồn kho. "
+            "Chạy trên DB thật (cần commit để các luồng thấy nhau), dòng giỏ được trả lại như cũ khi xong")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Email người dùng, mặc định người đầu tiên")
+        parser.add_argument("--product", type=int, help="Id sản phẩm, mặc định sản phẩm đang bán đầu tiên")
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--requests", type=int, default=50, help="Số lần cộng mỗi luồng")
+        parser.add_argument("--store", default=None,
+                            help="Lớp cart store, mặc định settings.CART_STORE; 'legacy' là cách đọc-cộng-save cũ")
+        parser.add_argument("--compare-legacy", action="store_true", help="Chạy thêm cách cũ để so sánh")
+        parser.add_argument("--stock", type=int,
+                            help="Tạm đặt tồn kho của sản phẩm (trả lại khi xong), mặc định threads x requests")
+
+    def handle(self, *args, **options):
+        user = (User.objects.filter(email=options["user"]) if options["user"] else User.objects.order_by("id")).first()
+        products = Product.objects.filter(active=True)
+        product = (products.filter(pk=options["product"]) if options["product"] else products.order_by("id")).first()
+        if user is None or product is None:
+            raise CommandError("Không tìm thấy người dùng hoặc sản phẩm")
+
+        stores = [options["store"] or getattr(settings, 'CART_STORE', 'EcoReMartApp.cart_store.DatabaseCartStore')]
+        if options["compare_legacy"] and stores[0] != "legacy":
+            stores.append("legacy")
+        stock = product.available_quantity
+        product.available_quantity = options["stock"] or options["threads"] * options["requests"]
+        Product.objects.filter(pk=product.pk).update(available_quantity=product.available_quantity)
+        original = CartItem.objects.filter(cart__user=user, product=product).values_list("quantity", flat=True).first()
+        self.stdout.write(f"{user.email}, sản phẩm {product.id} (tồn kho {product.available_quantity}): "
+                          f"{options['threads']} luồng x {options['requests']} lần cộng 1")
+        failed = False
+        try:
+            for path in stores:
+                store = LegacyCartStore() if path == "legacy" else import_string(path)()
+                try:
+                    passed = self.run(path, store, user, product, options["threads"], options["requests"])
+                    # Cách cũ mất lượt cộng là điều cần chứng minh khi so sánh, không tính là lỗi
+                    failed |= not passed and path != "legacy"
+                finally:
+                    store.remove(user, [product.id])
+                    if original is not None:
+                        store.add(user, product.id, original, original)
+                    store.flush(user)
+        finally:
+            Product.objects.filter(pk=product.pk).update(available_quantity=stock)
+        if failed:
+            raise CommandError("Có lượt cộng bị mất hoặc vượt tồn kho")
+
+    def run(self, name, store, user, product, threads, requests):
+        store.remove(user, [product.id])
+        store.flush(user)
+        barrier = threading.Barrier(threads)
+        succeeded, errors = [0] * threads, []
+
+        def worker(index):
+            try:
+                barrier.wait()
+                for _ in range(requests):
+                    try:
+                        store.add(user, product.id, 1, product.available_quantity)
+                        succeeded[index] += 1
+                    except CartStoreError:
+                        pass  # hết tồn kho / giỏ bận: không tính là lượt cộng thành công
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        store.flush(user)
+
+        final = CartItem.objects.filter(cart__user=user, product=product).values_list("quantity", flat=True).first() or 0
+        ok = sum(succeeded)
+        lost = ok - final
+        passed = lost == 0 and final <= product.available_quantity and not errors
+        style = self.style.SUCCESS if passed else self.style.ERROR
+        self.stdout.write(style(
+            f"  {name}: {threads * requests / elapsed:.0f} lần cộng/s, thành công {ok}, số lượng cuối {final}, "
+            f"mất {lost} lượt, lỗi {len(errors)}" + (f" ({errors[0]!r})" if errors else "")))
+        return passed
@@ -0,0 +1,275 @@
+# Nơi lưu ảnh upload. Mặc định là Cloudinary; IMAGE_UPLOAD_BACKEND trong settings chọn lớp khác
+# (vd. LocalBackend bên dưới cho máy dev/CI/benchmark không có mạng) miễn có cùng các phương thức
+# upload/delete/url, và upload_url/sign_upload/verify_upload nếu dùng upload trực tiếp từ client (direct_uploads.py).
+import hashlib
+import hmac
+import io
+import os
+import re
+import threading
+import time
+
+import cloudinary.api
+import cloudinary.uploader
+import cloudinary.utils
+from cloudinary import CloudinaryResource
+from django.conf import settings
+from django.utils.module_loading import import_string
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+DELETE_BATCH_SIZE = 100  # giới hạn public_ids mỗi lần gọi delete_resources của Cloudinary
+SIGNATURE_MAX_AGE = 60 * 60  # Cloudinary từ chối chữ ký upload cũ hơn 1 giờ
+
+
+class CloudinaryBackend:
+    def upload(self, file, **options):
+        """Upload một file, trả về CloudinaryResource (giống CloudinaryField.pre_save)."""
+        return cloudinary.uploader.upload_resource(file, **options)
+
+    def delete(self, public_ids, resource_type='image', type='upload'):
+        public_ids = list(public_ids)
+        for start in range(0, len(public_ids), DELETE_BATCH_SIZE):
+            cloudinary.api.delete_resources(public_ids[start:start + DELETE_BATCH_SIZE],
+                                            resource_type=resource_type, type=type)
+
+    def url(self, public_id, **options):
+        return cloudinary.utils.cloudinary_url(public_id, **options)[0]
+
+    def upload_url(self, resource_type='image'):
+        return cloudinary.utils.cloudinary_api_url('upload', resource_type=resource_type)
+
+    def sign_upload(self, params):
+        """Tham số để client tự POST file lên Cloudinary: params + api_key + signature."""
+        return cloudinary.utils.sign_request(dict(params), {})
+
+    def verify_upload(self, public_id, version, signature):
+        # Chữ ký Cloudinary trả về sau khi upload, chỉ tạo được khi biết api_secret
+        return cloudinary.utils.verify_api_response_signature(public_id, version, signature)
+
+
+class StorageError(Exception):
+    pass
+
+
+class LocalBackend:
+    """
+    Thay Cloudinary bằng thư mục trên đĩa (LOCAL_MEDIA_ROOT), cùng giao diện CloudinaryBackend:
+    - upload: public_id là sha1 nội dung (thêm folder nếu có) nên cùng file luôn ra cùng URL
+    - url: {LOCAL_MEDIA_URL}{resource_type}/{type}/{transformation}/v{version}/{public_id}.{format},
+      transformation dựng bằng chính cloudinary.utils nên cùng tuỳ chọn biến thể (w/h/c/q/f) như Cloudinary,
+      ảnh biến thể được Pillow tạo lần đầu khi có request (view local_media) rồi lưu lại
+    - sign_upload/verify_upload: ký HMAC bằng SECRET_KEY theo đúng cách Cloudinary ký
+    LOCAL_MEDIA_LATENCY (giây) là độ trễ giả lập mỗi lần upload/delete để benchmark gần với storage thật.
+    """
+    DERIVED_DIR = '_derived'
+
+    def __init__(self, root=None, latency=None, base_url=None):
+        self.root = root or getattr(settings, 'LOCAL_MEDIA_ROOT', os.path.join(settings.BASE_DIR, 'local_media'))
+        self.latency = getattr(settings, 'LOCAL_MEDIA_LATENCY', 0) if latency is None else latency
+        self.base_url = base_url or getattr(settings, 'LOCAL_MEDIA_URL', '/local-media/')
+        self.secret = settings.SECRET_KEY
+
+    def delay(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def path(self, *parts):
+        # Chặn public_id kiểu "../../x" thoát ra ngoài root
+        root = os.path.realpath(self.root)
+        path = os.path.realpath(os.path.join(root, *parts))
+        if os.path.commonpath([root, path]) != root:
+            raise StorageError("Đường dẫn không hợp lệ")
+        return path
+
+    def upload(self, file, **options):
+        self.delay()
+        if hasattr(file, 'seek'):
+            file.seek(0)
+        data = file.read()
+        resource_type = options.get('resource_type') or 'image'
+        type_ = options.get('type') or 'upload'
+        image_format, width, height = self.describe(data, getattr(file, 'name', None))
+        public_id = options.get('public_id') or hashlib.sha1(data).hexdigest()[:20]
+        if options.get('folder') and not options.get('public_id'):
+            public_id = f"{options['folder'].strip('/')}/{public_id}"
+        # Upload có chữ ký (timestamp) lấy version theo thời điểm ký như Cloudinary, còn lại cố định để URL ổn định
+        version = str(options.get('timestamp') or 1)
+
+        path = self.path(resource_type, type_, f"{public_id}.{image_format}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return CloudinaryResource(public_id, format=image_format, version=version, type=type_,
+                                  resource_type=resource_type,
+                                  metadata={'bytes': len(data), 'width': width, 'height': height})
+
+    @staticmethod
+    def describe(data, name):
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                image_format = (image.format or '').lower().replace('jpeg', 'jpg')
+                return image_format or 'jpg', image.width, image.height
+        except (UnidentifiedImageError, OSError):
+            extension = os.path.splitext(name or '')[1].lstrip('.').lower()
+            return extension or 'bin', None, None
+
+    def delete(self, public_ids, resource_type='image', type='upload'):
+        self.delay()
+        for public_id in public_ids:
+            for directory in self.derived_dirs(resource_type, type) + [self.path(resource_type, type)]:
+                for path in self.matching_files(directory, public_id):
+                    os.remove(path)
+
+    def derived_dirs(self, resource_type, type_):
+        base = self.path(self.DERIVED_DIR, resource_type, type_)
+        if not os.path.isdir(base):
+            return []
+        return [os.path.join(base, name) for name in os.listdir(base)]
+
+    def matching_files(self, directory, public_id):
+        # public_id.<bất kỳ định dạng nào>
+        folder, name = os.path.split(self.path(directory, public_id))
+        if not os.path.isdir(folder):
+            return []
+        return [os.path.join(folder, entry) for entry in os.listdir(folder)
+                if os.path.splitext(entry)[0] == name]
+
+    def url(self, public_id, **options):
+        if str(public_id).startswith(('http://', 'https://')):
+            return str(public_id)  # ảnh là URL ngoài (vd. avatar mặc định), Cloudinary cũng trả nguyên
+        options = dict(options)
+        resource_type = options.pop('resource_type', None) or 'image'
+        type_ = options.pop('type', None) or 'upload'
+        version = options.pop('version', None) or 1
+        image_format = options.pop('format', None)
+        transformation, _ = cloudinary.utils.generate_transformation_string(**options)
+        parts = [resource_type, type_]
+        if transformation:
+            parts.append(transformation)
+        parts.append(f"v{version}")
+        parts.append(f"{public_id}.{image_format}" if image_format else str(public_id))
+        return self.base_url + '/'.join(parts)
+
+    def resolve(self, url_path):
+        """
+        Đường dẫn file trên đĩa cho phần URL sau LOCAL_MEDIA_URL, tạo ảnh biến thể nếu chưa có.
+        Raise StorageError nếu không có ảnh gốc.
+        """
+        parts = url_path.strip('/').split('/')
+        version_index = next((i for i, part in enumerate(parts) if re.fullmatch(r'v\d+', part)), None)
+        if version_index is None or version_index < 2 or version_index == len(parts) - 1:
+            raise StorageError("URL không hợp lệ")
+        resource_type, type_ = parts[0], parts[1]
+        transformations = parts[2:version_index]
+        public_id = '/'.join(parts[version_index + 1:])
+        stem, requested_format = os.path.splitext(public_id)
+        originals = self.matching_files(self.path(resource_type, type_), stem)
+        if not originals:
+            raise StorageError("Không tìm thấy ảnh")
+        original = originals[0]
+        if not transformations:
+            return original
+        transformation = '/'.join(transformations)
+        extension = requested_format.lstrip('.') or os.path.splitext(original)[1].lstrip('.')
+        derived = self.path(self.DERIVED_DIR, resource_type, type_, transformation.replace('/', '__'),
+                            f"{stem}.{extension}")
+        if not os.path.exists(derived):
+            self.render(original, derived, transformations)
+        return derived
+
+    def render(self, source, target, transformations):
+        try:
+            image = Image.open(source)
+            image = ImageOps.exif_transpose(image)
+        except (UnidentifiedImageError, OSError):
+            raise StorageError("Không đọc được ảnh gốc")
+        quality = 80
+        for component in transformations:
+            params = dict(item.split('_', 1) for item in component.split(',') if '_' in item)
+            image = transform(image, params)
+            if params.get('q', 'auto').isdigit():
+                quality = int(params['q'])
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        image_format = {'jpg': 'JPEG', 'jpeg': 'JPEG', 'png': 'PNG', 'webp': 'WEBP', 'gif': 'GIF'}.get(
+            os.path.splitext(target)[1].lstrip('.').lower(), 'PNG')
+        if image_format == 'JPEG':
+            image = image.convert('RGB')
+        # Ghi ra file tạm rồi đổi tên để request song song không đọc phải file đang ghi dở
+        temporary = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        image.save(temporary, image_format, quality=quality)
+        os.replace(temporary, target)
+
+    def upload_url(self, resource_type='image'):
+        return f"{self.base_url}{resource_type}/upload/"
+
+    def signature(self, params, signature_version=2):
+        return cloudinary.utils.api_sign_request(params, self.secret, signature_version=signature_version)
+
+    def sign_upload(self, params):
+        params = {k: v for k, v in params.items() if v is not None}
+        return dict(params, signature=self.signature(params), api_key='local')
+
+    def verify_upload(self, public_id, version, signature):
+        expected = self.signature({'public_id': public_id, 'version': version}, signature_version=1)
+        return hmac.compare_digest(expected, str(signature))
+
+    def signed_upload(self, file, params):
+        """Nhận upload trực tiếp từ client như API upload của Cloudinary, trả về các trường Cloudinary trả về."""
+        params = dict(params)
+        signature = str(params.pop('signature', ''))
+        signed = {k: v for k, v in params.items() if k not in ('file', 'api_key', 'resource_type') and v != ''}
+        if not hmac.compare_digest(self.signature(signed), signature):
+            raise StorageError("Chữ ký không hợp lệ")
+        try:
+            timestamp = int(signed.get('timestamp'))
+        except (TypeError, ValueError):
+            raise StorageError("Thiếu timestamp")
+        if time.time() - timestamp > SIGNATURE_MAX_AGE:
+            raise StorageError("Chữ ký đã hết hạn")
+        resource = self.upload(file, public_id=signed.get('public_id'), folder=signed.get('folder'),
+                               timestamp=int(time.time()))
+        allowed = [f for f in str(signed.get('allowed_formats') or '').split(',') if f]
+        if allowed and resource.format not in allowed and not (resource.format == 'jpg' and 'jpeg' in allowed):
+            self.delete([resource.public_id])
+            raise StorageError(f"Định dạng {resource.format} không được phép")
+        return {
+            'public_id': resource.public_id,
+            'version': int(resource.version),
+            'format': resource.format,
+            'resource_type': resource.resource_type,
+            'type': resource.type,
+            'bytes': resource.metadata['bytes'],
+            'width': resource.metadata['width'],
+            'height': resource.metadata['height'],
+            'secure_url': self.url(resource.public_id, format=resource.format, version=resource.version),
+            'signature': self.signature({'public_id': resource.public_id, 'version': resource.version},
+                                        signature_version=1),
+        }
+
+
+def transform(image, params):
+    # Một thành phần transformation Cloudinary (w_, h_, c_) áp lên ảnh Pillow; q_/f_ xử lý lúc ghi file
+    width = int(params['w']) if params.get('w', '').isdigit() else None
+    height = int(params['h']) if params.get('h', '').isdigit() else None
+    if not width and not height:
+        return image
+    crop = params.get('c', 'scale')
+    if not width or not height:
+        ratio = image.width / image.height
+        width = width or max(1, round(height * ratio))
+        height = height or max(1, round(width / ratio))
+    if crop in ('fill', 'lfill', 'thumb', 'crop'):
+        return ImageOps.fit(image, (width, height), Image.LANCZOS)
+    if crop == 'pad':
+        return ImageOps.pad(image, (width, height), Image.LANCZOS)
+    if crop == 'fit':
+        return ImageOps.contain(image, (width, height), Image.LANCZOS)
+    if crop == 'limit':
+        image = image.copy()
+        image.thumbnail((width, height), Image.LANCZOS)
+        return image
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def get_backend():
+    return import_string(getattr(settings, 'IMAGE_UPLOAD_BACKEND', 'EcoReMartApp.media_backends.CloudinaryBackend'))()
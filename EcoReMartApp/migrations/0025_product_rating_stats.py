@@ -0,0 +1,65 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:51
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_rating_stats(apps, schema_editor):
+    Product = apps.get_model('EcoReMartApp', 'Product')
+    Comment = apps.get_model('EcoReMartApp', 'Comment')
+    stats = {}
+    for row in Comment.objects.values('product_id', 'rating').annotate(n=Count('id')).order_by():
+        product_stats = stats.setdefault(row['product_id'], {'rating_count': 0, 'rating_sum': 0})
+        product_stats['rating_count'] += row['n']
+        product_stats['rating_sum'] += row['n'] * row['rating']
+        if 1 <= row['rating'] <= 5:
+            key = f"rating_{row['rating']}_count"
+            product_stats[key] = product_stats.get(key, 0) + row['n']
+    for product_id, product_stats in stats.items():
+        Product.objects.filter(pk=product_id).update(**product_stats)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EcoReMartApp', '0024_remove_withdrawalrequest_store_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:52
+
+from django.db import migrations, models
+
+
+def backfill_rating_avg(apps, schema_editor):
+    Product = apps.get_model('EcoReMartApp', 'Product')
+    Product.objects.filter(rating_count__gt=0).update(
+        rating_avg=models.ExpressionWrapper(
+            models.F('rating_sum') * 1.0 / models.F('rating_count'), output_field=models.FloatField()
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EcoReMartApp', '0025_product_rating_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_avg',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_avg, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['active', 'price', 'id'], name='product_active_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['active', 'purchases', 'id'], name='product_active_purchases_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['active', 'rating_avg', 'id'], name='product_active_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['active', 'created_date', 'id'], name='product_active_created_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EcoReMartApp', '0026_product_rating_avg_ordering_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productcategory',
+            index=models.Index(fields=['category', 'product'], name='productcategory_cat_prod_idx'),
+        ),
+    ]
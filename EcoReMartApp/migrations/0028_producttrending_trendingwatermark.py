@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EcoReMartApp', '0027_productcategory_category_product_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductTrending',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='EcoReMartApp.product')),
+                ('score', models.FloatField(db_index=True, default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TrendingWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_order_item_id', models.BigIntegerField(default=0)),
+                ('scored_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
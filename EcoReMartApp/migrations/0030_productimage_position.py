@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:12
+
+from django.db import migrations, models
+
+
+def backfill_positions(apps, schema_editor):
+    # Giữ thứ tự cũ (theo id) trong từng sản phẩm
+    ProductImage = apps.get_model('EcoReMartApp', 'ProductImage')
+    batch, product_id, position = [], None, 0
+    for image_id, image_product_id in ProductImage.objects.order_by('product_id', 'id').values_list('id', 'product_id'):
+        position = position + 1 if image_product_id == product_id else 0
+        product_id = image_product_id
+        if position:
+            batch.append(ProductImage(id=image_id, position=position))
+        if len(batch) >= 1000:
+            ProductImage.objects.bulk_update(batch, ['position'])
+            batch = []
+    if batch:
+        ProductImage.objects.bulk_update(batch, ['position'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EcoReMartApp', '0029_productrelation'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='productimage',
+            options={'ordering': ['position', 'id']},
+        ),
+        migrations.AddField(
+            model_name='productimage',
+            name='position',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_positions, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='productimage',
+            index=models.Index(fields=['product', 'position', 'id'], name='productimage_prod_pos_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EcoReMartApp', '0030_productimage_position'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commentimage',
+            name='image_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=35, null=True),
+        ),
+        migrations.AddField(
+            model_name='productimage',
+            name='image_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=35, null=True),
+        ),
+    ]
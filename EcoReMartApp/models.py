@@ -1,5 +1,6 @@
 from cloudinary.models import CloudinaryField
 from django.db import models
+from django.db.models.functions import Greatest
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 from decimal import Decimal
@@ -89,13 +90,121 @@ class Product(models.Model):
     purchases = models.PositiveIntegerField(default=0)
     store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='products')
     product_condition = models.ForeignKey(ProductCondition, on_delete=models.SET_NULL, null=True,related_name="products")
+    # Thống kê đánh giá, cập nhật dần khi thêm/xoá comment (xem update_rating_stats)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+    rating_avg = models.FloatField(default=0)
+    RATING_STAT_FIELDS = ['rating_count', 'rating_sum', 'rating_avg'] + [f"rating_{star}_count" for star in range(1, 6)]
     class Meta:
         ordering = ['-created_date']
+        # Mỗi kiểu sắp xếp của danh sách sản phẩm (xem PRODUCT_ORDERINGS) có một index riêng
+        indexes = [
+            models.Index(fields=['active', 'price', 'id'], name='product_active_price_idx'),
+            models.Index(fields=['active', 'purchases', 'id'], name='product_active_purchases_idx'),
+            models.Index(fields=['active', 'rating_avg', 'id'], name='product_active_rating_idx'),
+            models.Index(fields=['active', 'created_date', 'id'], name='product_active_created_idx'),
+        ]
 
     @property
     def owner(self):
         return self.store.user
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Giữ giá trị lúc load để signal biết sản phẩm có đổi trạng thái đang bán hay không
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    @property
+    def is_listed(self):
+        return self.active and self.available_quantity > 0
+
+    @property
+    def was_listed(self):
+        loaded = getattr(self, '_loaded_values', {})
+        if 'active' not in loaded or 'available_quantity' not in loaded:
+            return None
+        return bool(loaded['active']) and loaded['available_quantity'] > 0
+
+    @property
+    def avg_rating(self):
+        if not self.rating_count:
+            return None
+        return self.rating_sum / self.rating_count
+
+    @property
+    def rating_histogram(self):
+        return {star: getattr(self, f"rating_{star}_count") for star in range(1, 6)}
+
+    @classmethod
+    def update_rating_stats(cls, product_id, rating, delta=1):
+        # Cộng/trừ trực tiếp trong DB bằng F() để không mất cập nhật khi có nhiều request đồng thời
+        rating = int(rating)
+        changes = {
+            'rating_count': cls.rating_counter_change('rating_count', delta),
+            'rating_sum': cls.rating_counter_change('rating_sum', delta * rating),
+        }
+        if 1 <= rating <= 5:
+            histogram_field = f"rating_{rating}_count"
+            changes[histogram_field] = cls.rating_counter_change(histogram_field, delta)
+        products = cls.objects.filter(pk=product_id)
+        updated = products.update(**changes)
+        # rating_avg tính ở câu UPDATE thứ hai để đọc giá trị mới trên mọi DB (MySQL gán tuần tự từng cột)
+        products.update(rating_avg=cls.rating_avg_expression())
+        return updated
+
+    @staticmethod
+    def rating_counter_change(field, amount):
+        if amount >= 0:
+            return models.F(field) + amount
+        # Trừ có sàn 0 (xoá comment chạy đua với update_rating_stats không làm bộ đếm âm).
+        # GREATEST trước rồi mới trừ để cột unsigned trên MySQL không ra số âm giữa chừng
+        return Greatest(models.F(field), -amount) + amount
+
+    @classmethod
+    def expected_rating_stats(cls, comments):
+        # {product_id: thống kê rating} tính lại từ các comment bằng một truy vấn GROUP BY
+        expected = {}
+        for row in comments.values('product_id', 'rating').annotate(n=models.Count('id')).order_by():
+            stats = expected.setdefault(row['product_id'], dict.fromkeys(cls.RATING_STAT_FIELDS, 0))
+            stats['rating_count'] += row['n']
+            stats['rating_sum'] += row['n'] * row['rating']
+            if 1 <= row['rating'] <= 5:
+                stats[f"rating_{row['rating']}_count"] += row['n']
+        for stats in expected.values():
+            stats['rating_avg'] = stats['rating_sum'] / stats['rating_count']
+        return expected
+
+    @classmethod
+    def recompute_rating_stats(cls, product_ids):
+        # Tính lại thống kê của vài sản phẩm sau khi nhiều comment bị xoá một lúc (xoá theo user/sản phẩm)
+        product_ids = set(product_ids)
+        if not product_ids:
+            return 0
+        expected = cls.expected_rating_stats(Comment.objects.filter(product_id__in=product_ids))
+        zero = dict.fromkeys(cls.RATING_STAT_FIELDS, 0)
+        products = list(cls.objects.filter(id__in=product_ids).only('id', *cls.RATING_STAT_FIELDS))
+        for product in products:
+            for field, value in expected.get(product.id, zero).items():
+                setattr(product, field, value)
+        return cls.objects.bulk_update(products, cls.RATING_STAT_FIELDS)
+
+    @staticmethod
+    def rating_avg_expression():
+        return models.Case(
+            models.When(rating_count=0, then=models.Value(0.0)),
+            default=models.ExpressionWrapper(
+                models.F('rating_sum') * 1.0 / models.F('rating_count'), output_field=models.FloatField()
+            ),
+            output_field=models.FloatField(),
+        )
+
     def __str__(self):
         return self.name
 
@@ -112,6 +221,11 @@ class Category(models.Model):
 class ProductCategory(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    class Meta:
+        # Lọc ?category_id= chỉ cần đọc index này (category_id -> product_id)
+        indexes = [
+            models.Index(fields=['category', 'product'], name='productcategory_cat_prod_idx'),
+        ]
 
     def __str__(self):
         return f"{self.product.name} - {self.category.name}"
@@ -120,6 +234,15 @@ class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
     image = CloudinaryField('image', blank=True, null=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    # Thứ tự hiển thị trong sản phẩm, ảnh position nhỏ nhất là ảnh chính
+    position = models.PositiveIntegerField(default=0)
+    # Hash nhận dạng ảnh (image_processing.image_hash), dùng lại asset đã có khi cùng store upload lại ảnh trùng
+    image_hash = models.CharField(max_length=35, blank=True, null=True, db_index=True)
+    class Meta:
+        ordering = ['position', 'id']
+        indexes = [
+            models.Index(fields=['product', 'position', 'id'], name='productimage_prod_pos_idx'),
+        ]
 
     def __str__(self):
         return f"Ảnh của {self.product.name}"
@@ -201,6 +324,35 @@ class OrderItem(models.Model):
     def __str__(self):
         return f"{self.order.id} - {self.product.name} x {self.quantity}"
 
+class ProductTrending(models.Model):
+    # Điểm xu hướng giảm dần theo thời gian, do lệnh compute_trending ghi định kỳ
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='trending')
+    score = models.FloatField(default=0, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.product_id} - {self.score:.3f}"
+
+class TrendingWatermark(models.Model):
+    # Một dòng duy nhất: OrderItem cuối cùng đã tính và thời điểm các điểm số được quy về
+    last_order_item_id = models.BigIntegerField(default=0)
+    scored_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.last_order_item_id} @ {self.scored_at}"
+
+class ProductRelation(models.Model):
+    # "Thường được mua cùng": top-K sản phẩm hay xuất hiện chung đơn, do lệnh build_related_products ghi
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='related_links')
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    score = models.PositiveIntegerField()
+    rank = models.PositiveSmallIntegerField()
+    class Meta:
+        unique_together = ('product', 'rank')
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.related_id} ({self.score})"
+
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')
     products = models.ManyToManyField(Product, through='CartItem',)
@@ -242,6 +394,7 @@ class Comment(models.Model):
 class CommentImage(models.Model):
     comment = models.ForeignKey(Comment, on_delete=models.CASCADE, related_name='images')
     image = CloudinaryField('image', blank=True, null=True)
+    image_hash = models.CharField(max_length=35, blank=True, null=True, db_index=True)
     def __str__(self):
         return str(self.id)
 
@@ -1,4 +1,13 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from collections.abc import Mapping
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
 
 class ProductPaginator(PageNumberPagination):
     page_size = 15
@@ -7,4 +16,87 @@ class CommentPaginator(PageNumberPagination):
     page_size = 6
 
 class OrderPaginator(PageNumberPagination):
-    page_size = 4
\ No newline at end of file
+    page_size = 4
+
+
+class KeysetPaginator(BasePagination):
+    """
+    Phân trang theo khoá (keyset): trang sau lọc bằng giá trị của bản ghi cuối trang trước
+    thay vì OFFSET, nên mỗi trang chỉ đọc page_size dòng trên index của ordering.
+    Trường cuối của ordering phải là duy nhất (thường là id).
+    """
+    page_size = 15
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Cursor không hợp lệ'
+
+    def __init__(self, ordering, name=None):
+        self.ordering = tuple(ordering)
+        self.name = name or ','.join(self.ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.after_position(position))
+
+        rows = list(queryset[:self.page_size + 1])
+        page = rows[:self.page_size]
+        self.next_position = self.get_position(page[-1]) if len(rows) > self.page_size else None
+        return page
+
+    def after_position(self, position):
+        # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y), đổi chiều với trường sắp xếp giảm dần
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def get_position(self, instance):
+        position = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            # Trang có thể là model instance hoặc dict từ .values() (xem projections.py)
+            value = instance[name] if isinstance(instance, Mapping) else getattr(instance, name)
+            position.append(value.isoformat() if hasattr(value, 'isoformat') else str(value))
+        return position
+
+    def encode_cursor(self, position):
+        raw = json.dumps({'o': self.name, 'p': position}).encode()
+        return base64.urlsafe_b64encode(raw).decode()
+
+    def decode_cursor(self, request, model):
+        # request của DRF hoặc HttpRequest thường (vd. view trong admin)
+        encoded = getattr(request, 'query_params', request.GET).get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            if data['o'] != self.name or len(data['p']) != len(self.ordering):
+                raise ValueError
+            return [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, data['p'])
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+
+class ProductKeysetPaginator(KeysetPaginator):
+    page_size = ProductPaginator.page_size
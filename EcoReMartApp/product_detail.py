@@ -0,0 +1,38 @@
+# Nạp sản phẩm kèm mọi thứ ProductDetailSerializer cần trong số truy vấn cố định,
+# không phụ thuộc số ảnh/danh mục: sản phẩm + store + tình trạng (JOIN), ảnh, danh mục.
+# Số bình luận/điểm đánh giá đã nằm sẵn trên cột rating_* của Product nên không tốn thêm truy vấn.
+from django.db.models import Prefetch
+
+from EcoReMartApp.models import Product, ProductImage
+
+# Số truy vấn tối đa để serialize một sản phẩm chi tiết, ProductDetailQueryTests (tests.py) kiểm tra con số này
+DETAIL_QUERY_BUDGET = 3
+
+# Trường của ProductDetailSerializer cần ảnh (get_image/get_srcset đọc ảnh đầu tiên từ cache prefetch)
+IMAGE_FIELDS = ('image', 'srcset', 'images')
+
+
+def with_detail_relations(queryset, fields=None):
+    """
+    fields: các trường serializer còn giữ sau ?fields/?omit (serializer.fields), None là đủ trường.
+    Chỉ JOIN/prefetch quan hệ mà các trường đó dùng, vd. ?fields=id chỉ tốn một truy vấn.
+    """
+    def wanted(*names):
+        return fields is None or any(name in fields for name in names)
+
+    related = [name for name, field in (('store', 'store'), ('product_condition', 'conditions')) if wanted(field)]
+    if related:
+        queryset = queryset.select_related(*related)
+    if wanted(*IMAGE_FIELDS):
+        # Sắp theo (position, id) để images.first() trong ProductSerializer.get_image đọc luôn từ cache prefetch
+        queryset = queryset.prefetch_related(
+            Prefetch('images', queryset=ProductImage.objects.order_by('position', 'id')))
+    if wanted('categories'):
+        queryset = queryset.prefetch_related('categories')
+    return queryset
+
+
+def load_product_detail(pk, queryset=None):
+    """Trả về Product đã nạp sẵn quan hệ cho ProductDetailSerializer, raise Product.DoesNotExist nếu không có."""
+    queryset = Product.objects.all() if queryset is None else queryset
+    return with_detail_relations(queryset).get(pk=pk)
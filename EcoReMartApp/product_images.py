@@ -0,0 +1,128 @@
+# Cập nhật ảnh sản phẩm theo diff thay vì xoá hết rồi upload lại toàn bộ.
+# Multipart/JSON của update_my_product:
+#   image_order: thứ tự cuối cùng, mỗi phần tử là id ảnh đang có (giữ lại) hoặc "new:<i>" (file new_images[i]);
+#                ảnh đang có không nằm trong image_order bị xoá
+#   new_images: các file mới; remove_image_ids: id ảnh cần xoá (dùng khi không gửi image_order, ảnh mới xếp cuối)
+#   images: cách cũ, thay toàn bộ ảnh bằng các file này
+# Chỉ file mới được upload, chỉ ảnh bị bỏ mới bị xoá (trên storage xoá theo lô sau khi commit).
+from dataclasses import dataclass, field
+
+from django.db import transaction
+
+from EcoReMartApp.image_uploads import discard_unreferenced
+from EcoReMartApp.models import ProductImage
+
+NEW_PREFIX = 'new:'
+
+
+class ImageDiffError(Exception):
+    pass
+
+
+@dataclass
+class ImageDiff:
+    # order: list ('keep', id ảnh) hoặc ('new', vị trí trong new_files), theo thứ tự hiển thị
+    order: list = field(default_factory=list)
+    removed_ids: list = field(default_factory=list)
+    new_files: list = field(default_factory=list)
+
+
+def get_list(data, name):
+    if hasattr(data, 'getlist'):
+        values = data.getlist(name)
+        # multipart có thể gửi một chuỗi "1,new:0,3"
+        if len(values) == 1 and isinstance(values[0], str) and ',' in values[0]:
+            values = values[0].split(',')
+        return [v for v in values if v != '']
+    value = data.get(name)
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def parse_id(value, existing_ids):
+    try:
+        image_id = int(value)
+    except (TypeError, ValueError):
+        raise ImageDiffError(f"id ảnh không hợp lệ: {value}")
+    if image_id not in existing_ids:
+        raise ImageDiffError(f"Ảnh {image_id} không thuộc sản phẩm này")
+    return image_id
+
+
+def parse_image_diff(data, files, existing_ids):
+    """Trả về ImageDiff, hoặc None nếu request không đụng tới ảnh."""
+    existing_ids = list(existing_ids)
+    legacy_files = files.getlist('images')
+    new_files = files.getlist('new_images')
+    order_tokens = get_list(data, 'image_order')
+    remove_tokens = get_list(data, 'remove_image_ids')
+
+    if legacy_files:
+        if new_files or order_tokens or remove_tokens:
+            raise ImageDiffError("Không dùng images cùng với new_images/image_order/remove_image_ids")
+        return ImageDiff(order=[('new', i) for i in range(len(legacy_files))],
+                         removed_ids=existing_ids, new_files=legacy_files)
+    if not (new_files or order_tokens or remove_tokens):
+        return None
+
+    if order_tokens:
+        if remove_tokens:
+            raise ImageDiffError("Dùng image_order hoặc remove_image_ids, không dùng cả hai")
+        order, seen = [], set()
+        for token in order_tokens:
+            token = str(token).strip()
+            if token.startswith(NEW_PREFIX):
+                try:
+                    entry = ('new', int(token[len(NEW_PREFIX):]))
+                except ValueError:
+                    raise ImageDiffError(f"Phần tử image_order không hợp lệ: {token}")
+                if not 0 <= entry[1] < len(new_files):
+                    raise ImageDiffError(f"Không có file new_images[{entry[1]}]")
+            else:
+                entry = ('keep', parse_id(token, existing_ids))
+            if entry in seen:
+                raise ImageDiffError(f"Phần tử image_order bị lặp: {token}")
+            seen.add(entry)
+            order.append(entry)
+        if len([e for e in order if e[0] == 'new']) != len(new_files):
+            raise ImageDiffError("Mỗi file new_images phải có đúng một vị trí trong image_order")
+        kept = {image_id for kind, image_id in order if kind == 'keep'}
+        removed_ids = [image_id for image_id in existing_ids if image_id not in kept]
+    else:
+        removed_ids = list(dict.fromkeys(parse_id(token, existing_ids) for token in remove_tokens))
+        order = ([('keep', image_id) for image_id in existing_ids if image_id not in removed_ids]
+                 + [('new', i) for i in range(len(new_files))])
+
+    if not order:
+        raise ImageDiffError("Sản phẩm phải có ít nhất 1 ảnh")
+    return ImageDiff(order=order, removed_ids=removed_ids, new_files=new_files)
+
+
+def apply_image_diff(product, diff, uploaded):
+    """
+    Áp dụng diff trong transaction hiện tại. uploaded[i] là ảnh đã upload của diff.new_files[i].
+    Ảnh bị xoá được dọn trên storage sau khi transaction commit.
+    """
+    images = {image.id: image for image in ProductImage.objects.filter(product=product)}
+    removed = [images[image_id].image for image_id in diff.removed_ids]
+    if diff.removed_ids:
+        ProductImage.objects.filter(id__in=diff.removed_ids).delete()
+
+    changed, created = [], []
+    for position, (kind, ref) in enumerate(diff.order):
+        if kind == 'keep':
+            image = images[ref]
+            if image.position != position:
+                image.position = position
+                changed.append(image)
+        else:
+            created.append(ProductImage(product=product, image=uploaded[ref], position=position,
+                                        image_hash=getattr(uploaded[ref], 'image_hash', None)))
+    if changed:
+        ProductImage.objects.bulk_update(changed, ['position'])
+    if created:
+        ProductImage.objects.bulk_create(created)
+    if removed:
+        transaction.on_commit(lambda: discard_unreferenced(removed))
+    return diff
@@ -0,0 +1,200 @@
+# Nhập sản phẩm hàng loạt từ CSV/XLSX cho cửa hàng.
+# File được đọc dần (pandas chunksize / openpyxl read_only), kiểm tra theo lô
+# rồi bulk_create Product, ProductCategory; trả về id sản phẩm đã tạo và báo cáo lỗi theo từng dòng.
+# Không nhận cột images: file không chứng minh được ảnh thuộc về người nhập, ảnh được gắn sau qua
+# uploads/sign/ + uploads/attach/ (direct_uploads.verify_uploads) với target=product.
+import os
+from decimal import Decimal, InvalidOperation
+
+import pandas as pd
+from django.db import connection, transaction
+from openpyxl import load_workbook
+
+from EcoReMartApp.models import Category, Product, ProductCategory, ProductCondition, Store
+
+REQUIRED_COLUMNS = ('name', 'price', 'available_quantity', 'product_condition', 'categories')
+LIST_SEPARATOR = ';'
+BATCH_SIZE = 500
+MAX_QUANTITY = 2 ** 31 - 1  # Product.available_quantity là IntegerField: giới hạn chung của các DB Django hỗ trợ
+
+
+class ImportFileError(Exception):
+    pass
+
+
+def lock_store(store):
+    # MySQL không trả id sau bulk insert nên save_batch đọc lại id theo thứ tự; mọi chỗ tạo Product của
+    # store phải giữ khoá này (trong transaction) để không chen sản phẩm vào giữa một lô
+    list(Store.objects.select_for_update().filter(pk=store.pk).values_list('pk', flat=True))
+
+
+def iter_rows(file, filename, chunk_size=BATCH_SIZE):
+    """Sinh (số dòng trong file, dict cột -> chuỗi); dòng 1 là header."""
+    ext = os.path.splitext(filename or '')[1].lower()
+    if ext == '.csv':
+        try:
+            chunks = pd.read_csv(file, chunksize=chunk_size, dtype=str, keep_default_na=False)
+            for chunk in chunks:
+                chunk.columns = [str(c).strip().lower() for c in chunk.columns]
+                check_columns(chunk.columns)
+                for index, values in zip(chunk.index, chunk.to_dict('records')):
+                    yield index + 2, values
+        except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+            raise ImportFileError(f"Không đọc được file CSV: {e}")
+    elif ext in ('.xlsx', '.xlsm'):
+        try:
+            workbook = load_workbook(file, read_only=True, data_only=True)
+        except Exception as e:
+            raise ImportFileError(f"Không đọc được file Excel: {e}")
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(c).strip().lower() if c is not None else '' for c in next(rows, ())]
+            check_columns(header)
+            for row_number, values in enumerate(rows, start=2):
+                if all(v is None for v in values):
+                    continue
+                yield row_number, {h: '' if v is None else str(v) for h, v in zip(header, values) if h}
+        finally:
+            workbook.close()
+    else:
+        raise ImportFileError("Chỉ hỗ trợ file .csv hoặc .xlsx")
+
+
+def check_columns(columns):
+    missing = [c for c in REQUIRED_COLUMNS if c not in columns]
+    if missing:
+        raise ImportFileError(f"Thiếu cột: {', '.join(missing)}")
+
+
+def build_lookup(queryset):
+    # Cho phép tham chiếu bằng id hoặc tên (không phân biệt hoa thường)
+    lookup = {}
+    for obj_id, name in queryset.values_list('id', 'name'):
+        lookup[str(obj_id)] = obj_id
+        lookup[name.strip().lower()] = obj_id
+    return lookup
+
+
+def split_list(value):
+    return [v.strip() for v in str(value).split(LIST_SEPARATOR) if v.strip()]
+
+
+def validate_row(values, conditions, categories):
+    errors = {}
+    name = (values.get('name') or '').strip()
+    if not name:
+        errors['name'] = 'Thiếu name'
+    elif len(name) > Product._meta.get_field('name').max_length:
+        errors['name'] = 'name quá dài'
+
+    note = (values.get('note') or '').strip() or None
+    if note and len(note) > Product._meta.get_field('note').max_length:
+        errors['note'] = 'note quá dài'
+
+    try:
+        price = Decimal(str(values.get('price') or '').strip())
+        if not price.is_finite() or price < 0 or price >= Decimal('1e8'):
+            raise InvalidOperation
+        price = price.quantize(Decimal('0.01'))
+    except InvalidOperation:
+        errors['price'] = 'price không hợp lệ'
+        price = None
+
+    try:
+        # Ô số của Excel đọc ra dạng "3.0": nhận số nguyên, từ chối "2.5" thay vì cắt phần lẻ
+        quantity = Decimal(str(values.get('available_quantity') or '').strip())
+        if not quantity.is_finite() or quantity != quantity.to_integral_value() or not 0 <= quantity <= MAX_QUANTITY:
+            raise ValueError
+        quantity = int(quantity)
+    except (InvalidOperation, ValueError):
+        errors['available_quantity'] = 'available_quantity phải là số nguyên không âm'
+        quantity = None
+
+    condition_key = str(values.get('product_condition') or '').strip().lower()
+    condition_id = conditions.get(condition_key)
+    if condition_id is None:
+        errors['product_condition'] = f"product_condition '{condition_key}' không tồn tại"
+
+    category_ids = []
+    for key in split_list(values.get('categories') or ''):
+        category_id = categories.get(key.lower())
+        if category_id is None:
+            errors['categories'] = f"category '{key}' không tồn tại"
+            break
+        if category_id not in category_ids:
+            category_ids.append(category_id)
+    if not category_ids and 'categories' not in errors:
+        errors['categories'] = 'Thiếu categories'
+
+    if split_list(values.get('images') or ''):
+        errors['images'] = 'Không nhận images trong file, hãy gắn ảnh sau khi nhập qua uploads/attach/'
+    if errors:
+        return None, errors
+    return {
+        'product': Product(name=name, note=note, price=price, available_quantity=quantity,
+                           product_condition_id=condition_id),
+        'category_ids': category_ids,
+    }, None
+
+
+def import_products(store, rows, batch_size=BATCH_SIZE):
+    conditions = build_lookup(ProductCondition.objects.all())
+    categories = build_lookup(Category.objects.all())
+    report = {'created': 0, 'products': [], 'errors': []}
+    batch = []
+    for row_number, values in rows:
+        item, errors = validate_row(values, conditions, categories)
+        if errors:
+            report['errors'].append({'row': row_number, 'errors': errors})
+            continue
+        item['row'] = row_number
+        batch.append(item)
+        if len(batch) >= batch_size:
+            save_to_report(store, batch, report)
+            batch = []
+    if batch:
+        save_to_report(store, batch, report)
+    return report
+
+
+def save_to_report(store, batch, report):
+    # Mỗi lô một transaction: lô lỗi được rollback và báo cho từng dòng, các lô đã lưu vẫn giữ
+    try:
+        save_batch(store, batch)
+    except BatchSaveError as e:
+        report['errors'].extend({'row': item['row'], 'errors': {'batch': str(e)}} for item in batch)
+        return
+    report['created'] += len(batch)
+    report['products'].extend({'row': item['row'], 'id': item['product'].id} for item in batch)
+
+
+class BatchSaveError(Exception):
+    pass
+
+
+@transaction.atomic
+def save_batch(store, batch):
+    products = [item['product'] for item in batch]
+    for product in products:
+        product.store = store
+
+    if connection.features.can_return_rows_from_bulk_insert:
+        Product.objects.bulk_create(products)
+    else:
+        # MySQL không trả id sau bulk insert: khoá store để các sản phẩm mới của store nằm liền nhau
+        # rồi đọc lại id theo thứ tự, đối chiếu tên để chắc chắn khớp
+        lock_store(store)
+        last_id = Product.objects.filter(store=store).order_by('-id').values_list('id', flat=True).first() or 0
+        Product.objects.bulk_create(products)
+        created = list(Product.objects.filter(store=store, id__gt=last_id).order_by('id').values_list('id', 'name'))
+        if len(created) != len(products) or any(name != p.name for (_, name), p in zip(created, products)):
+            raise BatchSaveError("Không xác định được id của sản phẩm vừa tạo (có sản phẩm khác được tạo cùng "
+                                 "lúc), hãy nhập lại các dòng này")
+        for (product_id, _), product in zip(created, products):
+            product.id = product_id
+
+    ProductCategory.objects.bulk_create([
+        ProductCategory(product_id=item['product'].id, category_id=category_id)
+        for item in batch for category_id in item['category_ids']
+    ])
+    return len(products)
@@ -0,0 +1,214 @@
+# Đường serialize nhanh cho các endpoint danh sách (ProductViewSet.list, OrderViewSet.my_orders).
+# Đọc bằng .values() cộng vài truy vấn gom cho dữ liệu con rồi dựng dict trực tiếp, không tạo model instance
+# và không chạy SerializerMethodField theo từng dòng. Kết quả phải giống hệt ProductSerializer/OrderSerializer,
+# kể cả ?fields/?omit/?compact: tập trường được lấy từ chính serializer (khởi tạo một lần cho mỗi request).
+# Đổi serializer thì sửa ở đây theo, lệnh bench_projections/bench_cart kiểm tra hai đường cho ra cùng output.
+from decimal import Decimal
+
+from rest_framework import serializers
+
+from EcoReMartApp.cloudinary_urls import cloudinary_image_url, image_srcset, resource_url, variant_options
+from EcoReMartApp.models import CartItem, OrderItem, Product, ProductImage
+from EcoReMartApp.serializers import (DEFAULT_LIST_IMAGE_VARIANT, CartItemsSerializer, OrderSerializer,
+                                      ProductSerializer, requested_image_variant)
+
+
+def selected_fields(serializer_class, request=None):
+    return serializer_class(context={'request': request} if request is not None else {}).fields
+
+
+def first_images(product_ids):
+    # Giống ProductSerializer.first_image: ảnh đầu tiên theo (position, id) của mỗi sản phẩm.
+    # Đọc thẳng theo index (product, position, id) rồi giữ dòng đầu của mỗi sản phẩm: mỗi sản phẩm chỉ vài
+    # ảnh nên rẻ hơn ROW_NUMBER() (bọc subquery và sắp xếp lại cả tập)
+    if not product_ids:
+        return {}
+    images = {}
+    rows = (ProductImage.objects.filter(product_id__in=product_ids).order_by('product_id', 'position', 'id')
+            .values_list('product_id', 'image'))
+    for product_id, image in rows:
+        images.setdefault(product_id, image)
+    return images
+
+
+class ProductProjection:
+    serializer_class = ProductSerializer
+    values = ('id', 'name', 'available_quantity', 'price', 'purchases', 'active',
+              'store_id', 'store__name', 'store__avatar')
+
+    def __init__(self, request=None):
+        self.fields = selected_fields(self.serializer_class, request)
+        self.price = self.fields['price'].to_representation if 'price' in self.fields else None
+        # Luôn là danh sách nên mặc định thumb như ImageVariantMixin
+        self.variant = variant_options(requested_image_variant(request, DEFAULT_LIST_IMAGE_VARIANT))
+
+    def queryset(self, queryset, *extra_values):
+        return queryset.prefetch_related(None).values(*self.values, *extra_values)
+
+    def project(self, rows):
+        rows = list(rows)
+        needs_images = 'image' in self.fields or 'srcset' in self.fields
+        images = first_images([row['id'] for row in rows]) if needs_images else {}
+        return [self.build(row, images) for row in rows]
+
+    def build(self, row, images):
+        data = {}
+        for name in self.fields:
+            if name == 'price':
+                data[name] = self.price(row['price'])
+            elif name == 'image':
+                data[name] = resource_url(images.get(row['id']), **self.variant)
+            elif name == 'srcset':
+                data[name] = image_srcset(images.get(row['id']))
+            elif name == 'store':
+                data[name] = {
+                    'id': row['store_id'],
+                    'name': row['store__name'],
+                    'avatar': cloudinary_image_url(row['store__avatar'], **self.variant),
+                }
+            else:
+                data[name] = row[name]
+        return data
+
+
+class OrderProjection:
+    serializer_class = OrderSerializer
+    values = ('id', 'user_id', 'order_code', 'store_id', 'store__name', 'voucher_id', 'voucher__code',
+              'voucher__discount_percent', 'order_status_id', 'order_status__status_name', 'note', 'ship_fee',
+              'total_cost', 'created_at', 'payment_method', 'delivery_info_id', 'delivery_info__name',
+              'delivery_info__phone_number', 'delivery_info__address')
+
+    def __init__(self, request=None):
+        self.fields = selected_fields(self.serializer_class, request)
+        self.ship_fee = self.fields['ship_fee'].to_representation if 'ship_fee' in self.fields else None
+        self.total_cost = self.fields['total_cost'].to_representation if 'total_cost' in self.fields else None
+        self.created_at = self.fields['created_at'].to_representation if 'created_at' in self.fields else None
+        # OrderItemInputSerializer dựng ProductSerializer không có request nên luôn đủ trường
+        self.products = ProductProjection()
+
+    def queryset(self, queryset):
+        return queryset.prefetch_related(None).values(*self.values)
+
+    def project(self, rows):
+        rows = list(rows)
+        items = self.order_items([row['id'] for row in rows]) if 'items' in self.fields else {}
+        return [self.build(row, items) for row in rows]
+
+    def order_items(self, order_ids):
+        if not order_ids:
+            return {}
+        # Giống get_items: OrderItem theo thứ tự id, mỗi item kèm ProductSerializer đầy đủ
+        item_rows = list(OrderItem.objects.filter(order_id__in=order_ids)
+                         .order_by('order_id', 'id').values_list('order_id', 'product_id', 'quantity'))
+        product_ids = {product_id for _, product_id, _ in item_rows}
+        product_rows = self.products.queryset(Product.objects.filter(id__in=product_ids))
+        products = {data['id']: data for data in self.products.project(product_rows)}
+        items = {}
+        for order_id, product_id, quantity in item_rows:
+            items.setdefault(order_id, []).append({'product': products[product_id], 'quantity': quantity})
+        return items
+
+    def build(self, row, items):
+        data = {}
+        for name in self.fields:
+            if name == 'user':
+                data[name] = row['user_id']
+            elif name == 'store':
+                data[name] = row['store_id']
+            elif name == 'voucher':
+                data[name] = row['voucher_id']
+            elif name == 'delivery_info':
+                data[name] = {
+                    'id': row['delivery_info_id'],
+                    'name': row['delivery_info__name'],
+                    'phone_number': row['delivery_info__phone_number'],
+                    'address': row['delivery_info__address'],
+                } if row['delivery_info_id'] is not None else None
+            elif name == 'store_name':
+                data[name] = row['store__name']
+            # Trường source='voucher.x'/'order_status.x' bị DRF bỏ hẳn khỏi output khi quan hệ là null
+            elif name in ('voucher_code', 'voucher_discount_percent'):
+                if row['voucher_id'] is not None:
+                    value = row['voucher__code' if name == 'voucher_code' else 'voucher__discount_percent']
+                    data[name] = str(value) if value is not None else None
+            elif name == 'order_status':
+                if row['order_status_id'] is not None:
+                    data[name] = row['order_status__status_name']
+            elif name == 'ship_fee':
+                data[name] = self.ship_fee(row['ship_fee'])
+            elif name == 'total_cost':
+                data[name] = self.total_cost(row['total_cost'])
+            elif name == 'created_at':
+                data[name] = self.created_at(row['created_at'])
+            elif name == 'items':
+                data[name] = items.get(row['id'], [])
+            else:
+                data[name] = row[name]
+        return data
+
+
+class CartProjection:
+    """
+    Giỏ hàng nhóm theo cửa hàng (CartGroupedView) trong 3 truy vấn cố định: dòng giỏ, sản phẩm + store, ảnh chính.
+    Mỗi nhóm giống output cũ ({"store", "products": CartItemsSerializer}) cộng thêm item_count (số sản phẩm),
+    quantity (tổng số lượng) và subtotal, tính luôn trong lúc nhóm; summary() cộng tiếp cho cả giỏ.
+    """
+    def __init__(self):
+        self.updated_at = selected_fields(CartItemsSerializer)['updated_at'].to_representation
+        # CartItemsSerializer dựng ProductSerializer không có request nên luôn đủ trường, ảnh thumb
+        self.products = ProductProjection()
+        self.money = serializers.DecimalField(max_digits=None, decimal_places=2).to_representation
+
+    def items(self, user):
+        # Thứ tự cũ: dòng cập nhật gần nhất trước (thêm id để thứ tự ổn định khi trùng updated_at)
+        return (CartItem.objects.filter(cart__user=user).order_by('-updated_at', '-id')
+                .values_list('product_id', 'quantity', 'updated_at'))
+
+    def groups(self, user, item_rows=None):
+        # item_rows: dòng giỏ đã có sẵn (vd. từ cart_store), cùng dạng và thứ tự với items().
+        # Sản phẩm đã bị xoá (giỏ trên cache còn giữ id) bị bỏ qua và ghi vào self.missing_product_ids
+        item_rows = list(self.items(user) if item_rows is None else item_rows)
+        self.missing_product_ids = []
+        if not item_rows:
+            return []
+        rows = list(self.products.queryset(Product.objects.filter(id__in={row[0] for row in item_rows})))
+        products = {row['id']: (row, data) for row, data in zip(rows, self.products.project(rows))}
+        self.missing_product_ids = [row[0] for row in item_rows if row[0] not in products]
+        item_rows = [row for row in item_rows if row[0] in products]
+
+        # Duyệt theo updated_at giảm dần nên cửa hàng gặp trước là cửa hàng có dòng cập nhật gần nhất
+        groups = {}
+        for product_id, quantity, updated_at in item_rows:
+            row, data = products[product_id]
+            group = groups.get(row['store_id'])
+            if group is None:
+                group = groups[row['store_id']] = {
+                    'store': {
+                        'id': row['store_id'],
+                        'name': row['store__name'],
+                        'avatar': cloudinary_image_url(row['store__avatar']),
+                    },
+                    'products': [],
+                    'item_count': 0,
+                    'quantity': 0,
+                    'subtotal': Decimal(0),
+                }
+            group['products'].append({'product': data, 'quantity': quantity,
+                                      'updated_at': self.updated_at(updated_at)})
+            group['item_count'] += 1
+            group['quantity'] += quantity
+            group['subtotal'] += row['price'] * quantity
+
+        result = list(groups.values())
+        for group in result:
+            group['subtotal'] = self.money(group['subtotal'])
+        return result
+
+    def summary(self, groups):
+        return {
+            'stores': groups,
+            'store_count': len(groups),
+            'item_count': sum(group['item_count'] for group in groups),
+            'quantity': sum(group['quantity'] for group in groups),
+            'total': self.money(sum((Decimal(group['subtotal']) for group in groups), Decimal(0))),
+        }
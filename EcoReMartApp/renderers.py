@@ -0,0 +1,62 @@
+# MessagePack cho REST API, chọn qua header Accept / Content-Type: application/msgpack.
+# Quy ước mã hoá giống JSONRenderer để client đổi định dạng không phải đổi cách đọc dữ liệu:
+#   Decimal -> chuỗi ("125000.00"), datetime/date/time -> chuỗi ISO 8601, UUID -> chuỗi.
+import datetime
+import decimal
+import uuid
+
+import msgpack
+from django.conf import settings
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+
+MSGPACK_MEDIA_TYPE = 'application/msgpack'
+
+
+def msgpack_default(obj):
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, datetime.datetime):
+        # Giống rest_framework.utils.encoders.JSONEncoder: cắt còn mili giây, UTC viết là Z
+        value = obj.isoformat()
+        if obj.microsecond:
+            value = value[:23] + value[26:]
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, (uuid.UUID, Promise)):
+        return force_str(obj)
+    if hasattr(obj, 'tolist'):  # numpy
+        return obj.tolist()
+    if hasattr(obj, '__iter__'):
+        return list(obj)
+    raise TypeError(f"Không mã hoá được kiểu {type(obj).__name__} sang MessagePack")
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = MSGPACK_MEDIA_TYPE
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=msgpack_default, use_bin_type=True)
+
+
+class MessagePackParser(BaseParser):
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        max_size = getattr(settings, 'DATA_UPLOAD_MAX_MEMORY_SIZE', None)
+        body = stream.read(max_size + 1) if max_size else stream.read()
+        if max_size and len(body) > max_size:
+            raise ParseError("Dữ liệu MessagePack vượt quá dung lượng cho phép")
+        try:
+            return msgpack.unpackb(body, raw=False, strict_map_key=False)
+        except (ValueError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError) as e:
+            raise ParseError(f"MessagePack không hợp lệ - {e}")
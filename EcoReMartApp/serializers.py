@@ -1,19 +1,80 @@
 from itertools import product
 
-from cloudinary.utils import cloudinary_url
+from cloudinary import CloudinaryResource
 from django.contrib.admin.templatetags.admin_list import pagination
 from django.template.context_processors import request
 from rest_framework import serializers
+from EcoReMartApp.image_processing import normalize_image
 from EcoReMartApp.location import is_valid_address
 from EcoReMartApp.models import *
 from EcoReMartApp.paginators import ProductPaginator
 from EcoReMart import settings
-class UserSerializer(serializers.ModelSerializer):
-    avatar = serializers.ImageField()
+from EcoReMartApp.cloudinary_urls import (IMAGE_VARIANTS, ORIGINAL_VARIANT, cloudinary_image_url, image_srcset,
+                                          resource_url, variant_options)
+class SparseFieldsMixin:
+    # ?fields=id,name chỉ giữ các trường này, ?omit=a,b bỏ các trường này, ?compact=1 dùng Meta.compact_fields.
+    # Trường bị bỏ được xoá khỏi self.fields ngay khi khởi tạo nên SerializerMethodField
+    # và các truy vấn liên quan của nó không bao giờ chạy. Chỉ áp dụng khi serialize output.
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or 'data' in kwargs:
+            return
+        params = getattr(request, 'query_params', request.GET)
+        fields = split_fields_param(params.get('fields'))
+        if not fields and params.get('compact') in ('1', 'true'):
+            fields = list(getattr(self.Meta, 'compact_fields', ()))
+        omit = split_fields_param(params.get('omit'))
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        for name in omit:
+            self.fields.pop(name, None)
+
+def split_fields_param(value):
+    return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+DEFAULT_LIST_IMAGE_VARIANT = 'thumb'
+
+def requested_image_variant(request, default):
+    value = None
+    if request is not None:
+        value = getattr(request, 'query_params', request.GET).get('image_variant')
+    if not value:
+        return default
+    if value != ORIGINAL_VARIANT and value not in IMAGE_VARIANTS:
+        raise serializers.ValidationError(
+            {"image_variant": f"image_variant phải là một trong: {', '.join([*IMAGE_VARIANTS, ORIGINAL_VARIANT])}"})
+    return value
+
+class ImageVariantMixin:
+    # Ảnh trả về theo ?image_variant=thumb|card|full|original. Mặc định: serialize danh sách (root là
+    # ListSerializer) dùng thumb, còn lại dùng ảnh gốc. Tính một lần cho mỗi serializer.
+    def image_variant(self):
+        if not hasattr(self, '_image_variant'):
+            is_list = isinstance(self.root, serializers.ListSerializer)
+            self._image_variant = requested_image_variant(
+                self.context.get('request'), DEFAULT_LIST_IMAGE_VARIANT if is_list else ORIGINAL_VARIANT)
+        return self._image_variant
+
+class CloudinaryImageField(serializers.ImageField):
+    # Nhận file upload như ImageField (chuẩn hoá bằng normalize_image trước khi CloudinaryField upload),
+    # còn output là URL lấy qua bộ đệm cloudinary_urls
+    def to_internal_value(self, data):
+        return normalize_image(super().to_internal_value(data))
+
+    def to_representation(self, value):
+        if isinstance(value, CloudinaryResource):
+            return resource_url(value)
+        return super().to_representation(value)
+
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    avatar = CloudinaryImageField()
     store= serializers.SerializerMethodField()
     class Meta:
         model = User
         fields = ['id','email','first_name', 'last_name','phone_number','avatar','store']
+        compact_fields = ['id', 'first_name', 'last_name', 'avatar']
         extra_kwargs = {
             'id': {
                 'read_only': True,
@@ -21,16 +82,14 @@ class UserSerializer(serializers.ModelSerializer):
         }
 
     def get_avatar(self, obj):
-        if obj.avatar:
-            url, options = cloudinary_url(obj.avatar.url)
-            return url
+        return resource_url(obj.avatar)
     def get_store(self, obj):
         try:
             store = obj.store  # Nếu không có store, dòng này sẽ raise exception
             return {
                 "id": store.id,
                 "name": store.name,
-                "avatar": store.avatar.url if store.avatar else None
+                "avatar": resource_url(store.avatar)
             }
         except Store.DoesNotExist:
             return None
@@ -44,46 +103,56 @@ class CategoryInProductSerializer(serializers.ModelSerializer):
         model = Category
         fields = ['id','name']
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsMixin, ImageVariantMixin, serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
     store = serializers.SerializerMethodField()
     class Meta:
         model = Product
-        fields = ['id','name','available_quantity','price','image','store', 'purchases','active']
+        fields = ['id','name','available_quantity','price','image','srcset','store', 'purchases','active']
+        compact_fields = ['id', 'name', 'price', 'image']
         extra_kwargs = {
             'active': {
                 'read_only': True,
             },
         }
 
+    def first_image(self, obj):
+        # get_image và get_srcset dùng chung, chỉ truy vấn một lần cho mỗi sản phẩm
+        if not hasattr(obj, '_first_image'):
+            obj._first_image = obj.images.first()
+        return obj._first_image
+
     def get_image(self, obj):
-        first_image = obj.images.first()
-        if first_image and first_image.image:
-            url, options = cloudinary_url(first_image.image.url)
-            return url
+        first_image = self.first_image(obj)
+        if first_image:
+            return resource_url(first_image.image, **variant_options(self.image_variant()))
         return None
 
+    def get_srcset(self, obj):
+        first_image = self.first_image(obj)
+        return image_srcset(first_image.image) if first_image else None
+
     def get_store(self, obj):
         store = obj.store
-        avatar_url = None
-        if store.avatar:
-            avatar_url, _ = cloudinary_url(str(store.avatar))
         return {
             "id": store.id,
             "name": store.name,
-            "avatar": avatar_url
+            "avatar": cloudinary_image_url(store.avatar, **variant_options(self.image_variant()))
         }
 
-class ProductImageSerializer(serializers.ModelSerializer):
+class ProductImageSerializer(ImageVariantMixin, serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
     class Meta:
         model = ProductImage
-        fields = ['id', 'image', 'uploaded_at']
+        fields = ['id', 'image', 'srcset', 'position', 'uploaded_at']
 
     def get_image(self, obj):
-        if obj.image:
-            url, options = cloudinary_url(obj.image.url)
-            return url
+        return resource_url(obj.image, **variant_options(self.image_variant()))
+
+    def get_srcset(self, obj):
+        return image_srcset(obj.image)
 
 class ProductConditionSerializer(serializers.ModelSerializer):
     class Meta:
@@ -95,11 +164,15 @@ class ProductDetailSerializer(ProductSerializer):
     categories = CategoryInProductSerializer(many=True, read_only=True)
     conditions = ProductConditionSerializer(source='product_condition', read_only=True)
     comments_count = serializers.SerializerMethodField()
+    avg_rating = serializers.FloatField(read_only=True)
+    rating_histogram = serializers.DictField(child=serializers.IntegerField(), read_only=True)
     def get_comments_count(self,obj):
-        return obj.comments.all().count()
+        return obj.rating_count
     class Meta:
         model = ProductSerializer.Meta.model
-        fields = list(ProductSerializer.Meta.fields) + ['categories','images','note','conditions','comments_count']
+        fields = list(ProductSerializer.Meta.fields) + ['categories','images','note','conditions','comments_count',
+                                                        'avg_rating','rating_histogram']
+        compact_fields = ProductSerializer.Meta.compact_fields
     extra_kwargs = {
         'store': {
             'read_only': True,
@@ -109,16 +182,18 @@ class ProductDetailSerializer(ProductSerializer):
         }
     }
 
-class CommentImageSerializer(serializers.ModelSerializer):
+class CommentImageSerializer(ImageVariantMixin, serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
     class Meta:
         model = CommentImage
-        fields = '__all__'
+        exclude = ['image_hash']
 
     def get_image(self, obj):
-        if obj.image:
-            url, options = cloudinary_url(obj.image.url)
-            return url
+        return resource_url(obj.image, **variant_options(self.image_variant()))
+
+    def get_srcset(self, obj):
+        return image_srcset(obj.image)
 
 class CommentSerializer(serializers.ModelSerializer):
     images=CommentImageSerializer(many=True, read_only=True)
@@ -126,7 +201,7 @@ class CommentSerializer(serializers.ModelSerializer):
         req=super().to_representation(comment)
         avatar_url = None
         if comment.user.avatar and hasattr(comment.user.avatar, 'url'):
-            avatar_url = comment.user.avatar.url
+            avatar_url = resource_url(comment.user.avatar)
 
         req['user']={
             'name': f"{comment.user.first_name} {comment.user.last_name}".strip(),
@@ -137,7 +212,7 @@ class CommentSerializer(serializers.ModelSerializer):
         model = Comment
         fields = ['id','user','rating', 'content','created_date','images']
 class StoreSerializer(serializers.ModelSerializer):
-    avatar = serializers.ImageField()
+    avatar = CloudinaryImageField()
     class Meta:
         model = Store
         fields = ('id','name','address','avatar')
@@ -147,9 +222,7 @@ class StoreSerializer(serializers.ModelSerializer):
             }
         }
     def get_avatar(self, obj):
-        if obj.avatar:
-            url, options = cloudinary_url(obj.avatar.url)
-            return url
+        return resource_url(obj.avatar)
 
 class StoreDetailSerializer(StoreSerializer):
     class Meta:
@@ -200,7 +273,7 @@ class DeliveryInformationSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Địa chỉ không tồn tại hoặc không hợp lệ.")
         return value
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     items = serializers.SerializerMethodField()
     store_name = serializers.CharField(source='store.name', read_only=True)
     voucher_code = serializers.CharField(source='voucher.code', read_only=True)
@@ -211,6 +284,7 @@ class OrderSerializer(serializers.ModelSerializer):
         model = Order
         fields = ['id','user','delivery_info','order_code', 'store', 'store_name', 'voucher', 'voucher_code','voucher_discount_percent',
                   'order_status', 'note','ship_fee', 'total_cost', 'created_at', 'items','payment_method']
+        compact_fields = ['id', 'order_code', 'store_name', 'order_status', 'total_cost', 'created_at']
 
     def get_items(self, obj):
         order_items = OrderItem.objects.filter(order=obj)
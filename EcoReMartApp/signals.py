@@ -1,10 +1,89 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.conf import settings
-from .models import Cart
+from .models import Cart, Comment, Product, ProductCategory, Category
+from . import category_summary
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_cart_for_user(sender, instance, created, **kwargs):
     if created:
         print("🛒 Signal fired - creating cart for", instance.username)
         Cart.objects.get_or_create(user=instance)
+
+def deleted_model(origin):
+    # origin của post_delete là instance hoặc queryset đã gọi .delete()
+    return origin.model if isinstance(origin, QuerySet) else type(origin)
+
+@receiver(post_delete, sender=Comment)
+def remove_comment_rating(sender, instance, origin=None, **kwargs):
+    model = deleted_model(origin) if origin is not None else Comment
+    if model is Comment:
+        # Trừ lại thống kê rating của sản phẩm khi comment bị xoá
+        Product.update_rating_stats(instance.product_id, instance.rating, delta=-1)
+    elif model is not Product:
+        # Comment bị xoá dây chuyền (vd. xoá user): gom sản phẩm bị ảnh hưởng rồi tính lại một lần sau commit
+        # thay vì 2 câu UPDATE cho mỗi comment. Xoá chính sản phẩm thì không còn gì để cập nhật
+        product_ids = getattr(origin, '_rating_product_ids', None)
+        if product_ids is None:
+            product_ids = origin._rating_product_ids = set()
+            transaction.on_commit(lambda: Product.recompute_rating_stats(product_ids))
+        product_ids.add(instance.product_id)
+
+# ===== Cache tổng hợp danh mục (category_summary) =====
+def refresh_categories_on_commit(category_ids):
+    category_ids = set(category_ids)
+    if category_ids:
+        transaction.on_commit(lambda: category_summary.refresh_categories(category_ids))
+
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+def product_category_changed(sender, instance, **kwargs):
+    refresh_categories_on_commit([instance.category_id])
+
+@receiver(m2m_changed, sender=ProductCategory)
+def product_categories_set(sender, instance, action, reverse, pk_set, **kwargs):
+    # product.categories.set()/add()/remove() đi qua bulk_create/delete nên không có post_save
+    if isinstance(instance, Category):
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            refresh_categories_on_commit([instance.pk])
+    elif action == 'pre_clear':
+        instance._cleared_category_ids = list(instance.categories.values_list('id', flat=True))
+    elif action == 'post_clear':
+        refresh_categories_on_commit(getattr(instance, '_cleared_category_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        refresh_categories_on_commit(pk_set or [])
+
+# Trường của Product hiện trong tổng hợp danh mục (đổi danh mục đã có signal của ProductCategory ở trên).
+# Lưu chỉ đổi purchases/tồn kho/rating... thì không cần truy vấn gì thêm.
+CATEGORY_SUMMARY_FIELDS = ('active', 'price', 'name')
+
+def affects_category_summary(instance, update_fields):
+    if instance.was_listed != instance.is_listed:
+        return True  # bật/tắt bán hoặc hết/có hàng trở lại: số sản phẩm của danh mục đổi
+    if update_fields is not None and not set(CATEGORY_SUMMARY_FIELDS) & set(update_fields):
+        return False
+    loaded = getattr(instance, '_loaded_values', {})
+    return any(field not in loaded or loaded[field] != getattr(instance, field) for field in CATEGORY_SUMMARY_FIELDS)
+
+@receiver(post_save, sender=Product)
+def product_changed(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return  # chưa có ProductCategory, sẽ refresh khi gán danh mục
+    if not affects_category_summary(instance, update_fields):
+        instance._loaded_values = {**getattr(instance, '_loaded_values', {}),
+                                   'available_quantity': instance.available_quantity}
+        return
+    category_ids = list(ProductCategory.objects.filter(product=instance).values_list('category_id', flat=True))
+    if instance.was_listed != instance.is_listed or category_summary.is_previewed(instance.id, category_ids):
+        refresh_categories_on_commit(category_ids)
+    instance._loaded_values = {**getattr(instance, '_loaded_values', {}),
+                               **{field: getattr(instance, field) for field in CATEGORY_SUMMARY_FIELDS},
+                               'available_quantity': instance.available_quantity}
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    transaction.on_commit(category_summary.invalidate_category_list)
+    refresh_categories_on_commit([instance.pk])
@@ -1,3 +1,189 @@
+from decimal import Decimal
+from itertools import combinations
+
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from EcoReMartApp.models import (Category, Product, ProductCategory, ProductCondition, ProductImage, ProductRelation,
+                                 ProductTrending, Store, User)
+from EcoReMartApp.product_detail import DETAIL_QUERY_BUDGET
+from EcoReMartApp.product_import import MAX_QUANTITY
+from EcoReMartApp.serializers import ProductDetailSerializer, ProductSerializer
+
+
+def make_store(name):
+    user = User.objects.create(username=f"owner-{name}", email=f"{name}@example.com")
+    return Store.objects.create(name=name, phone_number="0123456789", introduce="x", address="x", user=user)
+
+
+def make_product(name, store, condition, categories, price, active=True, available_quantity=5):
+    product = Product.objects.create(name=name, store=store, product_condition=condition, price=Decimal(price),
+                                     active=active, available_quantity=available_quantity)
+    for category in categories:
+        ProductCategory.objects.create(product=product, category=category)
+    ProductImage.objects.create(product=product, image=f"{name}-1")
+    ProductImage.objects.create(product=product, image=f"{name}-2")
+    return product
+
+
+class ProductFilterTests(TestCase):
+    # Số truy vấn của GET /product/ khi trang có kết quả: COUNT của paginator, .values() sản phẩm, ảnh đầu tiên
+    LIST_QUERIES = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.store_a, cls.store_b = make_store("store-a"), make_store("store-b")
+        cls.new, cls.used, cls.old = (ProductCondition.objects.create(name=name, description=name)
+                                      for name in ("new", "used", "old"))
+        cls.cat_a, cls.cat_b, cls.cat_c = (Category.objects.create(name=name) for name in ("cat-a", "cat-b", "cat-c"))
+        # Khớp mọi bộ lọc bên dưới và thuộc cả hai danh mục được lọc: không được lặp trong kết quả
+        cls.match = make_product("match", cls.store_a, cls.new, [cls.cat_a, cls.cat_b], 50)
+        make_product("other-store", cls.store_b, cls.used, [cls.cat_b, cls.cat_c], 80)
+        make_product("cheap", cls.store_a, cls.new, [cls.cat_a], 5)
+        make_product("expensive", cls.store_a, cls.used, [cls.cat_b], 500)
+        make_product("old", cls.store_a, cls.old, [cls.cat_a, cls.cat_b], 60)
+        make_product("other-category", cls.store_a, cls.new, [cls.cat_c], 40)
+        make_product("hidden", cls.store_a, cls.new, [cls.cat_a], 50, active=False)
+        make_product("sold-out", cls.store_a, cls.new, [cls.cat_a], 50, available_quantity=0)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def filters(self):
+        # (tham số, điều kiện tương ứng trên Product) cho từng bộ lọc của ProductViewSet.get_queryset
+        categories = (self.cat_a.id, self.cat_b.id)
+        conditions = (self.new.id, self.used.id)
+        return {
+            'min_price': ('10', lambda p: p.price >= 10),
+            'max_price': ('100', lambda p: p.price <= 100),
+            'condition': (list(conditions), lambda p: p.product_condition_id in conditions),
+            'category_id': (list(categories),
+                            lambda p: any(c.id in categories for c in p.categories.all())),
+            'store_id': (str(self.store_a.id), lambda p: p.store_id == self.store_a.id),
+        }
+
+    def test_every_filter_combination(self):
+        filters = self.filters()
+        listed = list(Product.objects.filter(active=True, available_quantity__gt=0).prefetch_related('categories'))
+        for size in range(len(filters) + 1):
+            for names in combinations(filters, size):
+                with self.subTest(filters=names):
+                    with self.assertNumQueries(self.LIST_QUERIES):
+                        response = self.client.get('/product/', {name: filters[name][0] for name in names})
+                    self.assertEqual(response.status_code, 200)
+                    ids = [item['id'] for item in response.data['results']]
+                    expected = {p.id for p in listed if all(filters[name][1](p) for name in names)}
+                    self.assertEqual(len(ids), len(set(ids)), "sản phẩm bị lặp trong kết quả")
+                    self.assertEqual(set(ids), expected)
+                    self.assertEqual(response.data['count'], len(expected))
+                    self.assertIn(self.match.id, ids)
+
+    def test_comma_separated_ids(self):
+        response = self.client.get('/product/', {'category_id': f"{self.cat_a.id},{self.cat_b.id}",
+                                                 'condition': f"{self.new.id},{self.used.id}"})
+        self.assertEqual(response.status_code, 200)
+        ids = [item['id'] for item in response.data['results']]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertIn(self.match.id, ids)
+
+    def test_malformed_filters(self):
+        for params in ({'category_id': 'abc'}, {'category_id': [str(self.cat_a.id), '1.5']}, {'condition': 'x'},
+                       {'store_id': '1a'}, {'store_id': '-1'}, {'min_price': 'abc'}, {'max_price': '-1'},
+                       {'min_price': 'NaN'}, {'max_price': 'Infinity'}):
+            with self.subTest(params=params):
+                response = self.client.get('/product/', params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(next(iter(params)), response.data)
+
+
+class ProductEndpointQueryTests(TestCase):
+    PRODUCTS = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        store = make_store("store")
+        condition = ProductCondition.objects.create(name="new", description="new")
+        category = Category.objects.create(name="cat")
+        cls.products = [make_product(f"p{i}", store, condition, [category], 10 + i) for i in range(cls.PRODUCTS)]
+        for index, product in enumerate(cls.products):
+            ProductTrending.objects.create(product=product, score=index)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_trending_query_count(self):
+        # COUNT, .values() sản phẩm, ảnh đầu tiên: không phụ thuộc số sản phẩm trên trang
+        with self.assertNumQueries(3):
+            response = self.client.get('/product/trending/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], ProductSerializer(self.products[::-1], many=True).data)
+
+    def test_related_query_count(self):
+        # Sản phẩm gốc, ProductRelation, .values() sản phẩm liên quan, ảnh đầu tiên
+        source, *related = self.products
+        for rank, product in enumerate(reversed(related)):
+            ProductRelation.objects.create(product=source, related=product, score=10 - rank, rank=rank)
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/product/{source.id}/related/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, ProductSerializer(related[::-1], many=True).data)
+
+
+class BulkUpdateProductsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.store = make_store("store")
+        condition = ProductCondition.objects.create(name="new", description="new")
+        cls.product = make_product("p", cls.store, condition, [], 10)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.store.user)
+
+    def bulk_update(self, *items):
+        return self.client.patch('/product/bulk-update-my-products/', {'items': list(items)}, format='json')
+
+    def test_available_quantity_out_of_range(self):
+        for quantity in (MAX_QUANTITY + 1, 99999999999, '99999999999', -1, '1.5', '²', True):
+            with self.subTest(quantity=quantity):
+                response = self.bulk_update({'id': self.product.id, 'available_quantity': quantity})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('available_quantity', response.data['details'][0]['errors'])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.available_quantity, 5)
+
+    def test_available_quantity_at_limit(self):
+        response = self.bulk_update({'id': self.product.id, 'available_quantity': str(MAX_QUANTITY)})
+        self.assertEqual(response.status_code, 200)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.available_quantity, MAX_QUANTITY)
+
+
+class ProductDetailQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        store = make_store("store")
+        condition = ProductCondition.objects.create(name="new", description="new")
+        categories = [Category.objects.create(name=f"cat-{i}") for i in range(4)]
+        cls.few = make_product("few", store, condition, categories[:1], 10)
+        cls.many = make_product("many", store, condition, categories, 20)
+        for index in range(8):
+            ProductImage.objects.create(product=cls.many, image=f"many-extra-{index}", position=index)
+
+    def setUp(self):
+        self.client = APIClient()
 
-# Create your tests here.
+    def test_query_budget(self):
+        # Số truy vấn không phụ thuộc số ảnh/danh mục; trường bị bỏ qua ?fields/?omit thì quan hệ của nó không được nạp
+        cases = (('', DETAIL_QUERY_BUDGET), ('fields=id', 1), ('fields=id,store,conditions', 1),
+                 ('fields=id,categories', 2), ('omit=image,srcset,images', 2), ('compact=1', 2),
+                 ('fields=id,srcset', 2))
+        for product in (self.few, self.many):
+            for query, expected in cases:
+                with self.subTest(product=product.name, query=query):
+                    with self.assertNumQueries(expected):
+                        response = self.client.get(f'/product/{product.id}/?{query}')
+                    self.assertEqual(response.status_code, 200)
+                    serializer = ProductDetailSerializer(Product.objects.get(pk=product.pk),
+                                                         context={'request': response.wsgi_request})
+                    self.assertEqual(response.data, serializer.data)
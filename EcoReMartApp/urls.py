@@ -26,6 +26,11 @@ urlpatterns = [
     path('my-cart/', views.CartGroupedView.as_view(), name='my-cart'),
     path('addQuantity-productCart/', views.UpdateCartItemView.as_view(), name='addQuantity-productCart'),
     path('delete-productCart/', views.RemoveCartItemView.as_view(), name='delete-productCart'),
+    path('batch-productCart/', views.CartBatchView.as_view(), name='batch-productCart'),
     path('shipfee/', views.ShipFeeView.as_view(), name='shipfee'),
+    path('uploads/sign/', views.DirectUploadSignView.as_view(), name='uploads-sign'),
+    path('uploads/attach/', views.DirectUploadAttachView.as_view(), name='uploads-attach'),
+    path('local-media/<str:resource_type>/upload/', views.LocalMediaUploadView.as_view(), name='local-media-upload'),
+    path('local-media/<path:path>', views.local_media_view, name='local-media'),
     path("send-online-mail/<int:order_id>/", send_online_order_mail, name="send_online_order_mail"),
 ]
\ No newline at end of file
@@ -1,8 +1,7 @@
 from email.policy import default
 from itertools import product
 
-from cloudinary.utils import cloudinary_url
-from django.http import HttpResponse
+from django.http import FileResponse, Http404, HttpResponse
 from rest_framework import viewsets,permissions,generics,status
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.views import APIView
@@ -10,14 +9,14 @@ from rest_framework.views import APIView
 from EcoReMartApp.models import *
 from EcoReMartApp.permissions import IsAdmin,  IsOwner, IsOwnerOrAdmin
 from EcoReMartApp.serializers import CategorySerializer, ProductSerializer, ProductDetailSerializer, CommentSerializer, \
-    UserSerializer, StoreSerializer, StoreDetailSerializer, CartItemsSerializer, OrderSerializer, \
+    UserSerializer, StoreSerializer, StoreDetailSerializer, OrderSerializer, \
     OrderStatusUpdateSerializer, OrderStatusSerializer, DeliveryInformationSerializer, VoucherSerializer
-from EcoReMartApp.paginators import ProductPaginator, CommentPaginator, OrderPaginator
+from EcoReMartApp.paginators import ProductPaginator, CommentPaginator, OrderPaginator, ProductKeysetPaginator
 from firebase_admin import auth as firebase_auth
 import re
 from django.db import IntegrityError, transaction
+from django.db.models import Max
 from rest_framework.exceptions import ValidationError
-from collections import defaultdict
 from decimal import Decimal
 from EcoReMartApp.location import get_directions_distance,ship_fee_cost
 from EcoReMart import settings
@@ -26,6 +25,15 @@ from django.utils import timezone
 from datetime import datetime
 
 from .async_email import send_async_email
+from .cart_store import CartItemMissing, CartLimitExceeded, CartStoreError, get_cart_store, parse_operations
+from .category_summary import get_category_summary, refresh_product_categories
+from .product_import import MAX_QUANTITY, import_products, iter_rows, lock_store, ImportFileError
+from .projections import CartProjection, OrderProjection, ProductProjection
+from .product_detail import load_product_detail, with_detail_relations
+from .image_uploads import ImageUploadError, create_image_rows, discard_uploads, upload_images
+from .media_backends import LocalBackend, StorageError, get_backend
+from .product_images import ImageDiffError, apply_image_diff, parse_image_diff
+from .direct_uploads import DirectUploadError, issue_upload_params, verify_uploads, MAX_FILES as DIRECT_UPLOAD_MAX_FILES
 from .email_service import send_order_success_email, send_order_notification_to_store
 from .payos_service import PayOSService
 from rest_framework.decorators import action, api_view, permission_classes
@@ -115,9 +123,13 @@ class RegisterView(APIView):
             role="customer"
         )
 
-        # Gán avatar (CloudinaryField sẽ xử lý upload)
+        # Gán avatar (upload qua backend ảnh đang dùng, đã chuẩn hoá)
         if avatar_file:
-            user.avatar = avatar_file
+            try:
+                user.avatar = upload_images([avatar_file], User, 'avatar')[0]
+            except ImageUploadError as e:
+                return Response({"error": "Upload ảnh thất bại", "details": str(e)},
+                                status=status.HTTP_502_BAD_GATEWAY)
         else:
             user.avatar = DEFAULT_AVATAR_URL  # URL string
         if password:
@@ -125,6 +137,8 @@ class RegisterView(APIView):
         try:
             user.save()
         except (IntegrityError, ValidationError) as e:
+            if avatar_file:
+                discard_uploads([user.avatar])
             return Response({"error": "Lưu người dùng thất bại", "details": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         serializer = self.serializer_class(user, context={'request': request})
@@ -164,15 +178,111 @@ class CategoryViewSet(viewsets.ModelViewSet):
         queryset = Category.objects.all()
         serializer_class = CategorySerializer
         def get_permissions(self):
-            if self.action in ['list']:
+            if self.action in ['list', 'summary']:
                 return [permissions.AllowAny()]
             return [IsAdmin]
 
+        # Trang chủ: mọi danh mục kèm số sản phẩm đang bán và vài sản phẩm nổi bật, đọc từ cache
+        @action(detail=False, methods=['get'], url_path='summary')
+        def summary(self, request):
+            return Response(get_category_summary(), status=status.HTTP_200_OK)
+
+
+def parse_id_list(query_params, name):
+    # Nhận cả ?name=1&name=2 lẫn ?name=1,2
+    values = [v.strip() for raw in query_params.getlist(name) for v in raw.split(',') if v.strip()]
+    try:
+        return [int(v) for v in values]
+    except ValueError:
+        raise ValidationError({name: f"{name} phải là danh sách số nguyên"})
+
+def parse_price(query_params, name):
+    value = query_params.get(name)
+    if not value:
+        return None
+    try:
+        price = Decimal(value)
+    except ArithmeticError:
+        raise ValidationError({name: f"{name} không hợp lệ"})
+    if not price.is_finite() or price < 0:
+        raise ValidationError({name: f"{name} không hợp lệ"})
+    return price
+
+BULK_UPDATE_MAX_ITEMS = 500
+BULK_UPDATE_FIELDS = ('price', 'available_quantity', 'active')
+
+def parse_bulk_product_item(item):
+    if not isinstance(item, dict):
+        return None, {'item': 'Mỗi phần tử phải là object'}
+    errors, changes = {}, {}
+    try:
+        changes['id'] = int(item.get('id'))
+    except (TypeError, ValueError):
+        errors['id'] = 'Thiếu id hoặc id không hợp lệ'
+    if item.get('price') is not None:
+        try:
+            price = Decimal(str(item['price']))
+            if not price.is_finite() or price < 0 or price >= Decimal('1e8'):
+                raise ArithmeticError
+            changes['price'] = price.quantize(Decimal('0.01'))
+        except ArithmeticError:
+            errors['price'] = 'price không hợp lệ'
+    if item.get('available_quantity') is not None:
+        quantity = item['available_quantity']
+        # Cột IntegerField: số quá lớn làm cả lô lỗi 500 trên MySQL nên báo lỗi riêng cho phần tử này
+        if isinstance(quantity, bool) or not str(quantity).isdecimal() or int(quantity) > MAX_QUANTITY:
+            errors['available_quantity'] = f'available_quantity phải là số nguyên từ 0 đến {MAX_QUANTITY}'
+        else:
+            changes['available_quantity'] = int(quantity)
+    if item.get('active') is not None:
+        # Cửa hàng chỉ được ẩn sản phẩm; bật lại phải qua admin duyệt
+        if item['active'] is not False:
+            errors['active'] = 'Chỉ được đặt active = false'
+        else:
+            changes['active'] = False
+    if not errors and len(changes) == 1:
+        errors['item'] = 'Không có trường nào để cập nhật'
+    return changes, errors
+
+# Các kiểu sắp xếp cho phép của ?ordering=, id ở cuối để khoá phân trang là duy nhất.
+# Mỗi kiểu có index tương ứng trong Product.Meta.indexes.
+PRODUCT_ORDERINGS = {
+    'price': ('price', 'id'),
+    '-price': ('-price', '-id'),
+    '-purchases': ('-purchases', '-id'),
+    '-rating': ('-rating_avg', '-id'),
+    '-created_date': ('-created_date', '-id'),
+}
+DEFAULT_PRODUCT_ORDERING = '-created_date'
 
 class ProductViewSet(viewsets.ViewSet,generics.ListAPIView,generics.RetrieveAPIView):
-    queryset = Product.objects.prefetch_related('categories').filter(active=True,available_quantity__gt=0)
+    # Danh mục chỉ cần cho retrieve, with_detail_relations tự thêm prefetch
+    queryset = Product.objects.filter(active=True,available_quantity__gt=0)
     pagination_class = ProductPaginator
 
+    def list(self, request, *args, **kwargs):
+        # Dựng output bằng ProductProjection (.values() + ảnh gom một truy vấn), giống hệt ProductSerializer
+        projection = ProductProjection(request)
+        ordering = request.query_params.get('ordering')
+        cursor = request.query_params.get(ProductKeysetPaginator.cursor_query_param)
+        # Giữ phân trang theo ?page= cũ khi client không dùng ordering/cursor
+        if not ordering and not cursor:
+            page = self.paginate_queryset(projection.queryset(self.get_queryset()))
+            return self.get_paginated_response(projection.project(page))
+        # Phân trang keyset không có số trang: báo lỗi thay vì lặng lẽ trả trang đầu
+        if request.query_params.get(self.paginator.page_query_param):
+            return Response({"error": "Không dùng page cùng ordering/cursor, hãy đi theo link next/previous"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        ordering = ordering or DEFAULT_PRODUCT_ORDERING
+        if ordering not in PRODUCT_ORDERINGS:
+            return Response({"error": f"ordering phải là một trong: {', '.join(PRODUCT_ORDERINGS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        paginator = ProductKeysetPaginator(PRODUCT_ORDERINGS[ordering], name=ordering)
+        page = paginator.paginate_queryset(
+            projection.queryset(self.get_queryset(), *(f.lstrip('-') for f in paginator.ordering)), request
+        )
+        return paginator.get_paginated_response(projection.project(page))
+
     def get_serializer_class(self):
         if self.action == 'retrieve'or self.action in ['update_my_product']:
             return ProductDetailSerializer
@@ -180,18 +290,38 @@ class ProductViewSet(viewsets.ViewSet,generics.ListAPIView,generics.RetrieveAPIV
 
     def get_queryset(self):
         query = self.queryset
-        q=self.request.query_params.get('q')
-        category_id = self.request.query_params.get('category_id')
+        params = self.request.query_params
+        q=params.get('q')
+        category_ids = parse_id_list(params, 'category_id')
+        condition_ids = parse_id_list(params, 'condition')
+        store_id = params.get('store_id')
+        min_price = parse_price(params, 'min_price')
+        max_price = parse_price(params, 'max_price')
         if q:
             query=query.filter(name__icontains=q)
-        if category_id:
-            query = query.filter(categories__id=category_id)
+        if category_ids:
+            # Semi-join qua ProductCategory (IN subquery) để không nhân bản dòng khi sản phẩm có nhiều danh mục
+            query = query.filter(id__in=ProductCategory.objects.filter(category_id__in=category_ids)
+                                 .values('product_id'))
+        if condition_ids:
+            query = query.filter(product_condition_id__in=condition_ids)
+        if store_id:
+            if not store_id.isdigit():
+                raise ValidationError({"store_id": "store_id phải là số nguyên"})
+            query = query.filter(store_id=store_id)
+        if min_price is not None:
+            query = query.filter(price__gte=min_price)
+        if max_price is not None:
+            query = query.filter(price__lte=max_price)
+        if self.action == 'retrieve':
+            # Theo các trường còn lại sau ?fields/?omit: trường bị bỏ thì không nạp quan hệ của nó
+            query = with_detail_relations(query, self.get_serializer().fields)
         return query
 
     def get_permissions(self):
         if self.action.__eq__('get_comments') and self.request.method == 'POST':
             return [permissions.IsAuthenticated()]
-        if self.action in ['my_products', 'update_my_product', 'delete_my_product']:
+        if self.action in ['my_products', 'update_my_product', 'delete_my_product', 'bulk_update_my_products']:
             return [permissions.IsAuthenticated()]
         if self.action in ['update_my_product', 'delete_my_product']:
             return [permissions.IsAuthenticated(),IsOwner()]
@@ -208,6 +338,12 @@ class ProductViewSet(viewsets.ViewSet,generics.ListAPIView,generics.RetrieveAPIV
                 return Response({"error": "Thiếu content"}, status=status.HTTP_400_BAD_REQUEST)
             if not rating:
                 return Response({"error": "Thiếu rating"}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                rating = int(rating)
+            except (TypeError, ValueError):
+                rating = None
+            if rating not in range(1, 6):
+                return Response({"error": "Rating phải từ 1 đến 5"}, status=status.HTTP_400_BAD_REQUEST)
             if Comment.objects.filter(product=product, user=request.user).exists():
                 return Response({"error": "Bạn đã đánh giá sản phẩm này rồi"}, status=status.HTTP_400_BAD_REQUEST)
             # Kiểm tra đơn hàng của user với trạng thái "Đơn hàng đã hoàn thành"
@@ -226,11 +362,21 @@ class ProductViewSet(viewsets.ViewSet,generics.ListAPIView,generics.RetrieveAPIV
                     {"error": "Bạn chưa thể đánh giá sản phẩm này"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            c = Comment.objects.create(content=content, product=product, rating=rating,
-                                       user=request.user)
-            images = request.FILES.getlist('images')
-            for img in images:
-                CommentImage.objects.create(comment=c, image=img)
+            try:
+                uploaded = upload_images(request.FILES.getlist('images'), CommentImage,
+                                         reuse_from=CommentImage.objects.filter(comment__user=request.user))
+            except ImageUploadError as e:
+                return Response({"error": "Upload ảnh thất bại", "details": str(e)},
+                                status=status.HTTP_502_BAD_GATEWAY)
+            try:
+                with transaction.atomic():
+                    c = Comment.objects.create(content=content, product=product, rating=rating,
+                                               user=request.user)
+                    Product.update_rating_stats(product.id, rating)
+                    create_image_rows(CommentImage, uploaded, comment=c)
+            except Exception:
+                discard_uploads(uploaded)
+                raise
             return Response (CommentSerializer(c).data,status=status.HTTP_201_CREATED)
         else:
             comments= self.get_object().comments.select_related('user').all().order_by('-id')
@@ -242,6 +388,29 @@ class ProductViewSet(viewsets.ViewSet,generics.ListAPIView,generics.RetrieveAPIV
             else:
                 return Response(CommentSerializer(comments, many=True).data, status=status.HTTP_200_OK)
 
+    # Sản phẩm đang hot theo điểm giảm dần theo thời gian (bảng ProductTrending do compute_trending ghi)
+    @action(detail=False, methods=['get'], url_path='trending')
+    def trending(self, request):
+        # Dựng output bằng ProductProjection như list: ảnh gom một truy vấn cho cả trang
+        projection = ProductProjection(request)
+        products = self.queryset.filter(trending__isnull=False).order_by('-trending__score', '-id')
+        p = ProductPaginator()
+        page = p.paginate_queryset(projection.queryset(products), request)
+        return p.get_paginated_response(projection.project(page))
+
+    # "Thường được mua cùng" (bảng ProductRelation do build_related_products ghi)
+    @action(detail=True, methods=['get'], url_path='related')
+    def related(self, request, pk=None):
+        product = self.get_object()
+        projection = ProductProjection(request)
+        rows = []
+        related_ids = list(ProductRelation.objects.filter(product=product).order_by('rank')
+                           .values_list('related_id', flat=True))
+        if related_ids:
+            listed = {row['id']: row for row in projection.queryset(self.queryset.filter(id__in=related_ids))}
+            rows = [listed[pid] for pid in related_ids if pid in listed]
+        return Response(projection.project(rows))
+
     @action(detail=False, methods=['get'], url_path='my-products')
     def my_products(self, request):
         user_store = getattr(request.user, 'store', None)
@@ -273,22 +442,99 @@ class ProductViewSet(viewsets.ViewSet,generics.ListAPIView,generics.RetrieveAPIV
         serializer = ProductDetailSerializer(product, data=request.data, partial=(request.method == 'PATCH'),
                                              context={'request': request})
         serializer.is_valid(raise_exception=True)
-        serializer.save()
 
-        # Cập nhật categories (nếu có)
-        category_ids = request.data.getlist('categories') or request.data.get('categories', [])
-        if category_ids:
-            product.categories.set(category_ids)  # Thay thế toàn bộ danh sách
+        # Ảnh: giữ/xoá/sắp xếp ảnh cũ và thêm ảnh mới theo diff (xem product_images.py)
+        try:
+            diff = parse_image_diff(request.data, request.FILES,
+                                    product.images.values_list('id', flat=True))
+        except ImageDiffError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Cập nhật images (nếu có)
-        images = request.FILES.getlist('images')
-        if images:
-            product.images.all().delete()
-            for img in images:
-                ProductImage.objects.create(product=product, image=img)
+        # Chỉ upload file mới, trước khi ghi gì vào DB, lỗi upload thì sản phẩm giữ nguyên
+        uploaded = []
+        try:
+            if diff:
+                uploaded = upload_images(diff.new_files, ProductImage,
+                                         reuse_from=ProductImage.objects.filter(product__store=user_store))
+        except ImageUploadError as e:
+            return Response({'error': 'Upload ảnh thất bại', 'details': str(e)}, status=status.HTTP_502_BAD_GATEWAY)
 
+        try:
+            with transaction.atomic():
+                serializer.save()
+
+                # Cập nhật categories (nếu có)
+                category_ids = request.data.getlist('categories') or request.data.get('categories', [])
+                if category_ids:
+                    product.categories.set(category_ids)  # Thay thế toàn bộ danh sách
+
+                # Cập nhật images (nếu có), ảnh bị bỏ được xoá trên storage sau khi commit
+                if diff:
+                    apply_image_diff(product, diff, uploaded)
+        except Exception:
+            discard_uploads(uploaded)
+            raise
+
+        # Nạp lại với ảnh/danh mục mới trong số truy vấn cố định
+        product = load_product_detail(product.pk)
         return Response(ProductDetailSerializer(product, context={'request': request}).data)
 
+    # Cập nhật giá/tồn kho cho nhiều sản phẩm một lần.
+    # Body: {"items": [{"id": 1, "price": 90000, "available_quantity": 3, "active": false}, ...]}
+    @action(detail=False, methods=['patch'], url_path='bulk-update-my-products')
+    def bulk_update_my_products(self, request):
+        user_store = getattr(request.user, 'store', None)
+        if not user_store:
+            return Response({'error': 'Người dùng chưa có cửa hàng'}, status=status.HTTP_400_BAD_REQUEST)
+        items = request.data.get('items') if isinstance(request.data, dict) else request.data
+        if not items or not isinstance(items, list):
+            return Response({'error': 'items phải là một mảng không rỗng'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > BULK_UPDATE_MAX_ITEMS:
+            return Response({'error': f'Tối đa {BULK_UPDATE_MAX_ITEMS} sản phẩm mỗi lần'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        changes, errors = {}, []
+        for index, item in enumerate(items):
+            item_changes, item_errors = parse_bulk_product_item(item)
+            if item_errors:
+                errors.append({'index': index, 'errors': item_errors})
+            elif item_changes['id'] in changes:
+                errors.append({'index': index, 'errors': {'id': 'id bị lặp'}})
+            else:
+                changes[item_changes.pop('id')] = item_changes
+        if errors:
+            return Response({'error': 'Dữ liệu không hợp lệ', 'details': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        fields = sorted({f for item_changes in changes.values() for f in item_changes})
+        with transaction.atomic():
+            # Một truy vấn kiểm tra quyền sở hữu cho cả lô
+            products = Product.objects.select_for_update().filter(store=user_store, id__in=changes) \
+                .only('id', *BULK_UPDATE_FIELDS).in_bulk()
+            missing = [pid for pid in changes if pid not in products]
+            if missing:
+                return Response({'error': 'Không tìm thấy sản phẩm hoặc không thuộc store của bạn', 'ids': missing},
+                                status=status.HTTP_404_NOT_FOUND)
+
+            diff, changed = [], []
+            for pid, item_changes in changes.items():
+                product = products[pid]
+                entry = {}
+                for field, value in item_changes.items():
+                    old = getattr(product, field)
+                    if old != value:
+                        entry[field] = [old, value]
+                        setattr(product, field, value)
+                if entry:
+                    diff.append({'id': pid, **entry})
+                    changed.append(product)
+            if changed:
+                Product.objects.bulk_update(changed, fields)
+                # bulk_update không bắn post_save nên tự làm mới cache danh mục
+                changed_ids = [p.id for p in changed]
+                transaction.on_commit(lambda: refresh_product_categories(changed_ids))
+
+        return Response({'updated': len(diff), 'changes': diff}, status=status.HTTP_200_OK)
+
     @action(detail=True, methods=['delete'], url_path='delete-my-product')
     def delete_my_product(self, request, pk=None):
         user_store = getattr(request.user, 'store', None)
@@ -345,33 +591,61 @@ class ProductCreateViewSet(viewsets.ViewSet, generics.CreateAPIView):
             available_quantity = int(available_quantity)
             price = float(price)
 
-            # Tạo sản phẩm
-            product = Product.objects.create(
-                name=name,
-                price=price,
-                available_quantity=available_quantity,
-                note=note,
-                store=store,
-                product_condition=product_condition
-            )
-
-            # Gán danh mục
-            for cat_id in category_ids:
-                ProductCategory.objects.create(product=product, category_id=cat_id)
-
-            # Gán ảnh
-            for img in image_files:
-                ProductImage.objects.create(product=product, image=img)
+            # Upload song song toàn bộ ảnh trước, sau đó tạo sản phẩm + danh mục + ảnh trong một transaction
+            uploaded = upload_images(image_files, ProductImage,
+                                     reuse_from=ProductImage.objects.filter(product__store=store))
+            try:
+                with transaction.atomic():
+                    # Cùng khoá store với nhập file (MySQL đọc lại id sau bulk insert theo thứ tự)
+                    lock_store(store)
+                    # Tạo sản phẩm
+                    product = Product.objects.create(
+                        name=name,
+                        price=price,
+                        available_quantity=available_quantity,
+                        note=note,
+                        store=store,
+                        product_condition=product_condition
+                    )
+
+                    # Gán danh mục
+                    for cat_id in category_ids:
+                        ProductCategory.objects.create(product=product, category_id=cat_id)
+
+                    # Gán ảnh
+                    create_image_rows(ProductImage, uploaded, 0, product=product)
+            except Exception:
+                discard_uploads(uploaded)
+                raise
 
             # Trả về thông tin chi tiết
-            serializer = self.get_serializer(product, context={'request': request})
+            serializer = self.get_serializer(load_product_detail(product.pk), context={'request': request})
             return Response(serializer.data, status=201)
 
         except ProductCondition.DoesNotExist:
             return Response({'error': 'product_condition không tồn tại'}, status=400)
+        except ImageUploadError as e:
+            return Response({'error': 'Upload ảnh thất bại', 'details': str(e)}, status=502)
         except Exception as e:
             return Response({'error': 'Lỗi tạo sản phẩm', 'details': str(e)}, status=400)
 
+    # Nhập nhiều sản phẩm từ file CSV/XLSX (cột: name, price, available_quantity, product_condition,
+    # categories, note; categories cách nhau bởi ';'). Ảnh gắn sau qua uploads/attach/ với id trong "products"
+    @action(detail=False, methods=['post'], url_path='bulk-import')
+    def bulk_import(self, request):
+        try:
+            store = request.user.store
+        except Store.DoesNotExist:
+            return Response({'error': 'Người dùng chưa có cửa hàng'}, status=400)
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({'error': 'Thiếu file'}, status=400)
+        try:
+            report = import_products(store, iter_rows(upload, upload.name))
+        except ImportFileError as e:
+            return Response({'error': str(e)}, status=400)
+        return Response(report, status=201 if report['created'] else 400)
+
 class StoreViewSet(viewsets.ModelViewSet):
     queryset = Store.objects.all()
     serializer_class = StoreDetailSerializer
@@ -546,36 +820,17 @@ class StoreViewSet(viewsets.ModelViewSet):
 class CartGroupedView(APIView):
     permission_classes = [IsAuthenticated]
 
+    # Mỗi nhóm cửa hàng có thêm item_count, quantity, subtotal (xem CartProjection).
+    # ?summary=1 trả {"stores": [...], "store_count", "item_count", "quantity", "total"} thay vì danh sách nhóm
     def get(self, request):
-        cart = request.user.cart
-        cart_items = cart.items.select_related('product__store').order_by('-updated_at')
-
-        grouped = defaultdict(list)
-        store_latest_update = {}
-
-        for item in cart_items:
-            store = item.product.store
-            grouped[store.id].append(item)
-            store_latest_update[store.id] = max(
-                store_latest_update.get(store.id, item.updated_at),
-                item.updated_at
-            )
-
-        sorted_store_ids = sorted(store_latest_update, key=lambda x: store_latest_update[x], reverse=True)
-
-        result = []
-        for store_id in sorted_store_ids:
-            store = grouped[store_id][0].product.store
-            result.append({
-                "store": {
-                    "id": store.id,
-                    "name": store.name,
-                    "avatar": cloudinary_url(str(store.avatar))[0] if store.avatar else None
-                },
-                "products": CartItemsSerializer(grouped[store_id], many=True).data
-            })
-
-        return Response(result)
+        projection = CartProjection()
+        store = get_cart_store()
+        groups = projection.groups(request.user, store.items(request.user))
+        if projection.missing_product_ids:
+            store.remove(request.user, projection.missing_product_ids)
+        if request.query_params.get('summary') in ('1', 'true'):
+            return Response(projection.summary(groups))
+        return Response(groups)
 
 class AddToCartView(APIView):
     permission_classes = [IsAuthenticated]
@@ -592,16 +847,12 @@ class AddToCartView(APIView):
         if quantity > product.available_quantity:
             return Response({"error": "Số lượng vượt quá số lượng sẵn có."}, status=400)
 
-        cart, _ = Cart.objects.get_or_create(user=request.user)
-
-        cart_item, created = CartItem.objects.get_or_create(cart=cart, product=product)
-        if not created:
-            if cart_item.quantity + quantity > product.available_quantity:
-                return Response({"error": "Tổng số lượng vượt quá số lượng sẵn có."}, status=400)
-            cart_item.quantity += quantity
-        else:
-            cart_item.quantity = quantity
-        cart_item.save()
+        try:
+            get_cart_store().add(request.user, product.id, quantity, product.available_quantity)
+        except CartLimitExceeded:
+            return Response({"error": "Tổng số lượng vượt quá số lượng sẵn có."}, status=400)
+        except CartStoreError as e:
+            return Response({"error": str(e)}, status=400)
 
         return Response({"message": "Đã thêm sản phẩm vào giỏ hàng."})
 
@@ -617,17 +868,17 @@ class UpdateCartItemView(APIView):
 
         try:
             product = Product.objects.get(pk=product_id)
-            cart_item = CartItem.objects.get(cart__user=request.user, product=product)
         except Product.DoesNotExist:
             return Response({"error": "Sản phẩm không tồn tại."}, status=404)
-        except CartItem.DoesNotExist:
+        try:
+            new_quantity = get_cart_store().add(request.user, product.id, quantity, product.available_quantity,
+                                                create=False)
+        except CartItemMissing:
             return Response({"error": "Sản phẩm chưa có trong giỏ hàng."}, status=404)
-        new_quantity = cart_item.quantity + quantity
-        if new_quantity > product.available_quantity:
+        except CartLimitExceeded:
             return Response({"error": "Số lượng vượt quá giới hạn sẵn có."}, status=400)
-
-        cart_item.quantity = new_quantity
-        cart_item.save()
+        except CartStoreError as e:
+            return Response({"error": str(e)}, status=400)
         return Response({"message": f"Đã tăng số lượng lên {new_quantity}."}, status=200)
 class RemoveCartItemView(APIView):
     permission_classes = [IsAuthenticated]
@@ -637,17 +888,131 @@ class RemoveCartItemView(APIView):
         if not product_ids or not isinstance(product_ids, list):
             return Response({"error": "Yêu cầu danh sách product_ids là một mảng."}, status=400)
 
-        deleted_count = 0
-        for product_id in product_ids:
-            try:
-                cart_item = CartItem.objects.get(cart__user=request.user, product__id=product_id)
-                cart_item.delete()
-                deleted_count += 1
-            except CartItem.DoesNotExist:
-                continue  # bỏ qua sản phẩm không tồn tại
+        # id không hợp lệ hoặc không có trong giỏ thì bỏ qua
+        product_ids = [int(pid) for pid in product_ids if str(pid).isdigit()]
+        try:
+            deleted_count = get_cart_store().remove(request.user, product_ids)
+        except CartStoreError as e:
+            return Response({"error": str(e)}, status=400)
 
         return Response({"message": f"Đã xoá {deleted_count} sản phẩm khỏi giỏ hàng."}, status=200)
 
+# Sửa nhiều sản phẩm trong giỏ một lần, tất cả cùng thành công hoặc không đổi gì (xem cart_store.parse_operations).
+# Body: {"operations": [{"op": "add", "product_id": 1, "quantity": 2}, {"op": "set", "product_id": 2, "quantity": 1},
+#                       {"op": "remove", "product_id": 3}]}
+class CartBatchView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        try:
+            operations = parse_operations(request.data)
+        except CartStoreError as e:
+            return Response({"error": str(e)}, status=400)
+
+        # Tồn kho của mọi sản phẩm được add/set trong một truy vấn
+        product_ids = {product_id for op, product_id, _ in operations if op != 'remove'}
+        available = dict(Product.objects.filter(id__in=product_ids, active=True)
+                         .values_list('id', 'available_quantity'))
+        missing = sorted(product_ids - available.keys())
+        if missing:
+            return Response({"error": f"Sản phẩm không tồn tại: {', '.join(map(str, missing))}."}, status=404)
+
+        try:
+            changes = get_cart_store().apply(request.user, operations, available)
+        except CartItemMissing as e:
+            return Response({"error": str(e)}, status=404)
+        except CartStoreError as e:
+            return Response({"error": str(e)}, status=400)
+
+        return Response({
+            "message": f"Đã cập nhật {len(changes)} sản phẩm trong giỏ hàng.",
+            "items": [{"product_id": pid, "quantity": quantity}
+                      for pid, quantity in changes.items() if quantity is not None],
+            "removed": [pid for pid, quantity in changes.items() if quantity is None],
+        }, status=200)
+
+# Upload ảnh trực tiếp lên storage (xem direct_uploads.py): xin tham số đã ký rồi attach kết quả.
+# Body: {"count": 3}
+class DirectUploadSignView(APIView):
+    permission_classes = [IsAuthenticated]
+    def post(self, request):
+        try:
+            count = int(request.data.get('count', 1))
+        except (TypeError, ValueError):
+            count = 0
+        if not 1 <= count <= DIRECT_UPLOAD_MAX_FILES:
+            return Response({"error": f"count phải từ 1 đến {DIRECT_UPLOAD_MAX_FILES}"}, status=400)
+        return Response(issue_upload_params(request.user, count))
+
+# Body: {"target": "product" | "comment" | "user" | "store", "id": 12,
+#        "images": [{"public_id": "...", "version": 1754149807, "format": "jpg", "signature": "..."}]}
+# product/comment: thêm ảnh vào sản phẩm của store mình / bình luận của mình; user/store: đổi avatar (1 ảnh)
+class DirectUploadAttachView(APIView):
+    permission_classes = [IsAuthenticated]
+    def post(self, request):
+        target = request.data.get('target')
+        if target not in ('product', 'comment', 'user', 'store'):
+            return Response({"error": "target phải là product, comment, user hoặc store"}, status=400)
+        try:
+            resources = verify_uploads(request.user, request.data.get('images'))
+        except DirectUploadError as e:
+            return Response({"error": str(e)}, status=400)
+        if target in ('user', 'store') and len(resources) != 1:
+            return Response({"error": "Avatar chỉ nhận đúng 1 ảnh"}, status=400)
+
+        if target == 'product':
+            product = Product.objects.filter(pk=request.data.get('id'), store__user=request.user).first()
+            if not product:
+                return Response({'error': 'Không tìm thấy sản phẩm hoặc không thuộc store của bạn'}, status=404)
+            # Ảnh mới xếp sau các ảnh đang có
+            last = product.images.aggregate(last=Max('position'))['last']
+            create_image_rows(ProductImage, resources, 0 if last is None else last + 1, product=product)
+            data = ProductDetailSerializer(load_product_detail(product.pk), context={'request': request}).data
+        elif target == 'comment':
+            comment = Comment.objects.filter(pk=request.data.get('id'), user=request.user).first()
+            if not comment:
+                return Response({"error": "Không tìm thấy bình luận của bạn"}, status=404)
+            create_image_rows(CommentImage, resources, comment=comment)
+            data = CommentSerializer(comment).data
+        elif target == 'user':
+            request.user.avatar = resources[0]
+            request.user.save(update_fields=['avatar'])
+            data = UserSerializer(request.user, context={'request': request}).data
+        else:
+            store = Store.objects.filter(user=request.user).first()
+            if not store:
+                return Response({'error': 'Người dùng chưa có cửa hàng'}, status=400)
+            store.avatar = resources[0]
+            store.save(update_fields=['avatar'])
+            data = StoreDetailSerializer(store, context={'request': request}).data
+        return Response(data, status=status.HTTP_201_CREATED)
+
+# Chỉ dùng khi IMAGE_UPLOAD_BACKEND là LocalBackend: phục vụ ảnh gốc/biến thể từ đĩa theo URL backend dựng
+def local_media_view(request, path):
+    backend = get_backend()
+    if not isinstance(backend, LocalBackend):
+        raise Http404
+    try:
+        return FileResponse(open(backend.resolve(path), 'rb'))
+    except StorageError:
+        raise Http404
+
+# Nhận upload trực tiếp từ client thay API upload của Cloudinary (form: file + các tham số ký từ uploads/sign/)
+class LocalMediaUploadView(APIView):
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    def post(self, request, resource_type):
+        backend = get_backend()
+        if not isinstance(backend, LocalBackend):
+            raise Http404
+        file = request.FILES.get('file')
+        if not file:
+            return Response({"error": "Thiếu file"}, status=400)
+        params = {key: request.data.get(key) for key in request.data if key != 'file'}
+        try:
+            return Response(backend.signed_upload(file, params))
+        except StorageError as e:
+            return Response({"error": str(e)}, status=400)
 
 
 class OrderViewSet(viewsets.ModelViewSet):
@@ -661,6 +1026,8 @@ class OrderViewSet(viewsets.ModelViewSet):
         return super().get_serializer_class()
     def create(self, request, *args, **kwargs):
         user = request.user
+        # Giỏ đang nằm trên cache (CachedCartStore) phải được ghi xuống CartItem trước khi đặt hàng
+        get_cart_store().flush(user)
         items_data = request.data.get('items', [])
         voucher_id = request.data.get('voucher')
         note = request.data.get('note', '')
@@ -820,17 +1187,16 @@ class OrderViewSet(viewsets.ModelViewSet):
         # Sắp xếp theo ngày tạo (mới nhất trước)
         orders = orders.order_by('-created_at')
 
-        # Phân trang
-        from EcoReMartApp.paginators import ProductPaginator
+        # Phân trang, output dựng bằng OrderProjection (giống hệt OrderSerializer, số truy vấn cố định)
+        projection = OrderProjection(request)
+        orders = projection.queryset(orders)
         paginator = OrderPaginator()
         page = paginator.paginate_queryset(orders, request)
 
         if page is not None:
-            serializer = OrderSerializer(page, many=True, context={'request': request})
-            return paginator.get_paginated_response(serializer.data)
+            return paginator.get_paginated_response(projection.project(page))
 
-        serializer = OrderSerializer(orders, many=True, context={'request': request})
-        return Response(serializer.data)
+        return Response(projection.project(orders))
 
     @action(detail=True, methods=['patch'], url_path='update-status', permission_classes=[IsAuthenticated])
     def update_order_status_customer(self, request, pk=None):